@@ -86,6 +86,28 @@ DATABASES = {
     }
 }
 
+# Threads per process running per-station analytics queries, shared by all
+# requests; each holds one database connection while it works. Budget
+# max_connections for (request threads + ANALYTICS_WORKERS + 1 change feed
+# listener) per server process, plus one per run_report_worker
+ANALYTICS_WORKERS = 8
+
+# Analytics results are cached per process; point 'analytics' at Redis or
+# Memcached to share them between workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analytics': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tracebility-analytics',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+}
+
+# Files built by `manage.py run_report_worker` (background exports)
+REPORTS_DIR = BASE_DIR / 'reports'
+
 
 
 
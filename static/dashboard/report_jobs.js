@@ -0,0 +1,64 @@
+// Background report jobs: queue a heavy export, poll it, then download the file
+// (the file is built by `manage.py run_report_worker`, not by the web worker)
+
+const REPORT_POLL_MS = 2000;
+
+// A job no worker has picked up after this long probably has no worker to run it
+const REPORT_QUEUE_TIMEOUT_MS = 60000;
+
+function runReportJob(kind, params, onFinished) {
+    const body = new URLSearchParams(params);
+    body.set('kind', kind);
+
+    return fetch('/api/reports/', { method: 'POST', body: body })
+        .then(response => response.json())
+        .then(job => {
+            if (!job.success) {
+                throw new Error(job.error);
+            }
+            return waitForReport(job);
+        })
+        .then(job => {
+            window.location.href = job.download_url;
+        })
+        .catch(error => {
+            if (error.job && error.job.direct_url) {
+                if (confirm(error.message + '\n\nBuild the report in this request instead? (long ranges can take several minutes)')) {
+                    window.location.href = error.job.direct_url;
+                }
+            } else {
+                alert('Report failed: ' + error.message);
+            }
+        })
+        .finally(() => {
+            if (onFinished) {
+                onFinished();
+            }
+        });
+}
+
+function waitForReport(job) {
+    return new Promise((resolve, reject) => {
+        let queuedSince = Date.now();
+
+        function check(job) {
+            if (job.status === 'done') {
+                resolve(job);
+            } else if (job.status === 'failed') {
+                reject(new Error(job.error || 'Report failed'));
+            } else if (job.status === 'queued' && Date.now() - queuedSince > REPORT_QUEUE_TIMEOUT_MS) {
+                const error = new Error('The report is still queued: no report worker (manage.py run_report_worker) seems to be running.');
+                error.job = job;
+                reject(error);
+            } else {
+                if (job.status !== 'queued') {
+                    queuedSince = Date.now();
+                }
+                setTimeout(() => {
+                    fetch(job.status_url).then(response => response.json()).then(check, reject);
+                }, REPORT_POLL_MS);
+            }
+        }
+        check(job);
+    });
+}
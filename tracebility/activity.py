@@ -0,0 +1,98 @@
+"""
+Latest activity of every station table, for the active/inactive flags.
+
+A machine is active when the newest row of its table (max id) is less than
+its threshold old (ACTIVITY_THRESHOLD_MINUTES, or 'inactive_after' in the
+machine config). Instead of loading and parsing that row for every
+machine on every dashboard render and SSE tick, one ActivityTracker per
+process keeps the event time of each table's newest row:
+
+* all tables are read with a single UNION ALL query;
+* afterwards only the tables the change feed reports as changed are
+  re-read, plus a full reload every RELOAD_INTERVAL seconds in case a
+  notification was missed;
+* when no change feed thread is running (no open streams) the cache is
+  trusted for POLL_INTERVAL seconds only.
+"""
+
+import threading
+import time
+from datetime import timedelta, timezone as dt_timezone
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .change_feed import POLL_INTERVAL, change_feed
+
+
+ACTIVITY_THRESHOLD_MINUTES = 21
+RELOAD_INTERVAL = 60
+
+
+def get_time_column(model):
+    """Column holding the event time of a station row"""
+    field_names = {field.name for field in model._meta.get_fields()}
+    field_name = 'event_time' if 'event_time' in field_names else 'timestamp_internal'
+    return model._meta.get_field(field_name).column
+
+
+class ActivityTracker:
+    """Event time of the newest row of each station table, refreshed from the change feed"""
+
+    def __init__(self, station_models, feed=change_feed, using=DEFAULT_DB_ALIAS):
+        self.columns = {model._meta.db_table: get_time_column(model) for model in station_models}
+        self.feed = feed
+        self.using = using
+        self.times = {}
+        self.versions = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+    def is_active(self, table, minutes=ACTIVITY_THRESHOLD_MINUTES):
+        last_event = self.last_event_time(table)
+        return last_event is not None and last_event >= timezone.now() - timedelta(minutes=minutes)
+
+    def last_event_time(self, table):
+        self.refresh()
+        return self.times.get(table)
+
+    def refresh(self):
+        """Re-read the tables that changed since they were last read"""
+        with self.lock:
+            max_age = RELOAD_INTERVAL if self.feed.running() else POLL_INTERVAL
+            if self.loaded_at is None or time.monotonic() - self.loaded_at >= max_age:
+                tables = list(self.columns)
+                self.loaded_at = time.monotonic()
+            else:
+                tables = [table for table in self.columns if self.feed.version([table]) != self.versions.get(table)]
+            if not tables:
+                return
+
+            # Versions first, so a change made during the read is picked up next time
+            for table in tables:
+                self.versions[table] = self.feed.version([table])
+            self.times.update(self.read(tables))
+
+    def read(self, tables):
+        """{table: event time of its newest row} in one query (None for empty tables)"""
+        connection = connections[self.using]
+        quote = connection.ops.quote_name
+        sql = ' UNION ALL '.join(
+            f'SELECT %s, {quote(self.columns[table])} FROM {quote(table)} '
+            f'WHERE id = (SELECT MAX(id) FROM {quote(table)})'
+            for table in tables
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, tables)
+            rows = dict(cursor.fetchall())
+
+        times = {}
+        for table in tables:
+            value = rows.get(table)
+            # Raw SQL skips the field converters: SQLite returns naive UTC text
+            if isinstance(value, str):
+                value = parse_datetime(value)
+            if value is not None and timezone.is_naive(value):
+                value = timezone.make_aware(value, dt_timezone.utc)
+            times[table] = value
+        return times
@@ -0,0 +1,142 @@
+"""
+Analytics result cache shared by the analytics API and exports.
+
+Opening the analytics page and then exporting the same filters used to
+compute the payload twice. Results are now kept in the Django cache named
+ANALYTICS_CACHE_ALIAS (a local-memory cache by default, see CACHES in the
+settings), keyed by (start, end, machine, status) and by the database
+state the result was computed from, so every worker sees the same keys:
+
+* a range ending before the current production day started (06:00, the
+  start of shift A) and before ``covered_until`` of the rollup watermark
+  is closed: it is read from the rollups, so its key carries the rollup
+  watermark's last_event_id and the result is kept until evicted. Status
+  edits and late gateway rows for closed days reach the rollups through
+  ``part_event`` on the next ``update_analytics_rollups`` run, which
+  moves last_event_id and so retires the old result;
+* any other range is keyed by the max(id) watermark of every station
+  table it reads and of ``part_event`` (one query), plus the rollup
+  last_event_id. A new row or a logged status edit gives a new key;
+  other in-place updates such as an OP40 completion are picked up after
+  OPEN_RESULT_TIMEOUT seconds. Open ranges are keyed to the minute so
+  the default "last 7 days" view is shared between requests.
+
+Hits and misses are counted in the cache as well.
+"""
+
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from .change_feed import get_station_tables
+from .models import PartEvent, RollupWatermark
+from .rollups import ROLLUP_WATERMARK, collect_rollup_analytics, select_configs
+
+
+ANALYTICS_CACHE_ALIAS = 'analytics'
+OPEN_RESULT_TIMEOUT = 60
+PRODUCTION_DAY_START_HOUR = 6  # shift A
+
+HITS_KEY = 'analytics:hits'
+MISSES_KEY = 'analytics:misses'
+
+
+def get_cache():
+    alias = ANALYTICS_CACHE_ALIAS if ANALYTICS_CACHE_ALIAS in settings.CACHES else 'default'
+    return caches[alias]
+
+
+def production_day_start(now=None):
+    """Start of the production day in progress (local 06:00, yesterday's before 06:00)"""
+    now = timezone.localtime(now)
+    start = now.replace(hour=PRODUCTION_DAY_START_HOUR, minute=0, second=0, microsecond=0)
+    if now < start:
+        start -= timedelta(days=1)
+    return start
+
+
+def is_closed_range(end_date, now=None):
+    return end_date < production_day_start(now)
+
+
+def read_watermarks(tables, using=DEFAULT_DB_ALIAS):
+    """max(id) of each table, in one query"""
+    tables = sorted(tables)
+    if not tables:
+        return ()
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = 'SELECT ' + ', '.join(f'(SELECT MAX(id) FROM {quote(table)})' for table in tables)
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return tuple(cursor.fetchone())
+
+
+def read_rollup_watermark():
+    """(covered_until, last_event_id) of the rollup watermark, or (None, 0) before the first run"""
+    watermark = (
+        RollupWatermark.objects.filter(name=ROLLUP_WATERMARK)
+        .values_list('covered_until', 'last_event_id')
+        .first()
+    )
+    return watermark or (None, 0)
+
+
+def get_cache_key(start_date, end_date, machine_filter, status_filter, watermarks):
+    raw = repr((start_date.isoformat(), end_date.isoformat(), machine_filter, status_filter, watermarks))
+    return 'analytics:result:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def increment(key):
+    cache = get_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def get_cached_analytics(start_date, end_date, machine_filter='all', status_filter='all', collect=None):
+    """collect_rollup_analytics() (or collect, which returns the same payload) through the analytics cache"""
+    covered_until, last_event_id = read_rollup_watermark()
+    closed = is_closed_range(end_date)
+    if closed and covered_until and end_date < covered_until:
+        key = get_cache_key(start_date, end_date, machine_filter, status_filter, last_event_id)
+        timeout = None
+    else:
+        configs, _ = select_configs(machine_filter)
+        tables = get_station_tables(configs) | {PartEvent._meta.db_table}
+        watermarks = (last_event_id, read_watermarks(tables))
+        key_start, key_end = start_date, end_date
+        if not closed:
+            key_start, key_end = start_date.replace(second=0, microsecond=0), end_date.replace(second=0, microsecond=0)
+        key = get_cache_key(key_start, key_end, machine_filter, status_filter, watermarks)
+        timeout = OPEN_RESULT_TIMEOUT
+
+    cache = get_cache()
+    data = cache.get(key)
+    if data is not None:
+        increment(HITS_KEY)
+        return data
+
+    increment(MISSES_KEY)
+    data = (collect or collect_rollup_analytics)(start_date, end_date, machine_filter, status_filter)
+    cache.set(key, data, timeout=timeout)
+    return data
+
+
+def get_cache_stats():
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups * 100, 2) if lookups else 0,
+        'backend': type(cache).__name__,
+    }
@@ -0,0 +1,334 @@
+"""
+Shared SSE broadcast hub.
+
+One producer thread per process follows the change feed, builds each
+snapshot once per change and publishes it on a named channel:
+
+* ``dashboard`` - the dashboard summary of every machine;
+* ``machine:<machine_id>`` - the record table and counters of one machine.
+
+Snapshots are only built for channels that currently have subscribers.
+Every subscriber of a channel receives the same serialized payload, so N
+open browsers cost the same queries as one.
+
+Each published snapshot gets the next version number of its channel. A
+subscriber that already holds the previous version is sent a ``patch``
+carrying only the changed fields and list items (see diff_snapshot());
+new subscribers and ones that fell behind get the full ``update``.
+
+Events carry ids that increase with the version. The last EVENT_BUFFER_SIZE
+patches of each channel are kept, so a client reconnecting with
+``Last-Event-ID`` is replayed only what it missed; it gets a full snapshot
+only once the buffer has moved past its position.
+
+Under ASGI the streams use subscribe_async(), so an idle viewer is a
+suspended coroutine rather than a worker thread; WSGI servers fall back to
+the blocking subscribe().
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+from .change_feed import POLL_INTERVAL, change_feed
+
+
+# Patches kept per channel for Last-Event-ID resume (at least POLL_INTERVAL apart)
+EVENT_BUFFER_SIZE = 100
+
+
+def diff_snapshot(old, new, list_field, key):
+    """Patch body turning snapshot old into new
+
+    Top-level fields are compared as a whole, the items of list_field one by
+    one by key(item); 'order' (the new list of keys) is only sent when items
+    were added, removed or moved.
+    """
+    fields = {
+        name: value for name, value in new.items()
+        if name != list_field and old.get(name) != value
+    }
+    old_items = {key(item): item for item in old.get(list_field, [])}
+    new_items = new.get(list_field, [])
+
+    patch = {
+        'fields': fields,
+        'changed': [item for item in new_items if old_items.get(key(item)) != item],
+    }
+    order = [key(item) for item in new_items]
+    if order != list(old_items):
+        patch['order'] = order
+    return patch
+
+
+class Subscription:
+    """Iterator over a hub channel that holds one subscriber until closed
+
+    The subscriber is counted as soon as subscribe() returns, so close() drops
+    it even when the events were never iterated.
+    """
+
+    def __init__(self, hub, channel, events):
+        self.hub = hub
+        self.channel = channel
+        self.events = events
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        return next(self.events)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.events.close()
+            self.hub.remove_subscriber(self.channel)
+
+
+class BroadcastHub:
+    """Builds and fans out one snapshot per channel per change"""
+
+    def __init__(self, resolve_channel, feed=change_feed, autostart=True):
+        # resolve_channel(channel) -> (tables, build, diff) or None;
+        # diff(old, new) returns a patch body, or diff is None for full snapshots only
+        self.resolve_channel = resolve_channel
+        self.feed = feed
+        self.autostart = autostart
+        self.channels = {}
+        # Event ids are "<epoch>-<version>"; ids from another process or run never match
+        self.epoch = format(time.time_ns(), 'x')
+        self.condition = threading.Condition()
+        self.thread = None
+
+    # ------------------------------------------------------------------
+    # Subscribers
+    # ------------------------------------------------------------------
+
+    def add_subscriber(self, channel):
+        """Register a subscriber and return the channel's current payload version (None if unknown channel)"""
+        with self.condition:
+            entry = self.channels.get(channel)
+            if entry is None:
+                resolved = self.resolve_channel(channel)
+                if resolved is None:
+                    return None
+                tables, build, diff = resolved
+                entry = {
+                    'tables': set(tables),
+                    'build': build,
+                    'diff': diff,
+                    'subscribers': 0,
+                    'version': 0,
+                    'snapshot': None,
+                    'payload': None,
+                    'history': deque(maxlen=EVENT_BUFFER_SIZE),
+                    'source_version': self.feed.version(tables),
+                    'waiters': set(),
+                }
+                self.channels[channel] = entry
+
+            # source_version is kept while nobody listens, so changes made in
+            # between are still published (as patches) for resuming clients
+            entry['subscribers'] += 1
+            return entry['version']
+
+    def remove_subscriber(self, channel):
+        with self.condition:
+            entry = self.channels.get(channel)
+            if entry:
+                entry['subscribers'] -= 1
+
+    def event_id(self, version):
+        return f'{self.epoch}-{version}'
+
+    def parse_event_id(self, entry, last_event_id):
+        """Version a client already holds from its Last-Event-ID (None if it is not one of ours)"""
+        epoch, _, version = (last_event_id or '').partition('-')
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        version = int(version)
+        return version if version <= entry['version'] else None
+
+    def resume_position(self, entry, version, last_event_id):
+        """(version to wait past, version the client holds) for a new subscriber"""
+        with self.condition:
+            sent = self.parse_event_id(entry, last_event_id)
+        if sent is not None:
+            return sent, sent
+        if last_event_id:
+            # Reconnecting after a restart or to another process: resync straight away
+            return 0, None
+        # A new client holds no version, so its first event (on the next change) is a full snapshot
+        return version, None
+
+    def pending_events(self, entry, sent):
+        """(event id, data) events bringing a client from version sent to the channel's version
+
+        The buffered patches are replayed when they cover every version since
+        sent; otherwise (new client, buffer moved past it) the full snapshot.
+        """
+        version = entry['version']
+        if sent == version:
+            return []
+        if sent is not None:
+            patches = [(v, patch) for v, patch in entry['history'] if v > sent]
+            if len(patches) == version - sent and all(patch is not None for v, patch in patches):
+                return [(self.event_id(v), patch) for v, patch in patches]
+        return [(self.event_id(version), entry['payload'])]
+
+    def subscribe(self, channel, timeout=POLL_INTERVAL, last_event_id=None):
+        """Subscription iterating (event id, data) events for a channel; yields None on idle ticks"""
+        version = self.add_subscriber(channel)
+        if version is None:
+            raise KeyError(channel)
+        if self.autostart:
+            self.start()
+        return Subscription(self, channel, self._iterate(channel, version, timeout, last_event_id))
+
+    def _iterate(self, channel, version, timeout, last_event_id):
+        entry = self.channels[channel]
+        version, sent = self.resume_position(entry, version, last_event_id)
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: entry['version'] != version, timeout=timeout)
+                events = []
+                if entry['version'] != version:
+                    events = self.pending_events(entry, sent)
+                    version = sent = entry['version']
+            if not events:
+                yield None
+            yield from events
+
+    async def subscribe_async(self, channel, timeout=POLL_INTERVAL, last_event_id=None):
+        """Async generator of (event id, data) events for a channel; yields None on idle ticks
+
+        An idle subscriber is just a coroutine waiting on an asyncio.Event that
+        publish() sets from the producer thread, so it holds no thread.
+        """
+        version = self.add_subscriber(channel)
+        if version is None:
+            raise KeyError(channel)
+        if self.autostart:
+            self.start()
+
+        entry = self.channels[channel]
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.condition:
+            entry['waiters'].add(waiter)
+        version, sent = self.resume_position(entry, version, last_event_id)
+        try:
+            while True:
+                if entry['version'] == version:
+                    try:
+                        await asyncio.wait_for(waiter[1].wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    waiter[1].clear()
+
+                with self.condition:
+                    events = []
+                    if entry['version'] != version:
+                        events = self.pending_events(entry, sent)
+                        version = sent = entry['version']
+                if not events:
+                    yield None
+                for event in events:
+                    yield event
+        finally:
+            with self.condition:
+                entry['waiters'].discard(waiter)
+            self.remove_subscriber(channel)
+
+    # ------------------------------------------------------------------
+    # Producer
+    # ------------------------------------------------------------------
+
+    def start(self):
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='tracebility-broadcast', daemon=True)
+                self.thread.start()
+
+    def subscribed_tables(self):
+        with self.condition:
+            tables = set()
+            for entry in self.channels.values():
+                if entry['subscribers'] > 0:
+                    tables |= entry['tables']
+            return tables
+
+    def pending_channels(self):
+        """Subscribed channels whose tables changed since their last snapshot"""
+        with self.condition:
+            return [
+                channel for channel, entry in self.channels.items()
+                if entry['subscribers'] > 0 and self.feed.version(entry['tables']) != entry['source_version']
+            ]
+
+    def refresh(self):
+        """Build and publish a snapshot for every pending channel; returns the channels published"""
+        published = []
+        for channel in self.pending_channels():
+            entry = self.channels[channel]
+            # Read the version first so changes made while building trigger another snapshot
+            source_version = self.feed.version(entry['tables'])
+            try:
+                payload = entry['build']()
+            except Exception as e:
+                print(f"Broadcast error on {channel}: {e}")
+                payload = {'error': str(e)}
+            self.publish(channel, payload, source_version)
+            published.append(channel)
+        return published
+
+    def publish(self, channel, payload, source_version):
+        # Round-trip through JSON so snapshots compare the way clients see them
+        snapshot = json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+        with self.condition:
+            entry = self.channels[channel]
+            version = entry['version'] + 1
+            data = json.dumps(dict(snapshot, version=version))
+
+            patch = None
+            if entry['diff'] and entry['snapshot'] is not None and 'error' not in snapshot:
+                body = entry['diff'](entry['snapshot'], snapshot)
+                patch = json.dumps(dict(body, type='patch', version=version, base_version=version - 1))
+                if len(patch) >= len(data):
+                    patch = None
+
+            entry['snapshot'] = None if 'error' in snapshot else snapshot
+            entry['payload'] = data
+            entry['history'].append((version, patch))
+            entry['version'] = version
+            entry['source_version'] = source_version
+            self.condition.notify_all()
+            for loop, event in entry['waiters']:
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    pass  # loop already closed; the waiter is removed when its generator finishes
+
+    def run(self):
+        while True:
+            try:
+                tables = self.subscribed_tables()
+                self.feed.watch(tables)
+                version = self.feed.version(tables)
+
+                if self.refresh():
+                    # Coalesce bursts: at most one snapshot per channel per interval
+                    time.sleep(POLL_INTERVAL)
+                else:
+                    self.feed.wait(tables, version, timeout=POLL_INTERVAL)
+            except Exception as e:
+                print(f"Broadcast error: {e}")
+                connection.close()
+                time.sleep(POLL_INTERVAL)
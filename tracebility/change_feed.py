@@ -0,0 +1,157 @@
+"""
+Station table change feed for the SSE streams.
+
+One ChangeFeed per process keeps a version counter per station table and
+the streams wait on it, instead of every open browser running COUNT(*)
+on every table every two seconds:
+
+* on PostgreSQL a listener thread LISTENs on ``tracebility_changes``,
+  which the triggers from migration 0012 notify with "<table>:<id>";
+* on other backends a single poller thread reads max(id) of every
+  watched table in one query every POLL_INTERVAL seconds.
+"""
+
+import select
+import threading
+import time
+from collections import defaultdict
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+CHANNEL = 'tracebility_changes'
+POLL_INTERVAL = 2
+RECONNECT_DELAY = 5
+
+
+class ChangeFeed:
+    """Per-table change counters fed by LISTEN/NOTIFY or a max(id) poller"""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.versions = defaultdict(int)
+        self.watched = set()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def watch(self, tables):
+        """Follow tables (starting the background thread if needed) and return their current version"""
+        with self.condition:
+            self.watched.update(tables)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='tracebility-change-feed', daemon=True)
+                self.thread.start()
+            return self.version(tables)
+
+    def running(self):
+        """Whether the background thread is following the watched tables"""
+        return self.thread is not None and self.thread.is_alive()
+
+    def version(self, tables):
+        with self.condition:
+            return sum(self.versions[table] for table in tables)
+
+    def publish(self, tables):
+        with self.condition:
+            for table in tables:
+                self.versions[table] += 1
+            self.condition.notify_all()
+
+    def wait(self, tables, version, timeout=POLL_INTERVAL):
+        """Block until one of tables moves past version (or timeout) and return the current version"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version(tables) != version, timeout=timeout)
+            return self.version(tables)
+
+    def changes(self, tables, interval=POLL_INTERVAL):
+        """Yield True after tables changed and False on idle ticks; at most one True per interval"""
+        version = self.watch(tables)
+        last_change = 0.0
+        while True:
+            delay = last_change + interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            current = self.wait(tables, version, timeout=interval)
+            changed = current != version
+            if changed:
+                version = current
+                last_change = time.monotonic()
+            yield changed
+
+    # ------------------------------------------------------------------
+    # Background thread
+    # ------------------------------------------------------------------
+
+    def run(self):
+        reconnecting = False
+        while True:
+            connection = connections[self.using]
+            try:
+                if connection.vendor == 'postgresql':
+                    self.listen(connection, reconnecting)
+                else:
+                    self.poll(connection)
+            except Exception as e:
+                print(f"Change feed error: {e}")
+            finally:
+                connection.close()
+            reconnecting = True
+            time.sleep(RECONNECT_DELAY)
+
+    def listen(self, connection, reconnecting=False):
+        connection.ensure_connection()
+        raw = connection.connection
+        with raw.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+
+        # Notifications sent while we were disconnected are lost, so refresh everyone once
+        if reconnecting:
+            with self.condition:
+                self.publish(list(self.watched))
+
+        while True:
+            if not select.select([raw], [], [], 60)[0]:
+                continue
+            raw.poll()
+            tables = set()
+            while raw.notifies:
+                tables.add(raw.notifies.pop(0).payload.partition(':')[0])
+            if tables:
+                self.publish(tables)
+
+    def poll(self, connection):
+        last_ids = {}
+        while True:
+            last_ids = self.poll_once(connection, last_ids)
+            time.sleep(POLL_INTERVAL)
+
+    def poll_once(self, connection, last_ids):
+        """Read max(id) of the watched tables, publish the ones that moved and return the new ids"""
+        with self.condition:
+            tables = sorted(self.watched)
+        if not tables:
+            return last_ids
+
+        quote = connection.ops.quote_name
+        sql = 'SELECT ' + ', '.join(f'(SELECT MAX(id) FROM {quote(table)})' for table in tables)
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            max_ids = dict(zip(tables, cursor.fetchone()))
+
+        changed = [table for table in tables if table in last_ids and max_ids[table] != last_ids[table]]
+        if changed:
+            self.publish(changed)
+        return max_ids
+
+
+change_feed = ChangeFeed()
+
+
+def get_station_tables(configs):
+    """db_tables a stream has to follow for the given machine configs"""
+    tables = set()
+    for config in configs:
+        for key in ('prep_model', 'post_model'):
+            if config.get(key):
+                tables.add(config[key]._meta.db_table)
+    return tables
@@ -0,0 +1,147 @@
+"""
+Map-reduce analytics over production days, for monthly and quarterly reviews.
+
+collect_analytics_data(mode='chunked') splits the requested range at
+production day starts (06:00, shift A) into one run of consecutive days
+per worker and aggregates the runs in a ProcessPoolExecutor, so a 90-day
+range uses every core of the reporting server instead of one. Each run
+produces a mergeable partial:
+
+* its GROUP BY buckets (query_buckets), which hold the counts, shift and
+  model tallies and cycle-time sum/count per station, date and hour;
+* the most recent DETAILED_RECORD_LIMIT rows of each station.
+
+Day boundaries fall on whole hours, so every bucket comes from exactly one
+run and the merged buckets are the ones collect_sql_analytics would read.
+The parent merges the partials and builds the payload with the same code,
+so the result is identical to mode='sql'.
+
+The report worker builds analytics reports with collect_report_analytics(),
+which takes this path when at least CHUNKED_MIN_LIVE_DAYS of the range are
+not covered by the hourly rollups (a long review before the rollups were
+built, or with update_analytics_rollups not running); the worker is its own
+process, so the pool never competes with the web workers.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .analytics_cache import production_day_start
+from .rollups import (
+    DETAILED_RECORD_LIMIT,
+    build_analytics_data,
+    collect_rollup_analytics,
+    get_rollup_window,
+    latest_records,
+    merge_buckets,
+    new_buckets,
+    query_buckets,
+    select_configs,
+    station_has_rows,
+    station_recent_records,
+)
+from .station_pool import map_stations
+
+
+# Days the rollups leave to scan live before a report is worth a process pool
+CHUNKED_MIN_LIVE_DAYS = 7
+
+
+def get_process_count():
+    return getattr(settings, 'ANALYTICS_PROCESSES', None) or os.cpu_count() or 1
+
+
+def split_production_days(start, end, chunks=None):
+    """[(chunk_start, chunk_end)] covering start <= t < end, split at production day starts
+
+    Every production day is its own chunk, or with chunks=N the days are
+    grouped into at most N runs of consecutive days.
+    """
+    days = []
+    boundary = production_day_start(start) + timedelta(days=1)
+    while boundary < end:
+        days.append((start, boundary))
+        start = boundary
+        boundary += timedelta(days=1)
+    days.append((start, end))
+
+    if not chunks or chunks >= len(days):
+        return days
+    size = -(-len(days) // chunks)
+    return [(days[i][0], days[min(i + size, len(days)) - 1][1]) for i in range(0, len(days), size)]
+
+
+def init_worker():
+    # Spawned workers (Windows, macOS) start without Django set up
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def collect_chunk(machine_filter, status_filter, chunk_start, chunk_end):
+    """Partial for a run of production days: (buckets, {station: most recent rows, newest first})"""
+    configs, _ = select_configs(machine_filter)
+    buckets = new_buckets()
+    records = {}
+    for config in configs:
+        merge_buckets(buckets, query_buckets(config, chunk_start, chunk_end))
+        records[config['name']] = station_recent_records(config, chunk_start, chunk_end, status_filter)
+    return dict(buckets), records
+
+
+def reduce_chunks(configs, partials, status_filter, selected_op_code):
+    """Merge the chunk partials (in date order) into the analytics payload"""
+    buckets = new_buckets()
+    station_records = {config['name']: [] for config in configs}
+    for chunk_buckets, chunk_records in partials:
+        merge_buckets(buckets, chunk_buckets)
+        for station, rows in chunk_records.items():
+            # Later chunks hold newer rows; each list is newest first
+            station_records[station][:0] = rows
+
+    records = []
+    for config in configs:
+        records.extend(station_records[config['name']][:DETAILED_RECORD_LIMIT])
+
+    data = build_analytics_data(configs, buckets, status_filter, selected_op_code)
+    data['detailed_data'] = latest_records(records)
+    return data
+
+
+def collect_chunked_analytics(start_date, end_date, machine_filter='all', status_filter='all', processes=None,
+                              using=DEFAULT_DB_ALIAS):
+    """Same payload as collect_sql_analytics, with the production days aggregated in a process pool"""
+    configs, selected_op_code = select_configs(machine_filter)
+    processes = processes or get_process_count()
+    # One run of consecutive days per process keeps the number of queries down
+    chunks = split_production_days(start_date, end_date + timedelta(microseconds=1), processes)
+    processes = min(processes, len(chunks))
+
+    args = [(machine_filter, status_filter, chunk_start, chunk_end) for chunk_start, chunk_end in chunks]
+    if processes <= 1 or connections[using].in_atomic_block:
+        partials = [collect_chunk(*chunk_args) for chunk_args in args]
+    else:
+        # Forked workers must not share the parent's open connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=processes, initializer=init_worker) as executor:
+            partials = list(executor.map(collect_chunk, *zip(*args)))
+
+    data = reduce_chunks(configs, partials, status_filter, selected_op_code)
+    data['active_machines'] = sum(map_stations(station_has_rows, configs))
+    return data
+
+
+def collect_report_analytics(start_date, end_date, machine_filter='all', status_filter='all'):
+    """Payload for a background report: chunked when the rollups leave a long range to scan, else the rollups"""
+    end = end_date + timedelta(microseconds=1)
+    live = end - start_date
+    window = get_rollup_window(start_date, end)
+    if window:
+        live -= window[1] - window[0]
+    if live >= timedelta(days=CHUNKED_MIN_LIVE_DAYS):
+        return collect_chunked_analytics(start_date, end_date, machine_filter, status_filter)
+    return collect_rollup_analytics(start_date, end_date, machine_filter, status_filter)
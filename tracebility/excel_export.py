@@ -0,0 +1,181 @@
+"""
+Write-only Excel workbooks for the analytics and monitoring downloads.
+
+Workbooks are opened with ``Workbook(write_only=True)``: every appended
+row is serialised to the sheet's temporary file straight away and no cell
+objects are kept, so a sheet fed from a generator (detailed records,
+monitoring results) takes the same memory at 500 rows as at 500,000. The
+finished .xlsx is saved to a temporary file and streamed back in chunks.
+
+Write-only sheets cannot be revisited, which sets the rules the exports
+follow:
+
+* cells use the named styles registered once per workbook (STYLES)
+  instead of new Font / Fill / Border objects per cell;
+* column widths and frozen panes are given when the sheet is added, so
+  long sheets are sized from their headers rather than by scanning every
+  value;
+* charts go on the small aggregate sheets only.
+"""
+
+import os
+import tempfile
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.chart import BarChart, Reference
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from .csv_export import iterate_async
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FILE_CHUNK_SIZE = 64 * 1024
+
+PRIMARY_COLOR = 'FF7755'
+
+THIN = Side(style='thin')
+BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+CENTER = Alignment(horizontal='center', vertical='center')
+
+
+def fill(color):
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+# name: (font, fill, border, alignment)
+STYLES = {
+    'title': (Font(name='Calibri', size=16, bold=True, color=PRIMARY_COLOR), None, None, None),
+    'section': (Font(name='Calibri', size=13, bold=True, color=PRIMARY_COLOR), None, None, None),
+    'note': (Font(name='Calibri', size=10, italic=True), None, None, None),
+    'header': (Font(name='Calibri', size=11, bold=True, color='FFFFFF'), fill(PRIMARY_COLOR), BORDER,
+               Alignment(horizontal='center', vertical='center', wrap_text=True)),
+    'subheader': (Font(name='Calibri', size=11, bold=True, color='FFFFFF'), fill('FFA07A'), BORDER, CENTER),
+    'cell': (Font(name='Calibri', size=10), None, BORDER, Alignment(vertical='center')),
+    'label': (Font(name='Calibri', size=10, bold=True), None, BORDER, Alignment(vertical='center')),
+    'number': (Font(name='Calibri', size=10), None, BORDER, CENTER),
+    'highlight': (Font(name='Calibri', size=11, bold=True), fill('E8F5E9'), BORDER, CENTER),
+    'ok': (Font(name='Calibri', size=10, bold=True), fill('C6EFCE'), BORDER, CENTER),
+    'ng': (Font(name='Calibri', size=10, bold=True), fill('FFC7CE'), BORDER, CENTER),
+    'pending': (Font(name='Calibri', size=10, bold=True), fill('FFEB9C'), BORDER, CENTER),
+    'shift_a': (Font(name='Calibri', size=10), fill('FFF9C4'), BORDER, CENTER),
+    'shift_b': (Font(name='Calibri', size=10), fill('BBDEFB'), BORDER, CENTER),
+    'shift_c': (Font(name='Calibri', size=10), fill('E1BEE7'), BORDER, CENTER),
+}
+
+STATUS_STYLES = {'OK': 'ok', 'NG': 'ng', 'Pending': 'pending'}
+
+
+def status_style(status):
+    return STATUS_STYLES.get(status, 'number')
+
+
+def new_workbook():
+    """Write-only workbook with STYLES registered"""
+    workbook = Workbook(write_only=True)
+    for name, (font, style_fill, border, alignment) in STYLES.items():
+        style = NamedStyle(name=name)
+        style.font = font
+        if style_fill:
+            style.fill = style_fill
+        if border:
+            style.border = border
+        if alignment:
+            style.alignment = alignment
+        workbook.add_named_style(style)
+    return workbook
+
+
+class ReportSheet:
+    """Write-only worksheet plus the row counter needed for merges and charts"""
+
+    def __init__(self, workbook, title, widths=(), freeze_panes=None):
+        self.sheet = workbook.create_sheet(title)
+        for col_idx, width in enumerate(widths, start=1):
+            self.sheet.column_dimensions[get_column_letter(col_idx)].width = width
+        if freeze_panes:
+            self.sheet.freeze_panes = freeze_panes
+        self.row = 0
+        self.styled = {}  # style name: the cell reused for every value in that style
+
+    def append(self, values, style='cell'):
+        """Append a row; style is one named style for every cell or one per column (None leaves a cell plain)"""
+        styles = [style] * len(values) if style is None or isinstance(style, str) else style
+        # Cells are serialised one by one as the generator is consumed, so each styled cell can be reused
+        self.sheet.append(self.cells(values, styles))
+        self.row += 1
+        return self.row
+
+    def cells(self, values, styles):
+        for value, style in zip(values, styles):
+            if style is None:
+                yield value
+                continue
+            cell = self.styled.get(style)
+            if cell is None:
+                cell = self.styled[style] = WriteOnlyCell(self.sheet)
+                cell.style = style
+            cell.value = value
+            yield cell
+
+    def heading(self, text, style='title', span=1):
+        """Single cell row, merged across span columns"""
+        row = self.append([text], style)
+        if span > 1:
+            self.sheet.merged_cells.add(f'A{row}:{get_column_letter(span)}{row}')
+        return row
+
+    def skip(self, rows=1):
+        for _ in range(rows):
+            self.sheet.append([])
+        self.row += rows
+
+    def bar_chart(self, title, header_row, last_row, min_col, max_col, anchor, stacked=False):
+        """Bar chart of columns min_col..max_col (titles in header_row), categories from column A"""
+        if last_row <= header_row:
+            return
+        chart = BarChart()
+        chart.title = title
+        chart.height = 8
+        chart.width = 18
+        if stacked:
+            chart.grouping = 'stacked'
+            chart.overlap = 100
+        chart.add_data(Reference(self.sheet, min_col=min_col, max_col=max_col, min_row=header_row, max_row=last_row),
+                       titles_from_data=True)
+        chart.set_categories(Reference(self.sheet, min_col=1, min_row=header_row + 1, max_row=last_row))
+        self.sheet.add_chart(chart, anchor)
+
+
+def file_chunks(file):
+    try:
+        while True:
+            chunk = file.read(FILE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        file.close()
+
+
+def file_response(request, file, filename, content_type):
+    """StreamingHttpResponse downloading an open binary file from its current position (closed at the end)"""
+    size = os.fstat(file.fileno()).st_size - file.tell()
+    chunks = file_chunks(file)
+    if isinstance(request, ASGIRequest):
+        chunks = iterate_async(chunks)
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Content-Length'] = size
+    return response
+
+
+def excel_response(request, workbook, filename):
+    """Download of workbook as filename.xlsx, saved to a temporary file first"""
+    file = tempfile.TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return file_response(request, file, f'{filename}.xlsx', XLSX_CONTENT_TYPE)
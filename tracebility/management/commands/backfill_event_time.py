@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from tracebility import models
+from tracebility.timestamps import to_event_time
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the event_time column from the raw timestamp string on every station table. "
+        "Only rows with an empty event_time are touched, so it is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows read and updated per batch (default: 2000)')
+        parser.add_argument('--table', action='append', dest='tables', default=[],
+                            help='Only backfill this db_table (can be given more than once)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        tables = set(options['tables'])
+
+        for model in models.EVENT_TIME_MODELS:
+            table = model._meta.db_table
+            if tables and table not in tables:
+                continue
+
+            updated = 0
+            unparsed = 0
+            last_id = 0
+
+            while True:
+                rows = list(
+                    model.objects.filter(event_time__isnull=True, id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', 'timestamp')[:batch_size]
+                )
+                if not rows:
+                    break
+
+                batch = []
+                for row_id, timestamp in rows:
+                    event_time = to_event_time(timestamp)
+                    if event_time is None:
+                        unparsed += 1
+                        continue
+                    batch.append(model(id=row_id, event_time=event_time))
+
+                if batch:
+                    model.objects.bulk_update(batch, ['event_time'])
+                    updated += len(batch)
+
+                last_id = rows[-1][0]
+
+            self.stdout.write(f"{table}: {updated} rows updated, {unparsed} unparseable")
+
+        self.stdout.write(self.style.SUCCESS('event_time backfill complete'))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from tracebility import models
+from tracebility.part_events import get_part_event_sources, build_part_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the part_event log from the existing station tables. "
+        "Rows that already have events are skipped, so it is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Station rows read per batch (default: 2000)')
+        parser.add_argument('--table', action='append', dest='tables', default=[],
+                            help='Only backfill this db_table (can be given more than once)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        tables = set(options['tables'])
+
+        for source in get_part_event_sources():
+            table = source['table']
+            if tables and table not in tables:
+                continue
+
+            columns = ['id', source['time_field']] + source['qr_fields']
+            if source['status_field']:
+                columns.append(source['status_field'])
+
+            created = 0
+            last_id = 0
+
+            while True:
+                rows = list(
+                    source['model'].objects.filter(id__gt=last_id)
+                    .order_by('id')
+                    .values(*columns)[:batch_size]
+                )
+                if not rows:
+                    break
+
+                # Skip rows already logged by the triggers / signals or an earlier run
+                logged = set(
+                    models.PartEvent.objects.filter(
+                        source_table=table, source_id__in=[row['id'] for row in rows]
+                    ).values_list('source_id', flat=True)
+                )
+
+                events = []
+                for row in rows:
+                    if row['id'] not in logged:
+                        events.extend(build_part_events(source, row))
+
+                if events:
+                    models.PartEvent.objects.bulk_create(events, batch_size=batch_size)
+                    created += len(events)
+
+                last_id = rows[-1]['id']
+
+            self.stdout.write(f"{table}: {created} events created")
+
+        self.stdout.write(self.style.SUCCESS('part_event backfill complete'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from tracebility.pairing import get_pairing_sources, pair_prep_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolve prep.post_id for every paired station from the QR join rules. "
+        "By default only unpaired rows are resolved, so it is safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Prep rows resolved per batch (default: 2000)')
+        parser.add_argument('--table', action='append', dest='tables', default=[],
+                            help='Only backfill this prep db_table (can be given more than once)')
+        parser.add_argument('--all', action='store_true', dest='recheck_all',
+                            help='Re-resolve rows that are already paired as well')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        tables = set(options['tables'])
+
+        for source in get_pairing_sources():
+            prep_model = source['prep_model']
+            table = prep_model._meta.db_table
+            if tables and table not in tables:
+                continue
+
+            queryset = prep_model.objects.all()
+            if not options['recheck_all']:
+                queryset = queryset.filter(post_id__isnull=True)
+
+            updated = 0
+            last_id = 0
+
+            while True:
+                rows = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+                if not rows:
+                    break
+
+                updated += pair_prep_rows(rows, source)
+                last_id = rows[-1].id
+
+            self.stdout.write(f"{table}: {updated} rows updated")
+
+        self.stdout.write(self.style.SUCCESS('post pairing backfill complete'))
@@ -0,0 +1,138 @@
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from tracebility.excel_export import ReportSheet, new_workbook, status_style
+from tracebility.monitoring_views import (
+    MONITORING_HEADERS,
+    monitoring_column_width,
+    monitoring_excel_row,
+)
+
+
+STATUSES = ['OK', 'OK', 'OK', 'OK', 'NG', 'Pending']
+
+
+def generate_records(count, seed):
+    """Monitoring records as describe_monitoring_row builds them, generated lazily"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, 6)
+    for i in range(count):
+        timestamp = (start + timedelta(seconds=i * 7)).isoformat()
+        record = {
+            'prep_id': i + 1, 'post_id': i + 1, 'machine_name': 'CNC1', 'display_name': 'DMG MORI 1 (OP-110A)',
+            'machine_type': 'standard', 'qr_code': f'QR{rng.randrange(10 ** 12):012d}', 'timestamp': timestamp,
+            'status': rng.choice(STATUSES), 'model_name': 'MODEL_A', 'previous_machine_status': 'OK',
+        }
+        if i % 3 == 0:
+            record.update(machine_name='Gauge1', machine_type='gauge', gauge_values={
+                f'value{v}': round(rng.uniform(9.9, 10.1), 4) for v in range(1, 7)
+            })
+        elif i % 3 == 1:
+            record.update(machine_name='OP40A', machine_type='assembly', qr_internal=record['qr_code'],
+                          qr_external=f'EX{i:010d}', qr_housing=f'HS{i:010d}', model_name_internal='MODEL_A',
+                          model_name_external='MODEL_A', model_name_housing='MODEL_A')
+        yield record
+
+
+def write_only(records, file):
+    """The monitoring export as written now"""
+    wb = new_workbook()
+    ws = ReportSheet(wb, "Monitoring Data", widths=[monitoring_column_width(h) for h in MONITORING_HEADERS],
+                     freeze_panes='F2')
+    ws.append(MONITORING_HEADERS, 'header')
+    status_col = MONITORING_HEADERS.index('Status')
+    styles = ['cell'] * len(MONITORING_HEADERS)
+    for record in records:
+        row = monitoring_excel_row(record)
+        styles[status_col] = status_style(row[status_col])
+        ws.append(row, styles)
+    wb.save(file)
+
+
+def per_cell(records, file):
+    """The previous monitoring export: a normal workbook styled cell by cell, then auto-fitted"""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Monitoring Data"
+    border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    status_fills = {
+        'OK': PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid"),
+        'NG': PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid"),
+        'Pending': PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid"),
+    }
+    for col_num, header in enumerate(MONITORING_HEADERS, 1):
+        cell = ws.cell(row=1, column=col_num, value=header)
+        cell.fill = PatternFill(start_color="FF7755", end_color="FF7755", fill_type="solid")
+        cell.font = Font(bold=True, color="FFFFFF", size=11)
+        cell.border = border
+    status_col = MONITORING_HEADERS.index('Status') + 1
+    for row_num, record in enumerate(list(records), 2):
+        for col_num, value in enumerate(monitoring_excel_row(record), 1):
+            cell = ws.cell(row=row_num, column=col_num, value=value)
+            cell.border = border
+            cell.alignment = Alignment(vertical="center")
+            if col_num == status_col:
+                if value in status_fills:
+                    cell.fill = status_fills[value]
+                cell.font = Font(bold=True)
+    for col_num in range(1, len(MONITORING_HEADERS) + 1):
+        column_letter = get_column_letter(col_num)
+        max_length = len(MONITORING_HEADERS[col_num - 1])
+        for cell in ws[column_letter][1:]:
+            if cell.value and str(cell.value) != '-':
+                max_length = max(max_length, len(str(cell.value)))
+        ws.column_dimensions[column_letter].width = min(max_length + 2, 40)
+    ws.freeze_panes = 'F2'
+    wb.save(file)
+
+
+WRITERS = {'per-cell': per_cell, 'write-only': write_only}
+
+
+def run_writer(label, count, seed):
+    """Run one writer in a fresh process: (seconds, peak RSS in bytes, file size)"""
+    started = time.perf_counter()
+    with tempfile.TemporaryFile() as file:
+        WRITERS[label](generate_records(count, seed), file)
+        size = file.tell()
+    seconds = time.perf_counter() - started
+    return seconds, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, size
+
+
+class Command(BaseCommand):
+    help = (
+        "Write generated monitoring records with the write-only Excel engine and with "
+        "the per-cell styled workbook it replaced, reporting time and peak memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000],
+                            help='Record counts to write (default: 10000 50000)')
+        parser.add_argument('--legacy-max', type=int, default=50000,
+                            help='Largest count to run the per-cell workbook on (default: 50000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the records')
+
+    def measure(self, label, count, seed):
+        # Each run gets its own process so the peak resident size is its own
+        with multiprocessing.get_context('fork').Pool(1) as pool:
+            seconds, peak, size = pool.apply(run_writer, (label, count, seed))
+        self.stdout.write(
+            f"{label:<10} {count:>8} rows  {seconds:7.2f}s  "
+            f"peak RSS {peak / 2 ** 20:7.1f} MiB  file {size / 2 ** 20:6.1f} MiB"
+        )
+        self.stdout.flush()
+
+    def handle(self, *args, **options):
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        self.stdout.write(f"before writing: peak RSS {baseline / 2 ** 20:.1f} MiB")
+        for count in options['rows']:
+            if count <= options['legacy_max']:
+                self.measure('per-cell', count, options['seed'])
+            self.measure('write-only', count, options['seed'])
@@ -0,0 +1,68 @@
+import gc
+import random
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from tracebility.timestamps import parse_slash_date, parse_timestamp_string, parse_timestamp_strptime, parse_timestamp_to_datetime
+
+
+# Share of each format in the generated sample (the gateways mostly send the first one)
+SAMPLE_FORMATS = [
+    ('%d/%m/%Y, %I:%M:%S %p', 50),
+    ('%m/%d/%Y, %I:%M:%S %p', 10),
+    ('%d/%m/%Y %H:%M:%S', 20),
+    ('%Y-%m-%d %H:%M:%S', 8),
+    ('%Y-%m-%d %H:%M:%S.%f', 5),
+    ('%d-%m-%Y %H:%M:%S', 5),
+    ('%Y-%m-%dT%H:%M:%S', 2),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time parse_timestamp_to_datetime against the strptime chain on generated "
+        "mixed-format timestamps and check both give identical results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000000,
+                            help='Timestamps to parse (default: 1000000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the sample')
+
+    def sample(self, count, seed):
+        rng = random.Random(seed)
+        formats = [fmt for fmt, weight in SAMPLE_FORMATS]
+        weights = [weight for fmt, weight in SAMPLE_FORMATS]
+        start = datetime(2025, 1, 1)
+        return [
+            (start + timedelta(seconds=rng.randrange(365 * 86400), microseconds=rng.randrange(1000000))).strftime(fmt)
+            for fmt in rng.choices(formats, weights, k=count)
+        ]
+
+    def timed(self, parse, timestamps):
+        # Like timeit: keep collector passes over the growing result list out of the timing
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            results = [parse(timestamp) for timestamp in timestamps]
+            return results, time.perf_counter() - started
+        finally:
+            gc.enable()
+
+    def handle(self, *args, **options):
+        timestamps = self.sample(options['count'], options['seed'])
+        self.stdout.write(f"{len(timestamps)} timestamps, {len(set(timestamps))} distinct")
+
+        expected, strptime_seconds = self.timed(parse_timestamp_strptime, timestamps)
+        parse_timestamp_string.cache_clear()
+        parse_slash_date.cache_clear()
+        results, fast_seconds = self.timed(parse_timestamp_to_datetime, timestamps)
+
+        mismatches = sum(1 for a, b in zip(expected, results) if a != b)
+        self.stdout.write(f"strptime chain: {strptime_seconds:.2f}s")
+        self.stdout.write(f"fixed-width:    {fast_seconds:.2f}s ({strptime_seconds / fast_seconds:.1f}x)")
+
+        if mismatches:
+            raise CommandError(f"{mismatches} timestamps parsed differently")
+        self.stdout.write(self.style.SUCCESS('results identical'))
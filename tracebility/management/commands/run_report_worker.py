@@ -0,0 +1,54 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from tracebility.report_jobs import (
+    STALE_JOB_SECONDS,
+    claim_next_job,
+    purge_finished_jobs,
+    requeue_stale_jobs,
+    run_job,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Build queued report jobs (heavy CSV / Excel exports) into REPORTS_DIR. "
+        "Run one or more workers next to the web server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Work through the queue, then exit (default: keep polling)')
+        parser.add_argument('--poll', type=float, default=2,
+                            help='Seconds to wait when the queue is empty (default: 2)')
+        parser.add_argument('--keep-days', type=int, default=7,
+                            help='Delete finished jobs and their files after N days (default: 7)')
+        parser.add_argument('--stale-after', type=int, default=STALE_JOB_SECONDS,
+                            help=f'Queue again running jobs whose worker sent no heartbeat for N seconds (default: {STALE_JOB_SECONDS})')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            requeued = requeue_stale_jobs(options['stale_after'])
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"queued {requeued} stale jobs again"))
+
+            job = claim_next_job()
+            if job is None:
+                purged = purge_finished_jobs(options['keep_days'])
+                if purged:
+                    self.stdout.write(f"removed {purged} finished jobs")
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+
+            started = time.monotonic()
+            self.stdout.write(f"job {job.id}: {job.kind} {job.params}")
+            run_job(job)
+            if job.status == job.DONE:
+                self.stdout.write(self.style.SUCCESS(
+                    f"job {job.id}: done in {time.monotonic() - started:.1f}s, {job.size} bytes"
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f"job {job.id}: {job.error}"))
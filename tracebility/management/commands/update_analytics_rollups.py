@@ -0,0 +1,55 @@
+import time
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from tracebility.models import RollupWatermark
+from tracebility.rollups import EVENT_SETTLE_SECONDS, ROLLUP_WATERMARK, rebuild_all_rollups, update_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the hourly analytics rollups up to date from the part_event log. "
+        "The first run (or --rebuild) recomputes every station from the station tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute the rollups from the station tables instead of catching up')
+        parser.add_argument('--start-date', help='First day to rebuild (YYYY-MM-DD, with --rebuild)')
+        parser.add_argument('--end-date', help='Last day to rebuild (YYYY-MM-DD, with --rebuild)')
+        parser.add_argument('--batch-size', type=int, default=50000,
+                            help='part_event rows read per catch-up run (default: 50000)')
+        parser.add_argument('--settle-seconds', type=int, default=EVENT_SETTLE_SECONDS,
+                            help='Only consume part_event rows at least this old '
+                                 f'(default: {EVENT_SETTLE_SECONDS})')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running, catching up every N seconds (default: run once)')
+
+    def parse_day(self, value):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        first_day = self.parse_day(options['start_date'])
+        last_day = self.parse_day(options['end_date'])
+        rebuild = options['rebuild'] or not RollupWatermark.objects.filter(
+            name=ROLLUP_WATERMARK, covered_until__isnull=False
+        ).exists()
+
+        while True:
+            if rebuild:
+                rows = rebuild_all_rollups(first_day, last_day)
+                self.stdout.write(f"rebuilt: {rows} rollup rows written")
+                rebuild = False
+            else:
+                events, station_days = update_rollups(options['batch_size'], options['settle_seconds'])
+                self.stdout.write(f"caught up: {events} events, {station_days} station-days recomputed")
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('analytics rollups up to date'))
@@ -0,0 +1,132 @@
+# Fills event_time for rows inserted or updated outside the Django ORM (PLC gateways).
+# PostgreSQL only; on other backends the pre_save signal and the
+# backfill_event_time command cover the column.
+
+from django.conf import settings
+from django.db import migrations
+
+
+EVENT_TIME_TABLES = [
+    "cnc1_preprocessing", "cnc1_postprocessing",
+    "cnc2_preprocessing", "cnc2_postprocessing",
+    "cnc3_preprocessing", "cnc3_postprocessing",
+    "cnc4_preprocessing", "cnc4_postprocessing",
+    "cnc5_preprocessing", "cnc5_postprocessing",
+    "cnc6_preprocessing", "cnc6_postprocessing",
+    "gauge1_preprocessing", "gauge1_postprocessing",
+    "gauge2_preprocessing", "gauge2_postprocessing",
+    "gauge3_preprocessing", "gauge3_postprocessing",
+    "honing1_preprocessing", "honing1_postprocessing",
+    "honing2_preprocessing", "honing2_postprocessing",
+    "deburring_preprocessing", "deburring_postprocessing",
+    "prewashing_preprocessing", "prewashing_postprocessing",
+    "finalwashing_preprocessing", "finalwashing_postprocessing",
+    "op80_preprocessing", "op80_postprocessing",
+    "painting_preprocessing", "painting_postprocessing",
+    "lub_preprocessing", "lub_postprocessing",
+]
+
+# Same formats, in the same order, as parse_timestamp_to_datetime()
+PARSE_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION tracebility_parse_event_time(value text)
+RETURNS timestamptz AS $$
+DECLARE
+    local_tz text := '%(time_zone)s';
+BEGIN
+    IF value IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF value ~ '^\d{1,2}/\d{1,2}/\d{4} \d{1,2}:\d{2}:\d{2}$' THEN
+        BEGIN
+            RETURN to_timestamp(value, 'DD/MM/YYYY HH24:MI:SS')::timestamp AT TIME ZONE local_tz;
+        EXCEPTION WHEN others THEN NULL;
+        END;
+    END IF;
+
+    IF value ~* '^\d{1,2}/\d{1,2}/\d{4}, \d{1,2}:\d{2}:\d{2} [AP]M$' THEN
+        BEGIN
+            RETURN to_timestamp(value, 'DD/MM/YYYY, HH12:MI:SS AM')::timestamp AT TIME ZONE local_tz;
+        EXCEPTION WHEN others THEN NULL;
+        END;
+        BEGIN
+            RETURN to_timestamp(value, 'MM/DD/YYYY, HH12:MI:SS AM')::timestamp AT TIME ZONE local_tz;
+        EXCEPTION WHEN others THEN NULL;
+        END;
+    END IF;
+
+    IF value ~ '^\d{4}-\d{1,2}-\d{1,2} \d{1,2}:\d{2}:\d{2}(\.\d+)?$' THEN
+        BEGIN
+            RETURN value::timestamp AT TIME ZONE local_tz;
+        EXCEPTION WHEN others THEN NULL;
+        END;
+    END IF;
+
+    IF value ~ '^\d{1,2}-\d{1,2}-\d{4} \d{1,2}:\d{2}:\d{2}$' THEN
+        BEGIN
+            RETURN to_timestamp(value, 'DD-MM-YYYY HH24:MI:SS')::timestamp AT TIME ZONE local_tz;
+        EXCEPTION WHEN others THEN NULL;
+        END;
+        BEGIN
+            RETURN to_timestamp(value, 'MM-DD-YYYY HH24:MI:SS')::timestamp AT TIME ZONE local_tz;
+        EXCEPTION WHEN others THEN NULL;
+        END;
+    END IF;
+
+    IF value ~ '^\d{4}-\d{2}-\d{2}T' THEN
+        BEGIN
+            IF value ~ '(Z|[+-]\d{2}(:?\d{2})?)$' THEN
+                RETURN value::timestamptz;
+            END IF;
+            RETURN value::timestamp AT TIME ZONE local_tz;
+        EXCEPTION WHEN others THEN NULL;
+        END;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION tracebility_set_event_time()
+RETURNS trigger AS $$
+BEGIN
+    -- Inserts keep an explicit event_time; updates follow a changed timestamp
+    IF TG_OP = 'UPDATE' AND NEW.timestamp IS DISTINCT FROM OLD.timestamp OR NEW.event_time IS NULL THEN
+        NEW.event_time := tracebility_parse_event_time(NEW.timestamp);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(PARSE_FUNCTION_SQL % {"time_zone": settings.TIME_ZONE})
+    for table in EVENT_TIME_TABLES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_event_time ON {table}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_event_time BEFORE INSERT OR UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION tracebility_set_event_time()"
+        )
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in EVENT_TIME_TABLES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_event_time ON {table}")
+    schema_editor.execute("DROP FUNCTION IF EXISTS tracebility_set_event_time()")
+    schema_editor.execute("DROP FUNCTION IF EXISTS tracebility_parse_event_time(text)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0003_cnc1postprocessing_event_time_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -0,0 +1,158 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0004_event_time_trigger"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="cnc1postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc1preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc2postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc2preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc3postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc3preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc4postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc4preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc5postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc5preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc6postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="cnc6preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="deburringpostprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="deburringpreprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="finalwashingpostprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="finalwashingpreprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="gauge1postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="gauge1preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="gauge2postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="gauge2preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="gauge3postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="gauge3preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="honing1postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="honing1preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="honing2postprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="honing2preprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="paintingpostprocessing",
+            name="qr_data_housing",
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name="prewashingpostprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="prewashingpreprocessing",
+            name="qr_data",
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+    ]
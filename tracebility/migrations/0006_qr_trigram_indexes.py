@@ -0,0 +1,95 @@
+# Trigram (pg_trgm) GIN indexes for partial QR code searches.
+# Django compiles __icontains on PostgreSQL to UPPER(column::text) LIKE UPPER(%s),
+# so the indexes are built on that same expression. Built CONCURRENTLY so the
+# PLC gateways can keep writing while they are created. PostgreSQL only. If the
+# server has no pg_trgm package the indexes are skipped with a logged warning and
+# the searches run unindexed; any other error (e.g. the migration user may not
+# create the extension) fails the migration.
+
+import logging
+
+from django.db import migrations
+
+
+logger = logging.getLogger(__name__)
+
+
+QR_SEARCH_COLUMNS = [
+    ("cnc1_preprocessing", ["qr_data"]),
+    ("cnc1_postprocessing", ["qr_data"]),
+    ("cnc2_preprocessing", ["qr_data"]),
+    ("cnc2_postprocessing", ["qr_data"]),
+    ("cnc3_preprocessing", ["qr_data"]),
+    ("cnc3_postprocessing", ["qr_data"]),
+    ("cnc4_preprocessing", ["qr_data"]),
+    ("cnc4_postprocessing", ["qr_data"]),
+    ("cnc5_preprocessing", ["qr_data"]),
+    ("cnc5_postprocessing", ["qr_data"]),
+    ("cnc6_preprocessing", ["qr_data"]),
+    ("cnc6_postprocessing", ["qr_data"]),
+    ("gauge1_preprocessing", ["qr_data"]),
+    ("gauge1_postprocessing", ["qr_data"]),
+    ("gauge2_preprocessing", ["qr_data"]),
+    ("gauge2_postprocessing", ["qr_data"]),
+    ("gauge3_preprocessing", ["qr_data"]),
+    ("gauge3_postprocessing", ["qr_data"]),
+    ("honing1_preprocessing", ["qr_data"]),
+    ("honing1_postprocessing", ["qr_data"]),
+    ("honing2_preprocessing", ["qr_data"]),
+    ("honing2_postprocessing", ["qr_data"]),
+    ("deburring_preprocessing", ["qr_data"]),
+    ("deburring_postprocessing", ["qr_data"]),
+    ("prewashing_preprocessing", ["qr_data"]),
+    ("prewashing_postprocessing", ["qr_data"]),
+    ("finalwashing_preprocessing", ["qr_data"]),
+    ("finalwashing_postprocessing", ["qr_data"]),
+    ("op40a_processing", ["qr_data_internal", "qr_data_external", "qr_data_housing"]),
+    ("op40b_processing", ["qr_data_internal", "qr_data_external", "qr_data_housing"]),
+    ("op40c_processing", ["qr_data_internal", "qr_data_external", "qr_data_housing"]),
+    ("op40d_processing", ["qr_data_internal", "qr_data_external", "qr_data_housing"]),
+    ("op80_preprocessing", ["qr_data_piston", "qr_data_housing"]),
+    ("op80_postprocessing", ["qr_data_housing_new", "qr_data_housing"]),
+    ("painting_preprocessing", ["qr_data_housing", "qr_data_piston"]),
+    ("painting_postprocessing", ["qr_data_piston", "qr_data_housing"]),
+    ("lub_preprocessing", ["qr_data_piston", "qr_data_housing"]),
+    ("lub_postprocessing", ["qr_data_piston"]),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        available = cursor.fetchone()
+    if not available:
+        logger.warning("pg_trgm is not installed on the server, skipping trigram QR indexes")
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, columns in QR_SEARCH_COLUMNS:
+        for column in columns:
+            schema_editor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{column}_trgm "
+                f"ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)"
+            )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, columns in QR_SEARCH_COLUMNS:
+        for column in columns:
+            schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {table}_{column}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("tracebility", "0005_alter_cnc1postprocessing_qr_data_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
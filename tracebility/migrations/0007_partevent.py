@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0006_qr_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PartEvent",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("qr", models.CharField(max_length=100)),
+                ("qr_role", models.CharField(max_length=30)),
+                ("op_code", models.CharField(max_length=20)),
+                ("stage", models.CharField(max_length=10)),
+                ("status", models.CharField(blank=True, max_length=20, null=True)),
+                ("event_time", models.DateTimeField(blank=True, null=True)),
+                ("source_table", models.CharField(max_length=50)),
+                ("source_id", models.IntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "part_event",
+                "ordering": ["-id"],
+                "managed": True,
+                "indexes": [models.Index(fields=["qr", "event_time"], name="part_event_qr_time_idx"), models.Index(fields=["source_table", "source_id"], name="part_event_source_idx")],
+            },
+        ),
+    ]
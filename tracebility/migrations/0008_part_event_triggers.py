@@ -0,0 +1,120 @@
+# Writes part_event rows from triggers on every station table so inserts and
+# status changes from the PLC gateways are logged as well as ORM writes.
+# PostgreSQL only; on other backends the post_save handler in signals.py
+# writes the rows. Existing rows are filled by the backfill_part_events command.
+
+from django.db import migrations
+
+
+# (table, op_code, stage, status column, time column, QR columns)
+PART_EVENT_SOURCES = [
+    ("cnc1_preprocessing", "op-110A", "pre", None, "event_time", ["qr_data"]),
+    ("cnc1_postprocessing", "op-110A", "post", "status", "event_time", ["qr_data"]),
+    ("cnc2_preprocessing", "op-110B", "pre", None, "event_time", ["qr_data"]),
+    ("cnc2_postprocessing", "op-110B", "post", "status", "event_time", ["qr_data"]),
+    ("cnc3_preprocessing", "op-130D", "pre", None, "event_time", ["qr_data"]),
+    ("cnc3_postprocessing", "op-130D", "post", "status", "event_time", ["qr_data"]),
+    ("cnc4_preprocessing", "op-130C", "pre", None, "event_time", ["qr_data"]),
+    ("cnc4_postprocessing", "op-130C", "post", "status", "event_time", ["qr_data"]),
+    ("cnc5_preprocessing", "op-130B", "pre", None, "event_time", ["qr_data"]),
+    ("cnc5_postprocessing", "op-130B", "post", "status", "event_time", ["qr_data"]),
+    ("cnc6_preprocessing", "op-130A", "pre", None, "event_time", ["qr_data"]),
+    ("cnc6_postprocessing", "op-130A", "post", "status", "event_time", ["qr_data"]),
+    ("gauge1_preprocessing", "op-115", "pre", None, "event_time", ["qr_data"]),
+    ("gauge1_postprocessing", "op-115", "post", "status", "event_time", ["qr_data"]),
+    ("gauge2_preprocessing", "op-135B", "pre", None, "event_time", ["qr_data"]),
+    ("gauge2_postprocessing", "op-135B", "post", "status", "event_time", ["qr_data"]),
+    ("gauge3_preprocessing", "op-135A", "pre", None, "event_time", ["qr_data"]),
+    ("gauge3_postprocessing", "op-135A", "post", "status", "event_time", ["qr_data"]),
+    ("honing1_preprocessing", "op-140A", "pre", None, "event_time", ["qr_data"]),
+    ("honing1_postprocessing", "op-140A", "post", "status", "event_time", ["qr_data"]),
+    ("honing2_preprocessing", "op-140B", "pre", None, "event_time", ["qr_data"]),
+    ("honing2_postprocessing", "op-140B", "post", "status", "event_time", ["qr_data"]),
+    ("prewashing_preprocessing", "op-150", "pre", "status", "event_time", ["qr_data"]),
+    ("prewashing_postprocessing", "op-150", "post", "status", "event_time", ["qr_data"]),
+    ("deburring_preprocessing", "op-160", "pre", None, "event_time", ["qr_data"]),
+    ("deburring_postprocessing", "op-160", "post", "status", "event_time", ["qr_data"]),
+    ("finalwashing_preprocessing", "op-170", "pre", "status", "event_time", ["qr_data"]),
+    ("finalwashing_postprocessing", "op-170", "post", "status", "event_time", ["qr_data"]),
+    ("painting_preprocessing", "op-85", "pre", None, "event_time", ["qr_data_housing", "qr_data_piston"]),
+    ("painting_postprocessing", "op-85", "post", "status", "event_time", ["qr_data_piston", "qr_data_housing"]),
+    ("lub_preprocessing", "op-90", "pre", None, "event_time", ["qr_data_piston", "qr_data_housing"]),
+    ("lub_postprocessing", "op-90", "post", "status", "event_time", ["qr_data_piston"]),
+    ("op40a_processing", "op-40A", "assembly", "status", "timestamp_internal", ["qr_data_internal", "qr_data_external", "qr_data_housing"]),
+    ("op40b_processing", "op-40B", "assembly", "status", "timestamp_internal", ["qr_data_internal", "qr_data_external", "qr_data_housing"]),
+    ("op40c_processing", "op-40C", "assembly", "status", "timestamp_internal", ["qr_data_internal", "qr_data_external", "qr_data_housing"]),
+    ("op40d_processing", "op-40D", "assembly", "status", "timestamp_internal", ["qr_data_internal", "qr_data_external", "qr_data_housing"]),
+    ("op80_preprocessing", "op-80", "pre", None, "event_time", ["qr_data_piston", "qr_data_housing"]),
+    ("op80_postprocessing", "op-80", "post", "status", "event_time", ["qr_data_housing_new", "qr_data_housing"]),
+]
+
+RECORD_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION tracebility_record_part_event()
+RETURNS trigger AS $$
+DECLARE
+    new_row jsonb := to_jsonb(NEW);
+    op_code text := TG_ARGV[0];
+    stage text := TG_ARGV[1];
+    status_column text := NULLIF(TG_ARGV[2], '');
+    time_column text := TG_ARGV[3];
+    new_status text;
+    qr_column text;
+BEGIN
+    IF status_column IS NOT NULL THEN
+        new_status := new_row ->> status_column;
+    END IF;
+
+    -- Updates are only logged when the status actually changed
+    IF TG_OP = 'UPDATE' THEN
+        IF status_column IS NULL OR new_status IS NOT DISTINCT FROM (to_jsonb(OLD) ->> status_column) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    FOREACH qr_column IN ARRAY TG_ARGV[4:] LOOP
+        IF COALESCE(new_row ->> qr_column, '') <> '' THEN
+            INSERT INTO part_event (qr, qr_role, op_code, stage, status, event_time, source_table, source_id, created_at)
+            VALUES (
+                new_row ->> qr_column, qr_column, op_code, stage, new_status,
+                (new_row ->> time_column)::timestamptz, TG_TABLE_NAME, NEW.id, now()
+            );
+        END IF;
+    END LOOP;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(RECORD_FUNCTION_SQL)
+    for table, op_code, stage, status_column, time_column, qr_columns in PART_EVENT_SOURCES:
+        events = "INSERT OR UPDATE OF status" if status_column else "INSERT"
+        args = ", ".join(f"'{arg}'" for arg in [op_code, stage, status_column or "", time_column] + qr_columns)
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_part_event ON {table}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_part_event AFTER {events} ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION tracebility_record_part_event({args})"
+        )
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, *_ in PART_EVENT_SOURCES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_part_event ON {table}")
+    schema_editor.execute("DROP FUNCTION IF EXISTS tracebility_record_part_event()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0007_partevent"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0008_part_event_triggers"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cnc1preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.cnc1postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="cnc2preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.cnc2postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="cnc3preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.cnc3postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="cnc4preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.cnc4postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="cnc5preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.cnc5postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="cnc6preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.cnc6postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="deburringpreprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.deburringpostprocessing"),
+        ),
+        migrations.AddField(
+            model_name="gauge1preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.gauge1postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="gauge2preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.gauge2postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="gauge3preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.gauge3postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="honing1preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.honing1postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="honing2preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.honing2postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="lubpreprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.lubpostprocessing"),
+        ),
+        migrations.AddField(
+            model_name="op80preprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.op80postprocessing"),
+        ),
+        migrations.AddField(
+            model_name="paintingpreprocessing",
+            name="post",
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name="+", to="tracebility.paintingpostprocessing"),
+        ),
+    ]
@@ -0,0 +1,141 @@
+# Keeps prep.post_id pointing at the matching postprocessing row for every
+# writer, including inserts from the PLC gateways. Rules are tried in order
+# and the newest matching post wins, the same as the dashboard read paths.
+# PostgreSQL only; on other backends the handlers in signals.py keep the
+# pairing current for ORM saves. Existing rows are paired by the
+# backfill_post_pairing command.
+
+from django.db import migrations
+
+
+# (prep table, post table, [(prep column, post column), ...])
+PAIRING_SOURCES = [
+    ("cnc1_preprocessing", "cnc1_postprocessing", [("qr_data", "qr_data")]),
+    ("cnc2_preprocessing", "cnc2_postprocessing", [("qr_data", "qr_data")]),
+    ("cnc3_preprocessing", "cnc3_postprocessing", [("qr_data", "qr_data")]),
+    ("cnc4_preprocessing", "cnc4_postprocessing", [("qr_data", "qr_data")]),
+    ("cnc5_preprocessing", "cnc5_postprocessing", [("qr_data", "qr_data")]),
+    ("cnc6_preprocessing", "cnc6_postprocessing", [("qr_data", "qr_data")]),
+    ("gauge1_preprocessing", "gauge1_postprocessing", [("qr_data", "qr_data")]),
+    ("gauge2_preprocessing", "gauge2_postprocessing", [("qr_data", "qr_data")]),
+    ("gauge3_preprocessing", "gauge3_postprocessing", [("qr_data", "qr_data")]),
+    ("honing1_preprocessing", "honing1_postprocessing", [("qr_data", "qr_data")]),
+    ("honing2_preprocessing", "honing2_postprocessing", [("qr_data", "qr_data")]),
+    ("deburring_preprocessing", "deburring_postprocessing", [("qr_data", "qr_data")]),
+    ("painting_preprocessing", "painting_postprocessing", [("qr_data_housing", "qr_data_housing")]),
+    ("lub_preprocessing", "lub_postprocessing", [("qr_data_piston", "qr_data_piston")]),
+    ("op80_preprocessing", "op80_postprocessing", [("qr_data_housing", "qr_data_housing"), ("qr_data_housing", "qr_data_housing_new"), ("qr_data_piston", "qr_data_housing")]),
+]
+
+PAIRING_FUNCTIONS_SQL = r"""
+CREATE OR REPLACE FUNCTION tracebility_resolve_post(post_table text, rules text[], prep_row jsonb)
+RETURNS integer AS $$
+DECLARE
+    qr text;
+    found_id integer;
+    i integer;
+BEGIN
+    -- rules is a flat array of (prep column, post column) pairs
+    FOR i IN 1 .. COALESCE(array_length(rules, 1), 0) BY 2 LOOP
+        qr := prep_row ->> rules[i];
+        IF COALESCE(qr, '') <> '' THEN
+            EXECUTE format('SELECT max(id) FROM %I WHERE %I = $1', post_table, rules[i + 1])
+                INTO found_id USING qr;
+            IF found_id IS NOT NULL THEN
+                RETURN found_id;
+            END IF;
+        END IF;
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION tracebility_pair_prep()
+RETURNS trigger AS $$
+BEGIN
+    NEW.post_id := tracebility_resolve_post(TG_ARGV[0], TG_ARGV[1:], to_jsonb(NEW));
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION tracebility_pair_post()
+RETURNS trigger AS $$
+DECLARE
+    prep_table text := TG_ARGV[0];
+    rules text[] := TG_ARGV[1:];
+    new_row jsonb;
+    qr text;
+    i integer;
+BEGIN
+    -- Prep rows paired with the old version of this post row
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        EXECUTE format(
+            'UPDATE %I AS p SET post_id = tracebility_resolve_post($1, $2, to_jsonb(p)) WHERE p.post_id = $3',
+            prep_table
+        ) USING TG_TABLE_NAME::text, rules, OLD.id;
+    END IF;
+
+    -- Prep rows the new version of this post row can match
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        new_row := to_jsonb(NEW);
+        FOR i IN 1 .. COALESCE(array_length(rules, 1), 0) BY 2 LOOP
+            qr := new_row ->> rules[i + 1];
+            IF COALESCE(qr, '') <> '' THEN
+                EXECUTE format(
+                    'UPDATE %I AS p SET post_id = tracebility_resolve_post($1, $2, to_jsonb(p)) WHERE p.%I = $3',
+                    prep_table, rules[i]
+                ) USING TG_TABLE_NAME::text, rules, qr;
+            END IF;
+        END LOOP;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(PAIRING_FUNCTIONS_SQL, params=None)
+    for prep_table, post_table, rules in PAIRING_SOURCES:
+        rule_args = [column for rule in rules for column in rule]
+        prep_columns = ", ".join(dict.fromkeys(prep for prep, _ in rules))
+        post_columns = ", ".join(dict.fromkeys(post for _, post in rules))
+
+        args = ", ".join(f"'{arg}'" for arg in [post_table] + rule_args)
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {prep_table}_pair_post ON {prep_table}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {prep_table}_pair_post BEFORE INSERT OR UPDATE OF {prep_columns} ON {prep_table} "
+            f"FOR EACH ROW EXECUTE FUNCTION tracebility_pair_prep({args})"
+        )
+
+        args = ", ".join(f"'{arg}'" for arg in [prep_table] + rule_args)
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {post_table}_pair_prep ON {post_table}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {post_table}_pair_prep AFTER INSERT OR UPDATE OF {post_columns} OR DELETE ON {post_table} "
+            f"FOR EACH ROW EXECUTE FUNCTION tracebility_pair_post({args})"
+        )
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for prep_table, post_table, rules in PAIRING_SOURCES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {prep_table}_pair_post ON {prep_table}")
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {post_table}_pair_prep ON {post_table}")
+    schema_editor.execute("DROP FUNCTION IF EXISTS tracebility_pair_post()")
+    schema_editor.execute("DROP FUNCTION IF EXISTS tracebility_pair_prep()")
+    schema_editor.execute("DROP FUNCTION IF EXISTS tracebility_resolve_post(text, text[], jsonb)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0009_cnc1preprocessing_post_cnc2preprocessing_post_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
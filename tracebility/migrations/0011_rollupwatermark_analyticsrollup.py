@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0010_post_pairing_triggers"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("last_event_id", models.BigIntegerField(default=0)),
+                ("covered_until", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "rollup_watermark",
+                "managed": True,
+            },
+        ),
+        migrations.CreateModel(
+            name="AnalyticsRollup",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("station", models.CharField(max_length=50)),
+                ("op_code", models.CharField(max_length=20)),
+                ("production_date", models.DateField()),
+                ("hour", models.SmallIntegerField()),
+                ("shift", models.CharField(max_length=1)),
+                ("model_name", models.CharField(blank=True, max_length=50, null=True)),
+                ("status", models.CharField(blank=True, max_length=20, null=True)),
+                ("count", models.IntegerField(default=0)),
+                ("cycle_time_sum", models.FloatField(default=0)),
+                ("cycle_time_count", models.IntegerField(default=0)),
+            ],
+            options={
+                "db_table": "analytics_rollup",
+                "managed": True,
+                "indexes": [models.Index(fields=["production_date", "station"], name="analytics_rollup_date_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# NOTIFY tracebility_changes with "<table>:<id>" whenever a station row is
+# inserted or updated, so the SSE streams can wait for changes instead of
+# polling COUNT(*) (see change_feed.py). PostgreSQL only; other backends
+# fall back to the max(id) poller in change_feed.py.
+
+from django.db import migrations
+
+
+STATION_TABLES = [
+    "cnc1_preprocessing", "cnc1_postprocessing",
+    "cnc2_preprocessing", "cnc2_postprocessing",
+    "cnc3_preprocessing", "cnc3_postprocessing",
+    "cnc4_preprocessing", "cnc4_postprocessing",
+    "cnc5_preprocessing", "cnc5_postprocessing",
+    "cnc6_preprocessing", "cnc6_postprocessing",
+    "gauge1_preprocessing", "gauge1_postprocessing",
+    "gauge2_preprocessing", "gauge2_postprocessing",
+    "gauge3_preprocessing", "gauge3_postprocessing",
+    "honing1_preprocessing", "honing1_postprocessing",
+    "honing2_preprocessing", "honing2_postprocessing",
+    "prewashing_preprocessing", "prewashing_postprocessing",
+    "deburring_preprocessing", "deburring_postprocessing",
+    "finalwashing_preprocessing", "finalwashing_postprocessing",
+    "painting_preprocessing", "painting_postprocessing",
+    "lub_preprocessing", "lub_postprocessing",
+    "op40a_processing", "op40b_processing", "op40c_processing", "op40d_processing",
+    "op80_preprocessing", "op80_postprocessing",
+]
+
+NOTIFY_FUNCTION_SQL = r"""
+CREATE OR REPLACE FUNCTION tracebility_notify_change()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('tracebility_changes', TG_TABLE_NAME || ':' || NEW.id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def create_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(NOTIFY_FUNCTION_SQL)
+    for table in STATION_TABLES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table}")
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_notify_change AFTER INSERT OR UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION tracebility_notify_change()"
+        )
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in STATION_TABLES:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_notify_change ON {table}")
+    schema_editor.execute("DROP FUNCTION IF EXISTS tracebility_notify_change()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0011_rollupwatermark_analyticsrollup"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0012_change_notify_triggers"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReportJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(max_length=30)),
+                ("params", models.JSONField(default=dict)),
+                ("params_hash", models.CharField(max_length=64)),
+                ("status", models.CharField(choices=[("queued", "Queued"), ("running", "Running"), ("done", "Done"), ("failed", "Failed")], default="queued", max_length=10)),
+                ("file_name", models.CharField(blank=True, default="", max_length=255)),
+                ("download_name", models.CharField(blank=True, default="", max_length=255)),
+                ("size", models.BigIntegerField(blank=True, null=True)),
+                ("error", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "db_table": "report_job",
+                "ordering": ["-id"],
+                "managed": True,
+                "indexes": [models.Index(fields=["status", "id"], name="report_job_status_idx")],
+                "constraints": [models.UniqueConstraint(condition=models.Q(("status__in", ["queued", "running"])), fields=("params_hash",), name="report_job_active_unique")],
+            },
+        ),
+    ]
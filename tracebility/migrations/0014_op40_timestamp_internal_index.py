@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0013_reportjob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="op40aprocessing",
+            name="timestamp_internal",
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="op40bprocessing",
+            name="timestamp_internal",
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="op40cprocessing",
+            name="timestamp_internal",
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="op40dprocessing",
+            name="timestamp_internal",
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
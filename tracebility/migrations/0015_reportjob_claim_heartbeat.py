@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:52
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_heartbeats(apps, schema_editor):
+    # Jobs running at upgrade time count from their start, as stale jobs did before
+    ReportJob = apps.get_model("tracebility", "ReportJob")
+    ReportJob.objects.filter(status="running").update(heartbeat_at=F("started_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tracebility", "0014_op40_timestamp_internal_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reportjob",
+            name="claim_token",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="reportjob",
+            name="heartbeat_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_heartbeats, migrations.RunPython.noop),
+    ]
@@ -8,8 +8,10 @@ from django.db import models
 class Cnc1Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Cnc1Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
     machine_name = models.CharField(max_length=50)
-    qr_data = models.CharField(max_length=100)
+    qr_data = models.CharField(max_length=100, db_index=True)
     model_name = models.CharField(max_length=20)
 
     class Meta:
@@ -24,7 +26,8 @@ class Cnc1Preprocessing(models.Model):
 class Cnc1Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -42,8 +45,10 @@ class Cnc1Postprocessing(models.Model):
 class Cnc2Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Cnc2Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
     machine_name = models.CharField(max_length=50)
-    qr_data = models.CharField(max_length=100)
+    qr_data = models.CharField(max_length=100, db_index=True)
     model_name = models.CharField(max_length=20)
 
     class Meta:
@@ -58,7 +63,8 @@ class Cnc2Preprocessing(models.Model):
 class Cnc2Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -76,8 +82,10 @@ class Cnc2Postprocessing(models.Model):
 class Cnc3Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Cnc3Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
     machine_name = models.CharField(max_length=50)
-    qr_data = models.CharField(max_length=100)
+    qr_data = models.CharField(max_length=100, db_index=True)
     model_name = models.CharField(max_length=20)
 
     class Meta:
@@ -92,7 +100,8 @@ class Cnc3Preprocessing(models.Model):
 class Cnc3Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -110,8 +119,10 @@ class Cnc3Postprocessing(models.Model):
 class Cnc4Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Cnc4Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
     machine_name = models.CharField(max_length=50)
-    qr_data = models.CharField(max_length=100)
+    qr_data = models.CharField(max_length=100, db_index=True)
     model_name = models.CharField(max_length=20)
 
     class Meta:
@@ -126,7 +137,8 @@ class Cnc4Preprocessing(models.Model):
 class Cnc4Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -144,8 +156,10 @@ class Cnc4Postprocessing(models.Model):
 class Cnc5Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Cnc5Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
     machine_name = models.CharField(max_length=50)
-    qr_data = models.CharField(max_length=100)
+    qr_data = models.CharField(max_length=100, db_index=True)
     model_name = models.CharField(max_length=20)
 
     class Meta:
@@ -160,7 +174,8 @@ class Cnc5Preprocessing(models.Model):
 class Cnc5Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -178,8 +193,10 @@ class Cnc5Postprocessing(models.Model):
 class Cnc6Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Cnc6Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
     machine_name = models.CharField(max_length=50)
-    qr_data = models.CharField(max_length=100)
+    qr_data = models.CharField(max_length=100, db_index=True)
     model_name = models.CharField(max_length=20)
 
     class Meta:
@@ -194,7 +211,8 @@ class Cnc6Preprocessing(models.Model):
 class Cnc6Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -216,7 +234,9 @@ class Cnc6Postprocessing(models.Model):
 class Gauge1Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Gauge1Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
 
@@ -232,7 +252,8 @@ class Gauge1Preprocessing(models.Model):
 class Gauge1Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     value1 = models.FloatField(blank=True, null=True)
     value2 = models.FloatField(blank=True, null=True)
@@ -255,7 +276,9 @@ class Gauge1Postprocessing(models.Model):
 class Gauge2Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Gauge2Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
 
@@ -271,7 +294,8 @@ class Gauge2Preprocessing(models.Model):
 class Gauge2Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     value1 = models.FloatField(blank=True, null=True)
     value2 = models.FloatField(blank=True, null=True)
@@ -295,7 +319,9 @@ class Gauge2Postprocessing(models.Model):
 class Gauge3Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Gauge3Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
 
@@ -311,7 +337,8 @@ class Gauge3Preprocessing(models.Model):
 class Gauge3Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     value1 = models.FloatField(blank=True, null=True)
     value2 = models.FloatField(blank=True, null=True)
@@ -339,7 +366,9 @@ class Gauge3Postprocessing(models.Model):
 class Honing1Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Honing1Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
 
@@ -355,7 +384,8 @@ class Honing1Preprocessing(models.Model):
 class Honing1Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -373,7 +403,9 @@ class Honing1Postprocessing(models.Model):
 class Honing2Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Honing2Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
 
@@ -389,7 +421,8 @@ class Honing2Preprocessing(models.Model):
 class Honing2Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -411,7 +444,9 @@ class Honing2Postprocessing(models.Model):
 class DeburringPreprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('DeburringPostprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
 
@@ -427,7 +462,8 @@ class DeburringPreprocessing(models.Model):
 class DeburringPostprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     status = models.CharField(max_length=10)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -449,7 +485,8 @@ class DeburringPostprocessing(models.Model):
 class PrewashingPreprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
@@ -469,7 +506,8 @@ class PrewashingPreprocessing(models.Model):
 class PrewashingPostprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
@@ -489,7 +527,8 @@ class PrewashingPostprocessing(models.Model):
 class FinalwashingPreprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
@@ -509,7 +548,8 @@ class FinalwashingPreprocessing(models.Model):
 class FinalwashingPostprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
-    qr_data = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    qr_data = models.CharField(max_length=100, db_index=True)
     previous_machine_status = models.CharField(max_length=10)
     status = models.CharField(max_length=10)
     model_name = models.CharField(max_length=20)
@@ -532,7 +572,7 @@ class FinalwashingPostprocessing(models.Model):
 
 class Op40AProcessing(models.Model):
     id = models.AutoField(primary_key=True)
-    timestamp_internal = models.DateTimeField()
+    timestamp_internal = models.DateTimeField(db_index=True)
     qr_data_internal = models.CharField(unique=True, max_length=100)
     previous_machine_internal_status = models.CharField(max_length=10)
     model_name_internal = models.CharField(max_length=20)
@@ -560,7 +600,7 @@ class Op40AProcessing(models.Model):
 
 class Op40BProcessing(models.Model):
     id = models.AutoField(primary_key=True)
-    timestamp_internal = models.DateTimeField()
+    timestamp_internal = models.DateTimeField(db_index=True)
     qr_data_internal = models.CharField(unique=True, max_length=100)
     previous_machine_internal_status = models.CharField(max_length=10)
     model_name_internal = models.CharField(max_length=20)
@@ -588,7 +628,7 @@ class Op40BProcessing(models.Model):
 
 class Op40CProcessing(models.Model):
     id = models.AutoField(primary_key=True)
-    timestamp_internal = models.DateTimeField()
+    timestamp_internal = models.DateTimeField(db_index=True)
     qr_data_internal = models.CharField(unique=True, max_length=100)
     previous_machine_internal_status = models.CharField(max_length=10)
     model_name_internal = models.CharField(max_length=20)
@@ -616,7 +656,7 @@ class Op40CProcessing(models.Model):
 
 class Op40DProcessing(models.Model):
     id = models.AutoField(primary_key=True)
-    timestamp_internal = models.DateTimeField()
+    timestamp_internal = models.DateTimeField(db_index=True)
     qr_data_internal = models.CharField(unique=True, max_length=100)
     previous_machine_internal_status = models.CharField(max_length=10)
     model_name_internal = models.CharField(max_length=20)
@@ -649,6 +689,8 @@ class Op40DProcessing(models.Model):
 class Op80Preprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('Op80Postprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
     qr_data_piston = models.CharField(unique=True, max_length=100)
     model_name_internal = models.CharField(max_length=20)
     qr_data_housing = models.CharField(unique=True, max_length=100, blank=True, null=True)
@@ -667,6 +709,7 @@ class Op80Preprocessing(models.Model):
 class Op80Postprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
     qr_data_housing_new = models.CharField(unique=True, max_length=100)
     qr_data_housing = models.CharField(unique=True, max_length=100, blank=True, null=True)
     match_status = models.CharField(max_length=10)
@@ -691,6 +734,8 @@ class Op80Postprocessing(models.Model):
 class PaintingPreprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('PaintingPostprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
     qr_data_housing = models.CharField(unique=True, max_length=100, blank=True, null=True)
     model_name_housing = models.CharField(max_length=20, blank=True, null=True)
     qr_data_piston = models.CharField(unique=True, max_length=100, blank=True, null=True)
@@ -710,8 +755,9 @@ class PaintingPreprocessing(models.Model):
 class PaintingPostprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100, blank=True, null=True)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
     qr_data_piston = models.CharField(unique=True, max_length=100)  
-    qr_data_housing = models.CharField(max_length=100, blank=True, null=True)  
+    qr_data_housing = models.CharField(max_length=100, blank=True, null=True, db_index=True)  
     status = models.CharField(max_length=50, blank=True, null=True)
     # Audit trail fields
     last_updated_by = models.CharField(max_length=100, blank=True, null=True)
@@ -733,6 +779,8 @@ class PaintingPostprocessing(models.Model):
 class LubPreprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
+    post = models.ForeignKey('LubPostprocessing', models.DO_NOTHING, blank=True, null=True, db_constraint=False, related_name='+')
     qr_data_piston = models.CharField(unique=True, max_length=100)
     model_name_piston = models.CharField(max_length=20, blank=True, null=True)
     qr_data_housing = models.CharField(max_length=100, blank=True, null=True)
@@ -751,6 +799,7 @@ class LubPreprocessing(models.Model):
 class LubPostprocessing(models.Model):
     id = models.AutoField(primary_key=True)
     timestamp = models.CharField(max_length=100)
+    event_time = models.DateTimeField(blank=True, null=True, db_index=True)
     qr_data_piston = models.CharField(unique=True, max_length=100)
     status = models.CharField(max_length=50, blank=True, null=True)
     # Audit trail fields
@@ -763,4 +812,151 @@ class LubPostprocessing(models.Model):
         ordering = ['-id']
 
     def __str__(self):
-        return f"Lub Post - {self.qr_data_piston} - {self.status}"
\ No newline at end of file
+        return f"Lub Post - {self.qr_data_piston} - {self.status}"
+
+
+# ============================================================================
+# PART EVENT LOG (append-only traceability index across all station tables)
+# ============================================================================
+
+class PartEvent(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    qr = models.CharField(max_length=100)
+    qr_role = models.CharField(max_length=30)   # source QR column, e.g. qr_data / qr_data_housing
+    op_code = models.CharField(max_length=20)
+    stage = models.CharField(max_length=10)     # pre / post / assembly
+    status = models.CharField(max_length=20, blank=True, null=True)
+    event_time = models.DateTimeField(blank=True, null=True)
+    source_table = models.CharField(max_length=50)
+    source_id = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        managed = True
+        db_table = 'part_event'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['qr', 'event_time'], name='part_event_qr_time_idx'),
+            models.Index(fields=['source_table', 'source_id'], name='part_event_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.op_code} {self.stage} - {self.qr} - {self.status}"
+
+
+# ============================================================================
+# ANALYTICS ROLLUPS (hourly counts per station / model / status)
+# ============================================================================
+
+class AnalyticsRollup(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    station = models.CharField(max_length=50)          # machine config name
+    op_code = models.CharField(max_length=20)
+    production_date = models.DateField()               # local (plant) date of the event
+    hour = models.SmallIntegerField()                  # local hour 0-23
+    shift = models.CharField(max_length=1)
+    model_name = models.CharField(max_length=50, blank=True, null=True)
+    status = models.CharField(max_length=20, blank=True, null=True)
+    count = models.IntegerField(default=0)
+    cycle_time_sum = models.FloatField(default=0)      # minutes, rows with a positive cycle time only
+    cycle_time_count = models.IntegerField(default=0)
+
+    class Meta:
+        managed = True
+        db_table = 'analytics_rollup'
+        indexes = [
+            models.Index(fields=['production_date', 'station'], name='analytics_rollup_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.station} {self.production_date} {self.hour:02d}:00 - {self.status} x{self.count}"
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)                # last part_event id folded into the rollups
+    covered_until = models.DateTimeField(blank=True, null=True)     # rollups are complete for hours before this
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        managed = True
+        db_table = 'rollup_watermark'
+
+    def __str__(self):
+        return f"{self.name} - event {self.last_event_id}"
+
+
+# ============================================================================
+# REPORT JOBS (heavy exports built in the background by run_report_worker)
+# ============================================================================
+
+class ReportJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = [QUEUED, RUNNING]
+
+    kind = models.CharField(max_length=30)                          # report_jobs.REPORT_KINDS key
+    params = models.JSONField(default=dict)                         # export query parameters
+    params_hash = models.CharField(max_length=64)                   # sha256 of kind + params
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    file_name = models.CharField(max_length=255, blank=True, default='')      # inside REPORTS_DIR
+    download_name = models.CharField(max_length=255, blank=True, default='')
+    size = models.BigIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    claim_token = models.CharField(max_length=32, blank=True, default='')    # set by the worker running it
+    heartbeat_at = models.DateTimeField(blank=True, null=True)              # last sign of life from that worker
+
+    class Meta:
+        managed = True
+        db_table = 'report_job'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='report_job_status_idx'),
+        ]
+        constraints = [
+            # One queued / running job per distinct request
+            models.UniqueConstraint(
+                fields=['params_hash'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='report_job_active_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} - {self.status}"
+
+
+# ============================================================================
+# STATION TABLES WITH STRING TIMESTAMPS (event_time is derived from timestamp)
+# ============================================================================
+
+EVENT_TIME_MODELS = [
+    Cnc1Preprocessing, Cnc1Postprocessing,
+    Cnc2Preprocessing, Cnc2Postprocessing,
+    Cnc3Preprocessing, Cnc3Postprocessing,
+    Cnc4Preprocessing, Cnc4Postprocessing,
+    Cnc5Preprocessing, Cnc5Postprocessing,
+    Cnc6Preprocessing, Cnc6Postprocessing,
+    Gauge1Preprocessing, Gauge1Postprocessing,
+    Gauge2Preprocessing, Gauge2Postprocessing,
+    Gauge3Preprocessing, Gauge3Postprocessing,
+    Honing1Preprocessing, Honing1Postprocessing,
+    Honing2Preprocessing, Honing2Postprocessing,
+    DeburringPreprocessing, DeburringPostprocessing,
+    PrewashingPreprocessing, PrewashingPostprocessing,
+    FinalwashingPreprocessing, FinalwashingPostprocessing,
+    Op80Preprocessing, Op80Postprocessing,
+    PaintingPreprocessing, PaintingPostprocessing,
+    LubPreprocessing, LubPostprocessing,
+]
@@ -3,24 +3,36 @@ Monitoring Page Views - Read-only monitoring with time filters and export
 """
 
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q
+from django.db import connections
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+from django.db.models.functions import ExtractHour, ExtractMinute
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+import heapq
+from collections import defaultdict
 import json
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from itertools import islice
+from operator import itemgetter
 from . import models
+from .excel_export import ReportSheet, excel_response, new_workbook, status_style
+from .rollups import status_q
 
 # Import existing configurations from views.py
 from .views import (
     MACHINE_CONFIGS, 
     ASSEMBLY_CONFIGS, 
     OP80_CONFIG,
-    parse_timestamp_to_datetime
+    event_time_q
 )
+from .qr_search import qr_search_q
+
+
+MONITORING_PAGE_SIZE = 100
+MAX_MONITORING_PAGE_SIZE = 1000
+EXACT_TOTAL_LIMIT = 10000  # rows counted exactly per station before falling back to the planner estimate
+PAGE_TOKEN_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
 
 
 def get_all_model_names_monitoring():
@@ -127,23 +139,25 @@ def parse_time_filter(time_filter):
     return start_dt, end_dt
 
 
-def search_monitoring_data(filters):
-    """
-    Search across all machines based on filters for monitoring
-    Returns list of records with ALL details including gauge values, multiple QR codes, etc.
-    """
-    results = []
-    
-    # Extract filters
-    qr_code = filters.get('qr_code', '').strip()
-    model_name = filters.get('model_name', '')
-    machine_id = filters.get('machine', '')
+def get_monitoring_filters(query):
+    """Search filters from the request parameters (search, chart data and export share them)"""
+    return {
+        'qr_code': query.get('qr_code', ''),
+        'model_name': query.get('model_name', ''),
+        'machine': query.get('machine', ''),
+        'time_filter': query.get('time_filter', '1hour'),
+        'start_date': query.get('start_date', ''),
+        'end_date': query.get('end_date', ''),
+        'status': query.get('status', ''),
+    }
+
+
+def get_monitoring_range(filters):
+    """(start_dt, end_dt) from the custom date range, else from the time filter"""
     time_filter = filters.get('time_filter', '1hour')
     custom_start = filters.get('start_date', '')
     custom_end = filters.get('end_date', '')
-    status_filter = filters.get('status', '')
     
-    # Parse dates based on time filter or custom range
     if custom_start and custom_end:
         try:
             start_dt = timezone.make_aware(datetime.strptime(custom_start, '%Y-%m-%d'))
@@ -157,367 +171,393 @@ def search_monitoring_data(filters):
     else:
         start_dt, end_dt = parse_time_filter(time_filter)
     
-    # Determine which machines to search
-    configs_to_search = []
-    if machine_id and machine_id != 'all':
-        for config in MACHINE_CONFIGS:
-            config_id = config['name'].lower().replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_')
-            if config_id == machine_id:
-                configs_to_search.append(config)
-                break
-        
-        if not configs_to_search:
-            for config in ASSEMBLY_CONFIGS:
-                config_id = config['name'].lower().replace(' ', '_')
-                if config_id == machine_id:
-                    configs_to_search.append(config)
-                    break
-        
-        if not configs_to_search and machine_id == 'op80_leak_test':
-            configs_to_search.append(OP80_CONFIG)
-    else:
-        configs_to_search = MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]
+    return start_dt, end_dt
+
+
+def get_monitoring_configs(machine_id):
+    """Configs to search for the machine dropdown value ('' or 'all' for every machine)"""
+    if not machine_id or machine_id == 'all':
+        return MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]
+    
+    for config in MACHINE_CONFIGS:
+        config_id = config['name'].lower().replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_')
+        if config_id == machine_id:
+            return [config]
+    
+    for config in ASSEMBLY_CONFIGS:
+        config_id = config['name'].lower().replace(' ', '_')
+        if config_id == machine_id:
+            return [config]
     
-    # Search each machine
-    for config in configs_to_search:
-        machine_name = config['name']
-        display_name = config.get('display_name', machine_name)
-        machine_type = config.get('type', 'standard')
+    if machine_id == 'op80_leak_test':
+        return [OP80_CONFIG]
+    return []
+
+
+def monitoring_time_field(model):
+    return 'event_time' if hasattr(model, 'event_time') else 'timestamp_internal'
+
+
+def monitoring_queryset(config, qr_code, model_name, start_dt, end_dt, status_filter=''):
+    """The station rows matching the filters (None if the station has no table to search)"""
+    machine_name = config['name']
+    machine_type = config.get('type', 'standard')
+    is_assembly = 'OP40' in machine_name
+    is_painting = 'Painting' in machine_name
+    is_lubrication = 'Lubrication' in machine_name
+    is_op80 = 'Oring_leak' in machine_name
+    
+    # Washing machines: loading rows are the prep table, unloading rows the post table
+    if machine_type == 'washing':
         operation = config.get('operation', None)
-        is_assembly = 'OP40' in machine_name
-        is_washing = machine_type == 'washing'
-        is_gauge = machine_type == 'gauge'
-        is_painting = 'Painting' in machine_name
-        is_lubrication = 'Lubrication' in machine_name
-        is_op80 = 'Oring_leak' in machine_name
-        
-        # Handle washing machines separately
-        if is_washing:
-            if operation == 'load' and config.get('prep_model'):
-                results.extend(search_washing_load_monitoring(config, qr_code, model_name, start_dt, end_dt, status_filter))
-            elif operation == 'unload' and config.get('post_model'):
-                results.extend(search_washing_unload_monitoring(config, qr_code, model_name, start_dt, end_dt, status_filter))
-            continue
-        
-        if not config.get('prep_model'):
-            continue
+        if operation == 'load':
+            model = config.get('prep_model')
+        elif operation == 'unload':
+            model = config.get('post_model')
+        else:
+            model = None
+        if not model:
+            return None
         
-        # Build query for preprocessing
         query = Q()
-        
-        # QR Code filter
         if qr_code:
-            if is_assembly:
-                query &= (Q(qr_data_internal__icontains=qr_code) | 
-                         Q(qr_data_external__icontains=qr_code) | 
-                         Q(qr_data_housing__icontains=qr_code))
-            elif is_painting:
-                query &= (Q(qr_data_housing__icontains=qr_code) | Q(qr_data_piston__icontains=qr_code))
-            elif is_lubrication:
-                query &= (Q(qr_data_piston__icontains=qr_code) | Q(qr_data_housing__icontains=qr_code))
-            elif is_op80:
-                query &= (Q(qr_data_piston__icontains=qr_code) | Q(qr_data_housing__icontains=qr_code))
-            else:
-                query &= Q(qr_data__icontains=qr_code)
-        
-        # Model name filter
+            query &= qr_search_q(qr_code, 'qr_data', model=model)
         if model_name and model_name != 'all':
-            if is_assembly:
-                query &= (Q(model_name_internal=model_name) | 
-                         Q(model_name_external=model_name) | 
-                         Q(model_name_housing=model_name))
-            elif is_painting:
-                query &= (Q(model_name_housing=model_name) | Q(model_name_piston=model_name))
-            elif is_lubrication:
-                query &= (Q(model_name_piston=model_name) | Q(model_name_housing=model_name))
-            elif is_op80:
-                query &= (Q(model_name_internal=model_name) | Q(model_name_external=model_name))
-            else:
-                query &= Q(model_name=model_name)
-        
-        # Get preprocessing records
-        try:
-            prep_records = config['prep_model'].objects.filter(query)[:1000]
-        except Exception as e:
-            print(f"Error querying {machine_name}: {e}")
-            continue
-        
-        # Process each record
-        for prep in prep_records:
-            # Get timestamp
-            if is_assembly:
-                timestamp = prep.timestamp_internal
-            else:
-                timestamp = prep.timestamp
-            
-            # Date filter
-            if start_dt or end_dt:
-                dt = parse_timestamp_to_datetime(timestamp)
-                if dt:
-                    if timezone.is_naive(dt):
-                        dt = timezone.make_aware(dt)
-                    
-                    if start_dt and dt < start_dt:
-                        continue
-                    if end_dt and dt > end_dt:
-                        continue
-            
-            # Initialize record with common fields
-            record = {
-                'prep_id': prep.id,
-                'machine_name': machine_name,
-                'display_name': display_name,
-                'machine_type': machine_type,
-            }
-            
-            # Get status and details based on machine type
-            if is_assembly:
-                # ASSEMBLY MACHINES
-                qr_internal = prep.qr_data_internal
-                qr_external = prep.qr_data_external or '-'
-                qr_housing = prep.qr_data_housing or '-'
-                status = prep.status if prep.qr_data_external and prep.qr_data_housing else 'Pending'
-                
-                record.update({
-                    'qr_code': qr_internal,
-                    'qr_internal': qr_internal,
-                    'qr_external': qr_external,
-                    'qr_housing': qr_housing,
-                    'model_name': getattr(prep, 'model_name_internal', 'N/A'),
-                    'model_name_internal': getattr(prep, 'model_name_internal', 'N/A'),
-                    'model_name_external': getattr(prep, 'model_name_external', 'N/A'),
-                    'model_name_housing': getattr(prep, 'model_name_housing', 'N/A'),
-                    'previous_machine_internal_status': getattr(prep, 'previous_machine_internal_status', '-'),
-                    'previous_machine_housing_status': getattr(prep, 'previous_machine_housing_status', '-'),
-                    'status': status,
-                    'post_id': prep.id if status != 'Pending' else None,
-                })
-                
-            elif is_painting:
-                # PAINTING MACHINE
-                qr_housing = prep.qr_data_housing
-                qr_piston = prep.qr_data_piston
-                post = config['post_model'].objects.filter(qr_data_housing=qr_housing).first()
-                status = post.status if post else 'Pending'
-                
-                record.update({
-                    'qr_code': qr_housing,
-                    'qr_housing': qr_housing,
-                    'qr_piston': qr_piston,
-                    'model_name': getattr(prep, 'model_name_housing', 'N/A'),
-                    'model_name_housing': getattr(prep, 'model_name_housing', 'N/A'),
-                    'model_name_piston': getattr(prep, 'model_name_piston', 'N/A'),
-                    'previous_machine_status': getattr(prep, 'previous_machine_status', '-'),
-                    'pre_status': getattr(prep, 'pre_status', '-'),
-                    'status': status,
-                    'post_id': post.id if post else None,
-                })
-                
-            elif is_lubrication:
-                # LUBRICATION MACHINE
-                qr_piston = prep.qr_data_piston
-                qr_housing = prep.qr_data_housing
-                post = config['post_model'].objects.filter(qr_data_piston=qr_piston).first()
-                status = post.status if post else 'Pending'
-                
-                record.update({
-                    'qr_code': qr_piston,
-                    'qr_piston': qr_piston,
-                    'qr_housing': qr_housing,
-                    'model_name': getattr(prep, 'model_name_piston', 'N/A'),
-                    'model_name_piston': getattr(prep, 'model_name_piston', 'N/A'),
-                    'model_name_housing': getattr(prep, 'model_name_housing', 'N/A'),
-                    'previous_machine_status': getattr(prep, 'previous_machine_status', '-'),
-                    'status': status,
-                    'post_id': post.id if post else None,
-                })
-                
-            elif is_op80:
-                # OP80 LEAK TEST
-                qr_piston = prep.qr_data_piston
-                qr_housing = prep.qr_data_housing
-                
-                # Try multiple matching strategies
-                post = config['post_model'].objects.filter(qr_data_housing=qr_housing).first()
-                if not post:
-                    post = config['post_model'].objects.filter(qr_data_housing_new=qr_housing).first()
-                if not post:
-                    post = config['post_model'].objects.filter(qr_data_housing=qr_piston).first()
-                
-                status = post.status if post else 'Pending'
-                
-                record.update({
-                    'qr_code': qr_piston,
-                    'qr_piston': qr_piston,
-                    'qr_housing': qr_housing,
-                    'qr_housing_new': post.qr_data_housing_new if post else '-',
-                    'model_name': getattr(prep, 'model_name_internal', 'N/A'),
-                    'model_name_internal': getattr(prep, 'model_name_internal', 'N/A'),
-                    'model_name_external': getattr(prep, 'model_name_external', 'N/A'),
-                    'previous_machine_status': getattr(prep, 'previous_machine_status', '-'),
-                    'match_status': post.match_status if post else '-',
-                    'status': status,
-                    'post_id': post.id if post else None,
-                })
-                
-            else:
-                # STANDARD MACHINES (CNC, Gauge, Honing, etc.)
-                qr_value = prep.qr_data
-                post = config['post_model'].objects.filter(qr_data=qr_value).first() if config['post_model'] else None
-                status = post.status if post else 'Pending'
-                
-                record.update({
-                    'qr_code': qr_value,
-                    'model_name': getattr(prep, 'model_name', 'N/A'),
-                    'previous_machine_status': getattr(prep, 'previous_machine_status', '-'),
-                    'status': status,
-                    'post_id': post.id if post else None,
-                })
-                
-                # Add gauge values if this is a gauge machine
-                if is_gauge and post:
-                    gauge_values = {}
-                    for i in range(1, 7):
-                        val = getattr(post, f'value{i}', None)
-                        if val is not None:
-                            gauge_values[f'value{i}'] = val
-                    record['gauge_values'] = gauge_values
-            
-            # Status filter
-            if status_filter and status_filter != 'all' and status != status_filter:
-                continue
-            
-            # Format timestamp
-            if hasattr(timestamp, 'isoformat'):
-                timestamp_str = timestamp.isoformat()
-            else:
-                timestamp_str = str(timestamp)
-            
-            record['timestamp'] = timestamp_str
-            results.append(record)
+            query &= Q(model_name=model_name)
+        query &= event_time_q(model, start_dt, end_dt)
+        if status_filter and status_filter != 'all':
+            query &= status_q(config, status_filter)
+        return model.objects.filter(query)
     
-    # Sort by timestamp (newest first)
-    results.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    return results
-
-
-def search_washing_load_monitoring(config, qr_code, model_name, start_dt, end_dt, status_filter):
-    """Search washing machine loading stage"""
-    results = []
-    prep_model = config['prep_model']
+    if not config.get('prep_model'):
+        return None
     
+    # Build query for preprocessing
     query = Q()
+    
+    # QR Code filter
     if qr_code:
-        query &= Q(qr_data__icontains=qr_code)
+        if is_assembly:
+            query &= qr_search_q(qr_code, 'qr_data_internal', 'qr_data_external', 'qr_data_housing', model=config['prep_model'])
+        elif is_painting:
+            query &= qr_search_q(qr_code, 'qr_data_housing', 'qr_data_piston', model=config['prep_model'])
+        elif is_lubrication:
+            query &= qr_search_q(qr_code, 'qr_data_piston', 'qr_data_housing', model=config['prep_model'])
+        elif is_op80:
+            query &= qr_search_q(qr_code, 'qr_data_piston', 'qr_data_housing', model=config['prep_model'])
+        else:
+            query &= qr_search_q(qr_code, 'qr_data', model=config['prep_model'])
+    
+    # Model name filter
     if model_name and model_name != 'all':
-        query &= Q(model_name=model_name)
+        if is_assembly:
+            query &= (Q(model_name_internal=model_name) | 
+                     Q(model_name_external=model_name) | 
+                     Q(model_name_housing=model_name))
+        elif is_painting:
+            query &= (Q(model_name_housing=model_name) | Q(model_name_piston=model_name))
+        elif is_lubrication:
+            query &= (Q(model_name_piston=model_name) | Q(model_name_housing=model_name))
+        elif is_op80:
+            query &= (Q(model_name_internal=model_name) | Q(model_name_external=model_name))
+        else:
+            query &= Q(model_name=model_name)
     
-    try:
-        prep_records = prep_model.objects.filter(query)[:1000]
-    except Exception as e:
-        return results
+    # Date filter (runs in SQL on the indexed event time column)
+    query &= event_time_q(config['prep_model'], start_dt, end_dt)
+    
+    # Status filter (SQL form of the status describe_monitoring_row() reports)
+    if status_filter and status_filter != 'all':
+        query &= status_q(config, status_filter)
     
-    for prep in prep_records:
+    prep_records = config['prep_model'].objects.filter(query)
+    if not is_assembly:
+        prep_records = prep_records.select_related('post')
+    return prep_records
+
+
+def describe_monitoring_row(config, prep):
+    """Monitoring record for one station row, with ALL details (gauge values, multiple QR codes, etc.)"""
+    machine_name = config['name']
+    display_name = config.get('display_name', machine_name)
+    machine_type = config.get('type', 'standard')
+    is_assembly = 'OP40' in machine_name
+    is_gauge = machine_type == 'gauge'
+    is_painting = 'Painting' in machine_name
+    is_lubrication = 'Lubrication' in machine_name
+    is_op80 = 'Oring_leak' in machine_name
+    
+    if machine_type == 'washing':
+        load = config.get('operation') == 'load'
         timestamp = prep.timestamp
-        
-        if start_dt or end_dt:
-            dt = parse_timestamp_to_datetime(timestamp)
-            if dt:
-                if timezone.is_naive(dt):
-                    dt = timezone.make_aware(dt)
-                if start_dt and dt < start_dt:
-                    continue
-                if end_dt and dt > end_dt:
-                    continue
-        
-        status = getattr(prep, 'status', 'OK')
-        
-        if status_filter and status_filter != 'all' and status != status_filter:
-            continue
-        
-        if hasattr(timestamp, 'isoformat'):
-            timestamp_str = timestamp.isoformat()
-        else:
-            timestamp_str = str(timestamp)
-        
         record = {
-            'prep_id': prep.id,
-            'post_id': None,
-            'machine_name': config['name'],
+            'prep_id': prep.id if load else None,
+            'post_id': None if load else prep.id,
+            'machine_name': machine_name,
             'display_name': config['display_name'],
             'machine_type': 'washing',
-            'operation': 'load',
-            'stage': 'Loading (Preprocessing)',
+            'operation': 'load' if load else 'unload',
+            'stage': 'Loading (Preprocessing)' if load else 'Unloading (Postprocessing)',
             'qr_code': prep.qr_data,
             'model_name': getattr(prep, 'model_name', 'N/A'),
-            'timestamp': timestamp_str,
-            'status': status,
+            'timestamp': timestamp,
+            'status': getattr(prep, 'status', 'OK'),
             'previous_machine_status': getattr(prep, 'previous_machine_status', '-'),
         }
+    
+    else:
+        # Get timestamp
+        if is_assembly:
+            timestamp = prep.timestamp_internal
+        else:
+            timestamp = prep.timestamp
         
-        results.append(record)
+        # Initialize record with common fields
+        record = {
+            'prep_id': prep.id,
+            'machine_name': machine_name,
+            'display_name': display_name,
+            'machine_type': machine_type,
+        }
+        
+        # Get status and details based on machine type
+        if is_assembly:
+            # ASSEMBLY MACHINES
+            qr_internal = prep.qr_data_internal
+            qr_external = prep.qr_data_external or '-'
+            qr_housing = prep.qr_data_housing or '-'
+            status = prep.status if prep.qr_data_external and prep.qr_data_housing else 'Pending'
+            
+            record.update({
+                'qr_code': qr_internal,
+                'qr_internal': qr_internal,
+                'qr_external': qr_external,
+                'qr_housing': qr_housing,
+                'model_name': getattr(prep, 'model_name_internal', 'N/A'),
+                'model_name_internal': getattr(prep, 'model_name_internal', 'N/A'),
+                'model_name_external': getattr(prep, 'model_name_external', 'N/A'),
+                'model_name_housing': getattr(prep, 'model_name_housing', 'N/A'),
+                'previous_machine_internal_status': getattr(prep, 'previous_machine_internal_status', '-'),
+                'previous_machine_housing_status': getattr(prep, 'previous_machine_housing_status', '-'),
+                'status': status,
+                'post_id': prep.id if status != 'Pending' else None,
+            })
+            
+        elif is_painting:
+            # PAINTING MACHINE
+            qr_housing = prep.qr_data_housing
+            qr_piston = prep.qr_data_piston
+            post = prep.post
+            status = post.status if post else 'Pending'
+            
+            record.update({
+                'qr_code': qr_housing,
+                'qr_housing': qr_housing,
+                'qr_piston': qr_piston,
+                'model_name': getattr(prep, 'model_name_housing', 'N/A'),
+                'model_name_housing': getattr(prep, 'model_name_housing', 'N/A'),
+                'model_name_piston': getattr(prep, 'model_name_piston', 'N/A'),
+                'previous_machine_status': getattr(prep, 'previous_machine_status', '-'),
+                'pre_status': getattr(prep, 'pre_status', '-'),
+                'status': status,
+                'post_id': post.id if post else None,
+            })
+            
+        elif is_lubrication:
+            # LUBRICATION MACHINE
+            qr_piston = prep.qr_data_piston
+            qr_housing = prep.qr_data_housing
+            post = prep.post
+            status = post.status if post else 'Pending'
+            
+            record.update({
+                'qr_code': qr_piston,
+                'qr_piston': qr_piston,
+                'qr_housing': qr_housing,
+                'model_name': getattr(prep, 'model_name_piston', 'N/A'),
+                'model_name_piston': getattr(prep, 'model_name_piston', 'N/A'),
+                'model_name_housing': getattr(prep, 'model_name_housing', 'N/A'),
+                'previous_machine_status': getattr(prep, 'previous_machine_status', '-'),
+                'status': status,
+                'post_id': post.id if post else None,
+            })
+            
+        elif is_op80:
+            # OP80 LEAK TEST
+            qr_piston = prep.qr_data_piston
+            qr_housing = prep.qr_data_housing
+            post = prep.post
+            status = post.status if post else 'Pending'
+            
+            record.update({
+                'qr_code': qr_piston,
+                'qr_piston': qr_piston,
+                'qr_housing': qr_housing,
+                'qr_housing_new': post.qr_data_housing_new if post else '-',
+                'model_name': getattr(prep, 'model_name_internal', 'N/A'),
+                'model_name_internal': getattr(prep, 'model_name_internal', 'N/A'),
+                'model_name_external': getattr(prep, 'model_name_external', 'N/A'),
+                'previous_machine_status': getattr(prep, 'previous_machine_status', '-'),
+                'match_status': post.match_status if post else '-',
+                'status': status,
+                'post_id': post.id if post else None,
+            })
+            
+        else:
+            # STANDARD MACHINES (CNC, Gauge, Honing, etc.)
+            qr_value = prep.qr_data
+            post = prep.post
+            status = post.status if post else 'Pending'
+            
+            record.update({
+                'qr_code': qr_value,
+                'model_name': getattr(prep, 'model_name', 'N/A'),
+                'previous_machine_status': getattr(prep, 'previous_machine_status', '-'),
+                'status': status,
+                'post_id': post.id if post else None,
+            })
+            
+            # Add gauge values if this is a gauge machine
+            if is_gauge and post:
+                gauge_values = {}
+                for i in range(1, 7):
+                    val = getattr(post, f'value{i}', None)
+                    if val is not None:
+                        gauge_values[f'value{i}'] = val
+                record['gauge_values'] = gauge_values
+    
+    # Format timestamp
+    if hasattr(timestamp, 'isoformat'):
+        record['timestamp'] = timestamp.isoformat()
+    else:
+        record['timestamp'] = str(timestamp)
     
-    return results
+    return record
+
+
+def stream_station_monitoring(config, qr_code, model_name, start_dt, end_dt, status_filter, chunk_size):
+    """(event time, record) for every matching row of one station, newest first, fetched in chunks"""
+    queryset = monitoring_queryset(config, qr_code, model_name, start_dt, end_dt, status_filter)
+    if queryset is None:
+        return
+    time_field = monitoring_time_field(queryset.model)
+    
+    for prep in queryset.order_by(f'-{time_field}', '-id').iterator(chunk_size=chunk_size):
+        yield getattr(prep, time_field), describe_monitoring_row(config, prep)
+
 
+def stream_monitoring_data(filters, chunk_size=2000):
+    """Every record matching the filters across the machines, newest first, without the per-machine limit
 
-def search_washing_unload_monitoring(config, qr_code, model_name, start_dt, end_dt, status_filter):
-    """Search washing machine unloading stage"""
-    results = []
-    post_model = config['post_model']
+    Rows are read from the station tables as the caller consumes them and
+    merged by event time, so the caller never holds more than one chunk
+    per station.
+    """
+    qr_code = filters.get('qr_code', '').strip()
+    model_name = filters.get('model_name', '')
+    status_filter = filters.get('status', '')
+    start_dt, end_dt = get_monitoring_range(filters)
     
-    query = Q()
-    if qr_code:
-        query &= Q(qr_data__icontains=qr_code)
-    if model_name and model_name != 'all':
-        query &= Q(model_name=model_name)
+    streams = [
+        stream_station_monitoring(config, qr_code, model_name, start_dt, end_dt, status_filter, chunk_size)
+        for config in get_monitoring_configs(filters.get('machine', ''))
+    ]
+    for _, record in heapq.merge(*streams, key=itemgetter(0), reverse=True):
+        yield record
+
+
+def page_token(event_time, table, row_id):
+    """Cursor just past a row: '<event time (UTC)>,<station table>,<id>'
+
+    Ids are only unique within one station table, so the table is part of
+    the cursor and breaks ties between stations at the same event time.
+    """
+    return f'{event_time.astimezone(dt_timezone.utc).strftime(PAGE_TOKEN_TIME_FORMAT)},{table},{row_id}'
+
+
+def parse_page_token(token):
+    """(event_time, table, id) from page_token(); ValueError when malformed"""
+    event_time, table, row_id = token.split(',')
+    return datetime.strptime(event_time, PAGE_TOKEN_TIME_FORMAT).replace(tzinfo=dt_timezone.utc), table, int(row_id)
+
+
+def keyset_q(time_field, table, after):
+    """Rows of table that sort after the cursor in (event time, table, id) descending order"""
+    after_time, after_table, after_id = after
+    if table < after_table:
+        return Q(**{f'{time_field}__lte': after_time})
+    if table > after_table:
+        return Q(**{f'{time_field}__lt': after_time})
+    return Q(**{f'{time_field}__lte': after_time}) & (Q(**{f'{time_field}__lt': after_time}) | Q(id__lt=after_id))
+
+
+def station_page(config, queryset, after, limit):
+    """((event time, table, id), config, row) for the first limit rows of one station after the cursor"""
+    time_field = monitoring_time_field(queryset.model)
+    table = queryset.model._meta.db_table
+    if after:
+        queryset = queryset.filter(keyset_q(time_field, table, after))
+    
+    for row in queryset.order_by(f'-{time_field}', '-id')[:limit]:
+        yield (getattr(row, time_field), table, row.id), config, row
+
+
+def search_monitoring_page(filters, after=None, limit=MONITORING_PAGE_SIZE):
+    """One page of matching records across the machines, newest first: (records, next page token or None)
+
+    Every filter runs in SQL and each station reads at most limit + 1 rows
+    past the cursor from its time index, so a page costs the same for a
+    15 minute window as for a month.
+    """
+    qr_code = filters.get('qr_code', '').strip()
+    model_name = filters.get('model_name', '')
+    status_filter = filters.get('status', '')
+    start_dt, end_dt = get_monitoring_range(filters)
     
-    try:
-        post_records = post_model.objects.filter(query)[:1000]
-    except Exception as e:
-        return results
+    stations = []
+    for config in get_monitoring_configs(filters.get('machine', '')):
+        queryset = monitoring_queryset(config, qr_code, model_name, start_dt, end_dt, status_filter)
+        if queryset is not None:
+            stations.append(station_page(config, queryset, after, limit + 1))
     
-    for post in post_records:
-        timestamp = post.timestamp
-        
-        if start_dt or end_dt:
-            dt = parse_timestamp_to_datetime(timestamp)
-            if dt:
-                if timezone.is_naive(dt):
-                    dt = timezone.make_aware(dt)
-                if start_dt and dt < start_dt:
-                    continue
-                if end_dt and dt > end_dt:
-                    continue
-        
-        status = getattr(post, 'status', 'OK')
-        
-        if status_filter and status_filter != 'all' and status != status_filter:
-            continue
-        
-        if hasattr(timestamp, 'isoformat'):
-            timestamp_str = timestamp.isoformat()
-        else:
-            timestamp_str = str(timestamp)
-        
-        record = {
-            'prep_id': None,
-            'post_id': post.id,
-            'machine_name': config['name'],
-            'display_name': config['display_name'],
-            'machine_type': 'washing',
-            'operation': 'unload',
-            'stage': 'Unloading (Postprocessing)',
-            'qr_code': post.qr_data,
-            'model_name': getattr(post, 'model_name', 'N/A'),
-            'timestamp': timestamp_str,
-            'status': status,
-            'previous_machine_status': getattr(post, 'previous_machine_status', '-'),
-        }
-        
-        results.append(record)
+    rows = list(islice(heapq.merge(*stations, key=itemgetter(0), reverse=True), limit + 1))
+    next_token = page_token(*rows[limit - 1][0]) if len(rows) > limit else None
+    return [describe_monitoring_row(config, row) for _, config, row in rows[:limit]], next_token
+
+
+def planner_estimate(queryset):
+    """Row count the PostgreSQL planner expects for queryset (None on other databases)"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def approximate_total(filters):
+    """(total, exact) for the search: stations are counted exactly up to EXACT_TOTAL_LIMIT rows, estimated above"""
+    qr_code = filters.get('qr_code', '').strip()
+    model_name = filters.get('model_name', '')
+    status_filter = filters.get('status', '')
+    start_dt, end_dt = get_monitoring_range(filters)
     
-    return results
+    total = 0
+    exact = True
+    for config in get_monitoring_configs(filters.get('machine', '')):
+        queryset = monitoring_queryset(config, qr_code, model_name, start_dt, end_dt, status_filter)
+        if queryset is None:
+            continue
+        count = queryset.order_by().values('pk')[:EXACT_TOTAL_LIMIT + 1].count()
+        if count > EXACT_TOTAL_LIMIT:
+            count = max(count, planner_estimate(queryset) or 0)
+            exact = False
+        total += count
+    return total, exact
 
 
 def monitoring_page(request):
@@ -535,25 +575,27 @@ def monitoring_page(request):
 
 @csrf_exempt
 def monitoring_search_api(request):
-    """API endpoint for searching records"""
+    """API endpoint for searching records, one page at a time (?after=<next token>&limit=)"""
     if request.method == 'GET':
-        filters = {
-            'qr_code': request.GET.get('qr_code', ''),
-            'model_name': request.GET.get('model_name', ''),
-            'machine': request.GET.get('machine', ''),
-            'time_filter': request.GET.get('time_filter', '1hour'),
-            'start_date': request.GET.get('start_date', ''),
-            'end_date': request.GET.get('end_date', ''),
-            'status': request.GET.get('status', ''),
-        }
+        filters = get_monitoring_filters(request.GET)
+        try:
+            after = parse_page_token(request.GET['after']) if request.GET.get('after') else None
+            limit = min(max(int(request.GET.get('limit', MONITORING_PAGE_SIZE)), 1), MAX_MONITORING_PAGE_SIZE)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid after or limit'}, status=400)
         
-        results = search_monitoring_data(filters)
+        results, next_token = search_monitoring_page(filters, after, limit)
         
-        return JsonResponse({
+        response = {
             'success': True,
             'count': len(results),
-            'results': results
-        })
+            'results': results,
+            'next': next_token,
+        }
+        # The total is counted with the first page only; later pages stay constant time
+        if after is None:
+            response['total'], response['total_exact'] = approximate_total(filters)
+        return JsonResponse(response)
     
     return JsonResponse({'success': False, 'error': 'Invalid method'}, status=405)
 
@@ -565,297 +607,235 @@ def monitoring_export_excel(request):
         return JsonResponse({'success': False, 'error': 'Invalid method'}, status=405)
     
     # Get the same filters used for search
-    filters = {
-        'qr_code': request.GET.get('qr_code', ''),
-        'model_name': request.GET.get('model_name', ''),
-        'machine': request.GET.get('machine', ''),
-        'time_filter': request.GET.get('time_filter', '1hour'),
-        'start_date': request.GET.get('start_date', ''),
-        'end_date': request.GET.get('end_date', ''),
-        'status': request.GET.get('status', ''),
-    }
-    
-    # Get data using same search function
-    results = search_monitoring_data(filters)
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Monitoring Data"
+    filters = get_monitoring_filters(request.GET)
     
-    # Define styles
-    header_fill = PatternFill(start_color="FF7755", end_color="FF7755", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    
-    border_style = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
+    wb = build_monitoring_workbook(filters)
+    return excel_response(request, wb, f'monitoring_detailed_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+
+
+def build_monitoring_workbook(filters):
+    """The monitoring Excel export for the search filters (also built by the report worker)"""
+    # Write-only workbook, rows streamed from the station tables (every match, not just the search page)
+    wb = new_workbook()
+    ws = ReportSheet(wb, "Monitoring Data", widths=[monitoring_column_width(header) for header in MONITORING_HEADERS],
+                     freeze_panes='F2')  # Freeze header row and first 5 columns
+    ws.append(MONITORING_HEADERS, 'header')
+    
+    status_col = MONITORING_HEADERS.index('Status')
+    styles = ['cell'] * len(MONITORING_HEADERS)
+    for record in stream_monitoring_data(filters):
+        row = monitoring_excel_row(record)
+        styles[status_col] = status_style(row[status_col])
+        ws.append(row, styles)
+    
+    return wb
+
+
+# Comprehensive headers - include ALL possible fields
+MONITORING_HEADERS = [
+    'Prep ID', 'Post ID', 'Machine', 'Machine Type', 'QR Code', 
+    'Date', 'Time', 'Status', 'Model Name', 'Previous Status',
+    # Assembly specific
+    'QR Internal', 'QR External', 'QR Housing',
+    'Model Internal', 'Model External', 'Model Housing',
+    'Prev Internal Status', 'Prev Housing Status',
+    # Painting specific
+    'QR Piston', 'Model Piston', 'Model Housing (Paint)', 'Pre-Status',
+    # Lubrication specific  
+    'QR Piston (Lub)', 'QR Housing (Lub)', 'Model Piston (Lub)', 'Model Housing (Lub)',
+    # OP80 specific
+    'QR Piston (OP80)', 'QR Housing (OP80)', 'QR Housing New', 'Model Internal (OP80)', 
+    'Model External (OP80)', 'Match Status',
+    # Gauge specific
+    'Gauge Value 1', 'Gauge Value 2', 'Gauge Value 3', 
+    'Gauge Value 4', 'Gauge Value 5', 'Gauge Value 6',
+    # Washing specific
+    'Washing Stage', 'Washing Prev Status'
+]
+
+
+def monitoring_column_width(header):
+    """Column width from the header (rows are streamed, so values cannot be measured first)"""
+    if header.startswith('QR'):
+        return 30
+    if header == 'Machine':
+        return 24
+    return min(max(len(header) + 2, 12), 40)
+
+
+def monitoring_excel_row(record):
+    """Cell values of one monitoring record, in MONITORING_HEADERS order"""
+    # Common fields
+    row = [
+        record.get('prep_id') or '-',
+        record.get('post_id') or '-',
+        record.get('display_name', 'N/A'),
+        record.get('machine_type', 'N/A'),
+        record.get('qr_code', '-'),
+    ]
     
-    # Status-based fills
-    status_fills = {
-        'OK': PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid"),
-        'NG': PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid"),
-        'Pending': PatternFill(start_color="FFEB9C", end_color="FFEB9C", fill_type="solid"),
-    }
+    # Date and Time
+    timestamp_str = record.get('timestamp', '')
+    try:
+        dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+        row += [dt.strftime('%Y-%m-%d'), dt.strftime('%H:%M:%S')]
+    except:
+        row += [timestamp_str, '']
     
-    # Comprehensive headers - include ALL possible fields
-    headers = [
-        'Prep ID', 'Post ID', 'Machine', 'Machine Type', 'QR Code', 
-        'Date', 'Time', 'Status', 'Model Name', 'Previous Status',
-        # Assembly specific
-        'QR Internal', 'QR External', 'QR Housing',
-        'Model Internal', 'Model External', 'Model Housing',
-        'Prev Internal Status', 'Prev Housing Status',
-        # Painting specific
-        'QR Piston', 'Model Piston', 'Model Housing (Paint)', 'Pre-Status',
-        # Lubrication specific  
-        'QR Piston (Lub)', 'QR Housing (Lub)', 'Model Piston (Lub)', 'Model Housing (Lub)',
-        # OP80 specific
-        'QR Piston (OP80)', 'QR Housing (OP80)', 'QR Housing New', 'Model Internal (OP80)', 
-        'Model External (OP80)', 'Match Status',
-        # Gauge specific
-        'Gauge Value 1', 'Gauge Value 2', 'Gauge Value 3', 
-        'Gauge Value 4', 'Gauge Value 5', 'Gauge Value 6',
-        # Washing specific
-        'Washing Stage', 'Washing Prev Status'
+    # Status, Model Name and Previous Status
+    row += [
+        record.get('status', 'Pending'),
+        record.get('model_name', 'N/A'),
+        record.get('previous_machine_status', '-'),
     ]
     
-    # Write headers
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = header_alignment
-        cell.border = border_style
-        ws.row_dimensions[1].height = 30
-    
-    # Data rows
-    for row_num, record in enumerate(results, 2):
-        col_num = 1
-        
-        # Common fields
-        ws.cell(row=row_num, column=col_num, value=record.get('prep_id') or '-')
-        col_num += 1
-        ws.cell(row=row_num, column=col_num, value=record.get('post_id') or '-')
-        col_num += 1
-        ws.cell(row=row_num, column=col_num, value=record.get('display_name', 'N/A'))
-        col_num += 1
-        ws.cell(row=row_num, column=col_num, value=record.get('machine_type', 'N/A'))
-        col_num += 1
-        ws.cell(row=row_num, column=col_num, value=record.get('qr_code', '-'))
-        col_num += 1
-        
-        # Date and Time
-        timestamp_str = record.get('timestamp', '')
-        try:
-            dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-            ws.cell(row=row_num, column=col_num, value=dt.strftime('%Y-%m-%d'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=dt.strftime('%H:%M:%S'))
-            col_num += 1
-        except:
-            ws.cell(row=row_num, column=col_num, value=timestamp_str)
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value='')
-            col_num += 1
-        
-        # Status with color
-        status = record.get('status', 'Pending')
-        status_cell = ws.cell(row=row_num, column=col_num, value=status)
-        if status in status_fills:
-            status_cell.fill = status_fills[status]
-        status_cell.font = Font(bold=True)
-        col_num += 1
-        
-        # Model Name and Previous Status
-        ws.cell(row=row_num, column=col_num, value=record.get('model_name', 'N/A'))
-        col_num += 1
-        ws.cell(row=row_num, column=col_num, value=record.get('previous_machine_status', '-'))
-        col_num += 1
-        
-        # Assembly specific fields
-        machine_type = record.get('machine_type', '')
-        if machine_type == 'assembly':
-            ws.cell(row=row_num, column=col_num, value=record.get('qr_internal', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('qr_external', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('qr_housing', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('model_name_internal', 'N/A'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('model_name_external', 'N/A'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('model_name_housing', 'N/A'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('previous_machine_internal_status', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('previous_machine_housing_status', '-'))
-            col_num += 1
-        else:
-            for _ in range(8):
-                ws.cell(row=row_num, column=col_num, value='-')
-                col_num += 1
-        
-        # Painting specific fields
-        if record.get('machine_name', '').find('Painting') != -1:
-            ws.cell(row=row_num, column=col_num, value=record.get('qr_piston', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('model_name_piston', 'N/A'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('model_name_housing', 'N/A'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('pre_status', '-'))
-            col_num += 1
-        else:
-            for _ in range(4):
-                ws.cell(row=row_num, column=col_num, value='-')
-                col_num += 1
-        
-        # Lubrication specific fields
-        if record.get('machine_name', '').find('Lubrication') != -1:
-            ws.cell(row=row_num, column=col_num, value=record.get('qr_piston', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('qr_housing', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('model_name_piston', 'N/A'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('model_name_housing', 'N/A'))
-            col_num += 1
-        else:
-            for _ in range(4):
-                ws.cell(row=row_num, column=col_num, value='-')
-                col_num += 1
-        
-        # OP80 specific fields
-        if machine_type == 'op80':
-            ws.cell(row=row_num, column=col_num, value=record.get('qr_piston', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('qr_housing', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('qr_housing_new', '-'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('model_name_internal', 'N/A'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('model_name_external', 'N/A'))
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('match_status', '-'))
-            col_num += 1
-        else:
-            for _ in range(6):
-                ws.cell(row=row_num, column=col_num, value='-')
-                col_num += 1
-        
-        # Gauge values
-        gauge_values = record.get('gauge_values', {})
-        for i in range(1, 7):
-            val = gauge_values.get(f'value{i}', '-')
-            ws.cell(row=row_num, column=col_num, value=val)
-            col_num += 1
-        
-        # Washing specific fields
-        if machine_type == 'washing':
-            operation = record.get('operation', '')
-            stage = 'Loading' if operation == 'load' else 'Unloading' if operation == 'unload' else '-'
-            ws.cell(row=row_num, column=col_num, value=stage)
-            col_num += 1
-            ws.cell(row=row_num, column=col_num, value=record.get('previous_machine_status', '-'))
-            col_num += 1
-        else:
-            for _ in range(2):
-                ws.cell(row=row_num, column=col_num, value='-')
-                col_num += 1
-        
-        # Apply borders to all cells in row
-        for c in range(1, col_num):
-            ws.cell(row=row_num, column=c).border = border_style
-            ws.cell(row=row_num, column=c).alignment = Alignment(vertical="center")
-    
-    # Auto-fit column widths
-    for col_num in range(1, len(headers) + 1):
-        column_letter = get_column_letter(col_num)
-        max_length = len(headers[col_num - 1])
-        for cell in ws[column_letter][1:]:  # Skip header
-            try:
-                if cell.value and str(cell.value) != '-':
-                    max_length = max(max_length, len(str(cell.value)))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 40)
-        ws.column_dimensions[column_letter].width = adjusted_width
+    # Assembly specific fields
+    machine_type = record.get('machine_type', '')
+    if machine_type == 'assembly':
+        row += [
+            record.get('qr_internal', '-'),
+            record.get('qr_external', '-'),
+            record.get('qr_housing', '-'),
+            record.get('model_name_internal', 'N/A'),
+            record.get('model_name_external', 'N/A'),
+            record.get('model_name_housing', 'N/A'),
+            record.get('previous_machine_internal_status', '-'),
+            record.get('previous_machine_housing_status', '-'),
+        ]
+    else:
+        row += ['-'] * 8
+    
+    # Painting specific fields
+    if record.get('machine_name', '').find('Painting') != -1:
+        row += [
+            record.get('qr_piston', '-'),
+            record.get('model_name_piston', 'N/A'),
+            record.get('model_name_housing', 'N/A'),
+            record.get('pre_status', '-'),
+        ]
+    else:
+        row += ['-'] * 4
+    
+    # Lubrication specific fields
+    if record.get('machine_name', '').find('Lubrication') != -1:
+        row += [
+            record.get('qr_piston', '-'),
+            record.get('qr_housing', '-'),
+            record.get('model_name_piston', 'N/A'),
+            record.get('model_name_housing', 'N/A'),
+        ]
+    else:
+        row += ['-'] * 4
+    
+    # OP80 specific fields
+    if machine_type == 'op80':
+        row += [
+            record.get('qr_piston', '-'),
+            record.get('qr_housing', '-'),
+            record.get('qr_housing_new', '-'),
+            record.get('model_name_internal', 'N/A'),
+            record.get('model_name_external', 'N/A'),
+            record.get('match_status', '-'),
+        ]
+    else:
+        row += ['-'] * 6
     
-    # Freeze header row and first 5 columns
-    ws.freeze_panes = 'F2'
+    # Gauge values
+    gauge_values = record.get('gauge_values', {})
+    row += [gauge_values.get(f'value{i}', '-') for i in range(1, 7)]
     
-    # Save to response
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="monitoring_detailed_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
+    # Washing specific fields
+    if machine_type == 'washing':
+        operation = record.get('operation', '')
+        stage = 'Loading' if operation == 'load' else 'Unloading' if operation == 'unload' else '-'
+        row += [stage, record.get('previous_machine_status', '-')]
+    else:
+        row += ['-'] * 2
     
-    wb.save(response)
-    return response
+    return row
 
 
 
 @csrf_exempt
-def monitoring_chart_data_api(request):
-    """API endpoint for chart data"""
-    if request.method != 'GET':
-        return JsonResponse({'success': False, 'error': 'Invalid method'}, status=405)
-    
-    # Get the same filters
-    filters = {
-        'qr_code': request.GET.get('qr_code', ''),
-        'model_name': request.GET.get('model_name', ''),
-        'machine': request.GET.get('machine', ''),
-        'time_filter': request.GET.get('time_filter', '1hour'),
-        'start_date': request.GET.get('start_date', ''),
-        'end_date': request.GET.get('end_date', ''),
-        'status': request.GET.get('status', ''),
-    }
-    
-    # Get data
-    results = search_monitoring_data(filters)
-    
-    # Prepare chart data
-    from collections import defaultdict
+def chart_columns(config, model):
+    """(status, model name) expressions matching describe_monitoring_row()'s 'status' and 'model_name'"""
+    machine_name = config['name']
+    machine_type = config.get('type', 'standard')
+    field_names = {field.name for field in model._meta.fields}
+    
+    if machine_type == 'washing':
+        status = F('status')
+    elif 'OP40' in machine_name:
+        complete = Q(qr_data_external__gt='') & Q(qr_data_housing__gt='')
+        status = Case(When(complete, then=F('status')), default=Value('Pending'), output_field=CharField())
+    else:
+        status = Case(When(post__isnull=True, then=Value('Pending')), default=F('post__status'), output_field=CharField())
+    
+    if machine_type != 'washing' and ('OP40' in machine_name or 'Oring_leak' in machine_name):
+        model_field = 'model_name_internal'
+    elif 'Painting' in machine_name:
+        model_field = 'model_name_housing'
+    elif 'Lubrication' in machine_name:
+        model_field = 'model_name_piston'
+    else:
+        model_field = 'model_name'
+    model_name = F(model_field) if model_field in field_names else Value('N/A', output_field=CharField())
+    return status, model_name
+
+
+def station_chart_counts(config, queryset):
+    """(hour, minute, model name, status, count) for one station's matching rows, grouped by the database"""
+    time_field = monitoring_time_field(queryset.model)
+    status, model_name = chart_columns(config, queryset.model)
+    rows = (
+        queryset
+        .annotate(
+            chart_hour=ExtractHour(time_field),
+            chart_minute=ExtractMinute(time_field),
+            chart_model=model_name,
+            chart_status=status,
+        )
+        .order_by()
+        .values('chart_hour', 'chart_minute', 'chart_model', 'chart_status')
+        .annotate(chart_count=Count('id'))
+    )
+    for row in rows:
+        yield row['chart_hour'], row['chart_minute'], row['chart_model'], row['chart_status'], row['chart_count']
+
+
+def monitoring_chart_data(filters):
+    """Chart aggregates over every row matching the filters, counted in SQL without the per-machine limit"""
+    qr_code = filters.get('qr_code', '').strip()
+    model_name = filters.get('model_name', '')
+    status_filter = filters.get('status', '')
+    start_dt, end_dt = get_monitoring_range(filters)
     
     # Time-based aggregation (per 5-minute intervals)
     time_status_data = defaultdict(lambda: {'OK': 0, 'NG': 0, 'Pending': 0})
     machine_status_data = defaultdict(lambda: {'OK': 0, 'NG': 0, 'Pending': 0})
     model_status_data = defaultdict(lambda: {'OK': 0, 'NG': 0, 'Pending': 0})
+    total = 0
     
-    for record in results:
-        # Time aggregation
-        timestamp_str = record.get('timestamp', '')
-        try:
-            dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-            # Round to 5-minute intervals
-            time_key = dt.replace(minute=(dt.minute // 5) * 5, second=0, microsecond=0).strftime('%H:%M')
-        except:
-            time_key = 'Unknown'
-        
-        status = record.get('status', 'Pending')
-        time_status_data[time_key][status] += 1
-        
-        # Machine aggregation
-        machine_name = record.get('display_name', 'Unknown')
-        machine_status_data[machine_name][status] += 1
+    for config in get_monitoring_configs(filters.get('machine', '')):
+        queryset = monitoring_queryset(config, qr_code, model_name, start_dt, end_dt, status_filter)
+        if queryset is None:
+            continue
+        machine_name = config.get('display_name', config['name'])
         
-        # Model aggregation
-        model_name = record.get('model_name', 'N/A')
-        if model_name != 'N/A':
-            model_status_data[model_name][status] += 1
+        for hour, minute, row_model, status, count in station_chart_counts(config, queryset):
+            total += count
+            if status not in ('OK', 'NG', 'Pending'):
+                continue
+            time_key = 'Unknown' if hour is None else f'{hour:02d}:{minute // 5 * 5:02d}'
+            time_status_data[time_key][status] += count
+            machine_status_data[machine_name][status] += count
+            if row_model != 'N/A':
+                model_status_data[row_model][status] += count
     
     # Format for charts
     sorted_times = sorted(time_status_data.keys())
     
-    chart_data = {
+    return {
         'time_series': {
             'labels': sorted_times,
             'ok': [time_status_data[t]['OK'] for t in sorted_times],
@@ -875,14 +855,23 @@ def monitoring_chart_data_api(request):
             'pending': [model_status_data[m]['Pending'] for m in model_status_data.keys()],
         },
         'summary': {
-            'total': len(results),
-            'ok': sum(r['status'] == 'OK' for r in results),
-            'ng': sum(r['status'] == 'NG' for r in results),
-            'pending': sum(r['status'] == 'Pending' for r in results),
+            'total': total,
+            'ok': sum(data['OK'] for data in machine_status_data.values()),
+            'ng': sum(data['NG'] for data in machine_status_data.values()),
+            'pending': sum(data['Pending'] for data in machine_status_data.values()),
         }
     }
+
+
+def monitoring_chart_data_api(request):
+    """API endpoint for chart data"""
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Invalid method'}, status=405)
+    
+    # Get the same filters
+    filters = get_monitoring_filters(request.GET)
     
     return JsonResponse({
         'success': True,
-        'data': chart_data
-    })
\ No newline at end of file
+        'data': monitoring_chart_data(filters)
+    })
@@ -0,0 +1,100 @@
+"""
+Stored prep -> post pairing.
+
+Each paired prep row keeps the id of its postprocessing row in ``post_id``
+so read paths get the status with one join (``select_related('post')``)
+instead of re-matching QR strings per row. The pairing follows the same
+rules as the dashboard: POST_MATCH_RULES tried in order, newest post wins.
+
+On PostgreSQL the triggers from migration 0010 keep ``post_id`` current
+for every writer (including the PLC gateways); on other backends the
+handlers in signals.py do it for ORM saves. ``backfill_post_pairing``
+resolves rows that predate the column.
+"""
+
+from django.db.models import Max, Q
+from .views import MACHINE_CONFIGS, OP80_CONFIG, get_post_match_rules
+
+
+def get_pairing_sources():
+    """One entry per station with a stored pairing: prep model, post model and join rules"""
+    sources = []
+    for config in MACHINE_CONFIGS + [OP80_CONFIG]:
+        rules = get_post_match_rules(config)
+        if rules and config['prep_model'] and config['post_model']:
+            sources.append({
+                'prep_model': config['prep_model'],
+                'post_model': config['post_model'],
+                'rules': rules,
+            })
+    return sources
+
+
+def resolve_post_ids(preps, post_model, rules):
+    """Newest matching post id for each prep row (same order as preps, None when unmatched)"""
+    post_ids = [None] * len(preps)
+
+    for prep_field, post_field in rules:
+        values = {
+            getattr(prep, prep_field) for i, prep in enumerate(preps)
+            if post_ids[i] is None and getattr(prep, prep_field)
+        }
+        if not values:
+            continue
+
+        newest = dict(
+            post_model.objects.filter(**{f'{post_field}__in': values})
+            .order_by()
+            .values_list(post_field)
+            .annotate(Max('id'))
+        )
+        for i, prep in enumerate(preps):
+            if post_ids[i] is None:
+                post_ids[i] = newest.get(getattr(prep, prep_field))
+
+    return post_ids
+
+
+def load_posts(config, preps):
+    """Newest matching post row for each of one station's prep rows, keyed by prep id (None when unmatched)
+
+    Batch loader for the read paths that match posts live rather than via
+    the stored pairing: one ``__in`` query per join rule (OP80 falls back
+    through its rules in order) and one for the post rows, however many
+    prep rows there are.
+    """
+    preps = list(preps)
+    rules = get_post_match_rules(config)
+    if not preps or not rules or not config.get('post_model'):
+        return {prep.id: None for prep in preps}
+
+    post_ids = resolve_post_ids(preps, config['post_model'], rules)
+    posts = config['post_model'].objects.in_bulk({post_id for post_id in post_ids if post_id is not None})
+    return {prep.id: posts.get(post_id) for prep, post_id in zip(preps, post_ids)}
+
+
+def pair_prep_rows(prep_rows, source):
+    """Re-resolve post_id for the given prep rows and save the ones that changed"""
+    prep_rows = list(prep_rows)
+    post_ids = resolve_post_ids(prep_rows, source['post_model'], source['rules'])
+
+    changed = []
+    for prep, post_id in zip(prep_rows, post_ids):
+        if prep.post_id != post_id:
+            prep.post_id = post_id
+            changed.append(prep)
+
+    if changed:
+        source['prep_model'].objects.bulk_update(changed, ['post_id'])
+    return len(changed)
+
+
+def pair_post_row(post, source):
+    """Re-pair every prep row a new, changed or deleted post row can affect"""
+    query = Q(post_id=post.id)
+    for prep_field, post_field in source['rules']:
+        value = getattr(post, post_field)
+        if value:
+            query |= Q(**{prep_field: value})
+
+    return pair_prep_rows(source['prep_model'].objects.filter(query), source)
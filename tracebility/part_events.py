@@ -0,0 +1,72 @@
+"""
+Part event log: one append-only row per QR code per station event.
+
+Every pre/post insert and every status change on a station table is
+recorded in ``part_event`` with the QR code, the column it came from
+(qr_role), the station op_code, the stage and the status at that moment.
+Tracing a part is then a single indexed query on ``part_event.qr`` instead
+of one query per station table.
+
+On PostgreSQL the rows are written by the AFTER triggers from migration
+0008 so inserts from the PLC gateways are covered as well; on other
+backends the post_save handler in signals.py writes them for ORM saves.
+``backfill_part_events`` fills the log from rows that predate it.
+"""
+
+from .models import PartEvent
+from .views import MACHINE_CONFIGS, ASSEMBLY_CONFIGS, OP80_CONFIG
+
+
+def get_part_event_sources():
+    """One entry per station table: model, op_code, stage, QR columns, status and time column"""
+    sources = {}
+
+    for config in MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]:
+        if config['type'] == 'assembly':
+            stages = [(config['prep_model'], 'assembly')]
+        else:
+            stages = [(config['prep_model'], 'pre'), (config['post_model'], 'post')]
+
+        for model, stage in stages:
+            if model is None or model in sources:
+                continue
+            field_names = [f.name for f in model._meta.fields]
+            sources[model] = {
+                'model': model,
+                'table': model._meta.db_table,
+                'op_code': config['op_code'],
+                'stage': stage,
+                'qr_fields': [name for name in field_names if name.startswith('qr_data')],
+                'status_field': 'status' if 'status' in field_names else None,
+                'time_field': 'event_time' if 'event_time' in field_names else 'timestamp_internal',
+            }
+
+    return list(sources.values())
+
+
+def build_part_events(source, row):
+    """Unsaved PartEvent objects for one station row (a model instance or a values() dict)"""
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    status = get(source['status_field']) if source['status_field'] else None
+
+    events = []
+    for qr_field in source['qr_fields']:
+        qr = get(qr_field)
+        if not qr:
+            continue
+        events.append(PartEvent(
+            qr=qr,
+            qr_role=qr_field,
+            op_code=source['op_code'],
+            stage=source['stage'],
+            status=status,
+            event_time=get(source['time_field']),
+            source_table=source['table'],
+            source_id=get('id'),
+        ))
+    return events
+
+
+def get_part_history(qr):
+    """Every recorded event for a QR code across all stations, oldest first"""
+    return PartEvent.objects.filter(qr=qr).order_by('event_time', 'id')
@@ -0,0 +1,51 @@
+"""
+QR code lookups shared by the dashboard, rework and monitoring searches.
+
+A complete-looking code (QR_COMPLETE_MIN_LENGTH characters or more, no
+spaces) is first looked up by equality, which the B-tree indexes on the QR
+columns serve (the unique constraints, plus the db_index columns of
+migration 0005; on PostgreSQL those also get ``*_like`` varchar_pattern_ops
+indexes). Only when no row has the exact code - and for partial input - is
+the input matched as a case-insensitive substring, so a lowercase code or a
+partial serial pasted from the middle of a label still finds the part. On
+PostgreSQL the substring lookup compiles to ``UPPER(column::text) LIKE
+UPPER(%s)``, which the pg_trgm GIN indexes on UPPER(column) serve
+(migration 0006); without pg_trgm it is a sequential scan.
+"""
+
+from django.db.models import Q
+
+# Shorter input is treated as a partial serial and never probed by equality
+QR_COMPLETE_MIN_LENGTH = 10
+
+
+def normalize_qr(qr_code):
+    """Strip whitespace picked up when QR codes are pasted from labels / spreadsheets"""
+    return (qr_code or '').strip()
+
+
+def is_complete_qr(qr_code):
+    """True when the input looks like a whole QR code rather than a fragment"""
+    return len(qr_code) >= QR_COMPLETE_MIN_LENGTH and not any(c.isspace() for c in qr_code)
+
+
+def qr_search_q(qr_code, *fields, model=None):
+    """Q matching qr_code against any of the given QR columns
+
+    With model given, a complete code that some row of model holds exactly
+    matches only those rows (an indexed lookup); otherwise, or when no row
+    holds it, the code matches as a case-insensitive substring.
+    """
+    qr_code = normalize_qr(qr_code)
+
+    if model is not None and is_complete_qr(qr_code):
+        exact = Q()
+        for field in fields:
+            exact |= Q(**{field: qr_code})
+        if model.objects.filter(exact).exists():
+            return exact
+
+    query = Q()
+    for field in fields:
+        query |= Q(**{f'{field}__icontains': qr_code})
+    return query
@@ -0,0 +1,74 @@
+"""
+Incremental record window for the machine detail streams.
+
+A machine channel used to rebuild its table from the newest 100 rows on
+every change. A RecordWindow keeps those rows (as stream records) and on
+refresh fetches only
+
+* rows above the highest id already in the window (new parts), and
+* rows of the window that may have changed in place, given by the
+  window's changed_q(records) - e.g. preps whose stored post pairing now
+  points past the newest post the window has seen (a late post row).
+
+both in one query, so a change to one part reads one row. Edits that do
+not move ids (rework, deletes, re-pairing to an older post) are picked up
+by a full reload every RELOAD_INTERVAL seconds.
+"""
+
+import time
+from django.db.models import Q
+
+
+WINDOW_SIZE = 100
+RELOAD_INTERVAL = 60
+
+
+class RecordWindow:
+    """The newest WINDOW_SIZE records of one station table, refreshed from the rows that changed"""
+
+    def __init__(self, queryset, build_record, changed_q=None, sort_key=None,
+                 size=WINDOW_SIZE, reload_interval=RELOAD_INTERVAL):
+        # queryset must list the newest rows first (the station models order by -id)
+        self.queryset = queryset
+        self.build_record = build_record
+        self.changed_q = changed_q
+        self.sort_key = sort_key
+        self.size = size
+        self.reload_interval = reload_interval
+        self.records = {}  # row id -> record
+        self.loaded_at = None
+
+    def refresh(self):
+        """Bring the window up to date and return its records in display order"""
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.reload_interval:
+            self.reload()
+        else:
+            self.update()
+
+        records = sorted(self.records.items(), reverse=True)
+        records = [record for row_id, record in records]
+        if self.sort_key:
+            records.sort(key=self.sort_key)
+        return records
+
+    def reload(self):
+        self.records = {row.id: self.build_record(row) for row in self.queryset[:self.size]}
+        self.loaded_at = time.monotonic()
+
+    def update(self):
+        q = Q(id__gt=max(self.records, default=0))
+        if self.changed_q and self.records:
+            q |= self.changed_q(self.records)
+
+        # Newest first: if the limit cuts changed rows off, new rows have pushed them out of the window anyway
+        for row in self.queryset.filter(q)[:self.size]:
+            self.records[row.id] = self.build_record(row)
+
+        for row_id in sorted(self.records)[:-self.size]:
+            del self.records[row_id]
+
+
+def late_post_q(records):
+    """Window preps whose stored pairing moved to a post newer than any the window has seen"""
+    post_watermark = max((record['post_id'] or 0 for record in records.values()), default=0)
+    return Q(id__gte=min(records), post_id__gt=post_watermark)
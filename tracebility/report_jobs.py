@@ -0,0 +1,261 @@
+"""
+Background report jobs for the heavy exports.
+
+Building a month of analytics or monitoring rows into a workbook takes
+minutes, which ties up a web worker and runs into proxy timeouts. Instead
+the page submits a ReportJob (kind + export parameters) and polls it;
+`manage.py run_report_worker` builds the file into REPORTS_DIR with the
+same code as the direct export views, and the page downloads it when the
+job is done.
+
+* Identical requests share a job: params_hash is unique among queued and
+  running jobs (a partial unique constraint), so concurrent submits of the
+  same report get the job already in the queue.
+* Workers claim the oldest queued job with a conditional UPDATE, so
+  several workers can share the queue on any database backend.
+* Each claim gets a claim_token, and the worker running the job touches
+  heartbeat_at every HEARTBEAT_SECONDS. Only jobs whose heartbeat is older
+  than STALE_JOB_SECONDS (their worker died) are queued again, however
+  long a live build takes. A claim writes its own part file and only
+  records its outcome while it still holds the job, so a worker that was
+  presumed dead cannot clobber the file or result of the one that took
+  over. Finished jobs and their files are removed after the worker's
+  --keep-days.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .csv_export import csv_chunks, encode_chunks
+from .excel_export import XLSX_CONTENT_TYPE
+from .models import ReportJob
+
+
+HEARTBEAT_SECONDS = 30
+
+# A running job whose heartbeat is this old has lost its worker
+STALE_JOB_SECONDS = 10 * HEARTBEAT_SECONDS
+
+ANALYTICS_PARAMS = ('start_date', 'end_date', 'machine', 'status')
+MONITORING_PARAMS = ('qr_code', 'model_name', 'machine', 'time_filter', 'start_date', 'end_date', 'status')
+
+
+def write_analytics_csv(params, file):
+    from .analytics_cache import get_cached_analytics
+    from .chunked_analytics import collect_report_analytics
+    from .views import analytics_export_rows, get_date_range
+
+    machine_filter = params.get('machine', 'all')
+    status_filter = params.get('status', 'all')
+    start_date, end_date = get_date_range(params.get('start_date'), params.get('end_date'))
+    data = get_cached_analytics(start_date, end_date, machine_filter, status_filter, collect=collect_report_analytics)
+    for chunk in encode_chunks(csv_chunks(analytics_export_rows(data, start_date, end_date, machine_filter, status_filter))):
+        file.write(chunk)
+
+
+def write_analytics_xlsx(params, file):
+    from .chunked_analytics import collect_report_analytics
+    from .views import build_analytics_workbook
+
+    build_analytics_workbook(
+        params.get('start_date'), params.get('end_date'), params.get('machine', 'all'), params.get('status', 'all'),
+        collect=collect_report_analytics,
+    ).save(file)
+
+
+def write_monitoring_xlsx(params, file):
+    from .monitoring_views import build_monitoring_workbook, get_monitoring_filters
+
+    build_monitoring_workbook(get_monitoring_filters(params)).save(file)
+
+
+REPORT_KINDS = {
+    'analytics_csv': {
+        'params': ANALYTICS_PARAMS,
+        'write': write_analytics_csv,
+        'download_name': 'analytics_export',
+        'extension': 'csv',
+        'content_type': 'text/csv',
+        'direct_view': 'dashboard:analytics_export',
+    },
+    'analytics_xlsx': {
+        'params': ANALYTICS_PARAMS,
+        'write': write_analytics_xlsx,
+        'download_name': 'analytics_report',
+        'extension': 'xlsx',
+        'content_type': XLSX_CONTENT_TYPE,
+        'direct_view': 'dashboard:analytics_export_excel',
+    },
+    'monitoring_xlsx': {
+        'params': MONITORING_PARAMS,
+        'write': write_monitoring_xlsx,
+        'download_name': 'monitoring_detailed',
+        'extension': 'xlsx',
+        'content_type': XLSX_CONTENT_TYPE,
+        'direct_view': 'dashboard:monitoring_export_excel',
+    },
+}
+
+
+def get_reports_dir():
+    return Path(getattr(settings, 'REPORTS_DIR', Path(settings.BASE_DIR) / 'reports'))
+
+
+def get_report_path(job):
+    return get_reports_dir() / job.file_name
+
+
+def report_params(kind, query):
+    """The kind's export parameters present in query (empty values left out)"""
+    return {name: query[name] for name in REPORT_KINDS[kind]['params'] if query.get(name)}
+
+
+def get_params_hash(kind, params):
+    return hashlib.sha256(json.dumps([kind, params], sort_keys=True).encode()).hexdigest()
+
+
+def submit_report(kind, params):
+    """(job, created): a new queued job, or the queued / running job for the same request"""
+    params_hash = get_params_hash(kind, params)
+    active = ReportJob.objects.filter(params_hash=params_hash, status__in=ReportJob.ACTIVE_STATUSES)
+
+    job = active.first()
+    if job:
+        return job, False
+    try:
+        with transaction.atomic():
+            return ReportJob.objects.create(kind=kind, params=params, params_hash=params_hash), True
+    except IntegrityError:
+        # An identical request was queued in between
+        return active.get(), False
+
+
+def claim_next_job():
+    """The oldest queued job, marked running under a new claim token (None when the queue is empty)"""
+    while True:
+        job = ReportJob.objects.filter(status=ReportJob.QUEUED).order_by('id').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        token = uuid.uuid4().hex
+        claimed = ReportJob.objects.filter(id=job.id, status=ReportJob.QUEUED).update(
+            status=ReportJob.RUNNING, started_at=now, heartbeat_at=now, claim_token=token,
+        )
+        if claimed:
+            job.status = ReportJob.RUNNING
+            job.started_at = job.heartbeat_at = now
+            job.claim_token = token
+            return job
+        # Another worker claimed it first
+
+
+def claimed(job):
+    """The job's rows while job.claim_token still holds it"""
+    return ReportJob.objects.filter(id=job.id, status=ReportJob.RUNNING, claim_token=job.claim_token)
+
+
+def beat(job, stop, interval=HEARTBEAT_SECONDS):
+    """Touch heartbeat_at every interval seconds until stop is set (runs on its own thread and connection)"""
+    try:
+        while not stop.wait(interval):
+            if not claimed(job).update(heartbeat_at=timezone.now()):
+                return  # requeued or finished elsewhere
+    finally:
+        connection.close()
+
+
+def run_job(job):
+    """Build the job's file into REPORTS_DIR and record the outcome (unless the job was taken over meanwhile)"""
+    report = REPORT_KINDS.get(job.kind)
+    reports_dir = get_reports_dir()
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    file_name = f'report_{job.id}_{job.claim_token}.{report["extension"] if report else "out"}'
+    partial = reports_dir / f'{file_name}.part'
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=beat, args=(job, stop), name=f'report-job-{job.id}', daemon=True)
+    heartbeat.start()
+    try:
+        if report is None:
+            raise ValueError(f"Unknown report kind '{job.kind}'")
+        with open(partial, 'wb') as file:
+            report['write'](job.params, file)
+        os.replace(partial, reports_dir / file_name)
+    except Exception as exc:
+        partial.unlink(missing_ok=True)
+        job.status = ReportJob.FAILED
+        job.error = f'{type(exc).__name__}: {exc}'
+    else:
+        job.status = ReportJob.DONE
+        job.file_name = file_name
+        job.size = (reports_dir / file_name).stat().st_size
+        created = timezone.localtime(job.created_at)
+        job.download_name = f'{report["download_name"]}_{created.strftime("%Y%m%d_%H%M%S")}.{report["extension"]}'
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    job.finished_at = timezone.now()
+    recorded = claimed(job).update(
+        status=job.status, file_name=job.file_name, download_name=job.download_name,
+        size=job.size, error=job.error, finished_at=job.finished_at,
+    )
+    if not recorded:
+        # Presumed dead and queued again: the claim that took over records the result
+        if job.file_name:
+            (reports_dir / job.file_name).unlink(missing_ok=True)
+        job.refresh_from_db()
+    return job
+
+
+def requeue_stale_jobs(stale_seconds=STALE_JOB_SECONDS):
+    """Queue again the running jobs whose worker stopped sending heartbeats"""
+    cutoff = timezone.now() - timedelta(seconds=stale_seconds)
+    return ReportJob.objects.filter(status=ReportJob.RUNNING, heartbeat_at__lt=cutoff).update(
+        status=ReportJob.QUEUED, started_at=None, heartbeat_at=None, claim_token='',
+    )
+
+
+def purge_finished_jobs(keep_days):
+    """Delete finished jobs older than keep_days along with their files"""
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    old_jobs = ReportJob.objects.filter(status__in=[ReportJob.DONE, ReportJob.FAILED], finished_at__lt=cutoff)
+    for job in old_jobs.exclude(file_name=''):
+        get_report_path(job).unlink(missing_ok=True)
+    return old_jobs.delete()[0]
+
+
+def direct_url(job):
+    """The export view building the same file in the request (fallback when no worker runs)"""
+    report = REPORT_KINDS.get(job.kind)
+    if report is None:
+        return None
+    return f"{reverse(report['direct_view'])}?{urlencode(job.params)}"
+
+
+def job_payload(job):
+    """JSON view of a job for the status endpoints"""
+    return {
+        'job_id': job.id,
+        'kind': job.kind,
+        'params': job.params,
+        'status': job.status,
+        'error': job.error,
+        'size': job.size,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': reverse('dashboard:report_status_api', args=[job.id]),
+        'download_url': reverse('dashboard:report_download', args=[job.id]) if job.status == ReportJob.DONE else None,
+        'direct_url': direct_url(job),
+    }
@@ -0,0 +1,57 @@
+"""
+Report job endpoints: submit a heavy export, poll it, download the file
+"""
+
+import json
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .excel_export import file_response
+from .models import ReportJob
+from .report_jobs import REPORT_KINDS, get_report_path, job_payload, report_params, submit_report
+
+
+@csrf_exempt
+def report_submit_api(request):
+    """Queue a report (kind + the export's own query parameters); identical active requests share one job"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid method'}, status=405)
+
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or '{}')
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    else:
+        data = request.POST
+
+    kind = data.get('kind')
+    if kind not in REPORT_KINDS:
+        return JsonResponse({
+            'success': False,
+            'error': f"Unknown report kind, use one of: {', '.join(REPORT_KINDS)}",
+        }, status=400)
+
+    job, created = submit_report(kind, report_params(kind, data))
+    return JsonResponse({'success': True, 'created': created, **job_payload(job)}, status=202 if created else 200)
+
+
+def report_status_api(request, job_id):
+    job = ReportJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({'success': False, 'error': 'Report not found'}, status=404)
+    return JsonResponse({'success': True, **job_payload(job)})
+
+
+def report_download(request, job_id):
+    job = ReportJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({'success': False, 'error': 'Report not found'}, status=404)
+    if job.status != ReportJob.DONE:
+        return JsonResponse({'success': False, 'error': f'Report is {job.status}', **job_payload(job)}, status=409)
+
+    try:
+        file = open(get_report_path(job), 'rb')
+    except FileNotFoundError:
+        return JsonResponse({'success': False, 'error': 'Report file has been removed'}, status=410)
+    return file_response(request, file, job.download_name, REPORT_KINDS[job.kind]['content_type'])
@@ -21,8 +21,10 @@ from .views import (
     MACHINE_CONFIGS, 
     ASSEMBLY_CONFIGS, 
     OP80_CONFIG,
-    parse_timestamp_to_datetime
+    event_time_q
 )
+from .qr_search import qr_search_q
+from .pairing import load_posts
 
 
 def get_all_model_names():
@@ -116,9 +118,10 @@ def search_washing_load(config, qr_code, model_name, start_dt, end_dt, status_fi
     
     query = Q()
     if qr_code:
-        query &= Q(qr_data__icontains=qr_code)
+        query &= qr_search_q(qr_code, 'qr_data', model=prep_model)
     if model_name and model_name != 'all':
         query &= Q(model_name=model_name)
+    query &= event_time_q(prep_model, start_dt, end_dt)
     
     try:
         prep_records = prep_model.objects.filter(query)[:500]
@@ -129,17 +132,6 @@ def search_washing_load(config, qr_code, model_name, start_dt, end_dt, status_fi
     for prep in prep_records:
         timestamp = prep.timestamp
         
-        # Date filter
-        if start_dt or end_dt:
-            dt = parse_timestamp_to_datetime(timestamp)
-            if dt:
-                if timezone.is_naive(dt):
-                    dt = timezone.make_aware(dt)
-                if start_dt and dt < start_dt:
-                    continue
-                if end_dt and dt > end_dt:
-                    continue
-        
         # Get status from preprocessing
         status = getattr(prep, 'status', 'OK')
         
@@ -191,9 +183,10 @@ def search_washing_unload(config, qr_code, model_name, start_dt, end_dt, status_
     
     query = Q()
     if qr_code:
-        query &= Q(qr_data__icontains=qr_code)
+        query &= qr_search_q(qr_code, 'qr_data', model=post_model)
     if model_name and model_name != 'all':
         query &= Q(model_name=model_name)
+    query &= event_time_q(post_model, start_dt, end_dt)
     
     try:
         post_records = post_model.objects.filter(query)[:500]
@@ -204,17 +197,6 @@ def search_washing_unload(config, qr_code, model_name, start_dt, end_dt, status_
     for post in post_records:
         timestamp = post.timestamp
         
-        # Date filter
-        if start_dt or end_dt:
-            dt = parse_timestamp_to_datetime(timestamp)
-            if dt:
-                if timezone.is_naive(dt):
-                    dt = timezone.make_aware(dt)
-                if start_dt and dt < start_dt:
-                    continue
-                if end_dt and dt > end_dt:
-                    continue
-        
         # Get status from postprocessing
         status = getattr(post, 'status', 'OK')
         
@@ -341,17 +323,15 @@ def search_across_all_machines(filters):
         # QR Code filter
         if qr_code:
             if is_assembly:
-                query &= (Q(qr_data_internal__icontains=qr_code) | 
-                         Q(qr_data_external__icontains=qr_code) | 
-                         Q(qr_data_housing__icontains=qr_code))
+                query &= qr_search_q(qr_code, 'qr_data_internal', 'qr_data_external', 'qr_data_housing', model=config['prep_model'])
             elif 'Painting' in machine_name:
-                query &= (Q(qr_data_housing__icontains=qr_code) | Q(qr_data_piston__icontains=qr_code))
+                query &= qr_search_q(qr_code, 'qr_data_housing', 'qr_data_piston', model=config['prep_model'])
             elif 'Lubrication' in machine_name:
-                query &= (Q(qr_data_piston__icontains=qr_code) | Q(qr_data_housing__icontains=qr_code))
+                query &= qr_search_q(qr_code, 'qr_data_piston', 'qr_data_housing', model=config['prep_model'])
             elif is_op80:
-                query &= (Q(qr_data_piston__icontains=qr_code) | Q(qr_data_housing__icontains=qr_code))
+                query &= qr_search_q(qr_code, 'qr_data_piston', 'qr_data_housing', model=config['prep_model'])
             else:
-                query &= Q(qr_data__icontains=qr_code)
+                query &= qr_search_q(qr_code, 'qr_data', model=config['prep_model'])
         
         # Model name filter
         if model_name and model_name != 'all':
@@ -368,9 +348,14 @@ def search_across_all_machines(filters):
             else:
                 query &= Q(model_name=model_name)
         
+        # Date filter (runs in SQL on the indexed event time column)
+        query &= event_time_q(config['prep_model'], start_dt, end_dt)
+        
         # Get preprocessing records
         try:
-            prep_records = config['prep_model'].objects.filter(query)[:500]  # Limit to 500 results
+            prep_records = list(config['prep_model'].objects.filter(query)[:500])  # Limit to 500 results
+            # Post rows for the whole batch (one query per join rule instead of one per row)
+            posts = {} if is_assembly else load_posts(config, prep_records)
         except Exception as e:
             print(f"Error querying {machine_name}: {e}")
             continue
@@ -394,18 +379,6 @@ def search_across_all_machines(filters):
             else:
                 timestamp = prep.timestamp
             
-            # Date filter
-            if start_dt or end_dt:
-                dt = parse_timestamp_to_datetime(timestamp)
-                if dt:
-                    if timezone.is_naive(dt):
-                        dt = timezone.make_aware(dt)
-                    
-                    if start_dt and dt < start_dt:
-                        continue
-                    if end_dt and dt > end_dt:
-                        continue
-            
             # Get status and QR based on machine type
             if is_assembly:
                 qr_value = prep.qr_data_internal
@@ -431,10 +404,7 @@ def search_across_all_machines(filters):
                 qr_internal = '-'
                 
                 # Get post record
-                if qr_value_housing_prep:
-                    post = config['post_model'].objects.filter(qr_data_housing=qr_value_housing_prep).first()
-                else:
-                    post = None
+                post = posts.get(prep.id)
                     
                 status = post.status if post else 'Pending'
                 model_housing = getattr(prep, 'model_name_housing', 'N/A')
@@ -450,7 +420,7 @@ def search_across_all_machines(filters):
                 qr_housing = prep.qr_data_housing or '-'
                 qr_external = '-'
                 qr_internal = '-'
-                post = config['post_model'].objects.filter(qr_data_piston=qr_value).first()
+                post = posts.get(prep.id)
                 status = post.status if post else 'Pending'
                 model_piston = getattr(prep, 'model_name_piston', 'N/A')
                 model_housing = getattr(prep, 'model_name_housing', 'N/A')
@@ -466,12 +436,8 @@ def search_across_all_machines(filters):
                 qr_internal = qr_piston
                 qr_external = '-'
                 
-                # Get post record - CORRECTED: Match prep.qr_data_housing with post.qr_data_housing
-                # The postprocessing table has qr_data_housing which should match preprocessing qr_data_housing
-                if qr_housing and qr_housing != '-':
-                    post = config['post_model'].objects.filter(qr_data_housing=qr_housing).first()
-                else:
-                    post = None
+                # Get post record: housing -> housing, then housing -> housing_new, then piston -> housing
+                post = posts.get(prep.id)
                 
                 status = post.status if post else 'Pending'
                 
@@ -493,7 +459,7 @@ def search_across_all_machines(filters):
                 qr_external = '-'
                 qr_housing = '-'
                 qr_internal = '-'
-                post = config['post_model'].objects.filter(qr_data=qr_value).first() if config['post_model'] else None
+                post = posts.get(prep.id)
                 status = post.status if post else 'Pending'
                 model_value = getattr(prep, 'model_name', 'N/A')
                 previous_machine_status = getattr(prep, 'previous_machine_status', '-')
@@ -773,6 +739,7 @@ def rework_get_record_api(request, machine_name, prep_id):
     
     try:
         prep_record = config['prep_model'].objects.get(id=prep_id)
+        post = load_posts(config, [prep_record])[prep_record.id]
         
         # Get machine type
         machine_type = config.get('type', 'standard')
@@ -802,7 +769,6 @@ def rework_get_record_api(request, machine_name, prep_id):
             
         elif 'Painting' in config['name']:
             qr_value = prep_record.qr_data_housing or ''
-            post = config['post_model'].objects.filter(qr_data_housing=qr_value).first() if qr_value else None
             record['qr_code'] = qr_value
             record['qr_piston'] = prep_record.qr_data_piston or ''
             record['status'] = post.status if post else 'Pending'
@@ -814,7 +780,6 @@ def rework_get_record_api(request, machine_name, prep_id):
             
         elif 'Lubrication' in config['name']:
             qr_value = prep_record.qr_data_piston
-            post = config['post_model'].objects.filter(qr_data_piston=qr_value).first()
             record['qr_code'] = qr_value
             record['qr_housing'] = prep_record.qr_data_housing or ''
             record['status'] = post.status if post else 'Pending'
@@ -829,9 +794,6 @@ def rework_get_record_api(request, machine_name, prep_id):
             qr_piston = prep_record.qr_data_piston
             qr_housing = prep_record.qr_data_housing or ''
             
-            # Get post record - CORRECTED: Match by qr_data_housing
-            post = config['post_model'].objects.filter(qr_data_housing=qr_housing).first() if qr_housing else None
-            
             record['qr_code'] = qr_piston
             record['qr_piston'] = qr_piston
             record['qr_housing'] = qr_housing
@@ -854,7 +816,6 @@ def rework_get_record_api(request, machine_name, prep_id):
             
         else:
             qr_value = prep_record.qr_data
-            post = config['post_model'].objects.filter(qr_data=qr_value).first() if config['post_model'] else None
             record['qr_code'] = qr_value
             record['status'] = post.status if post else 'Pending'
             record['post_id'] = post.id if post else None
@@ -0,0 +1,699 @@
+"""
+Hourly analytics rollups.
+
+``analytics_rollup`` holds one row per (station, local date, hour, shift,
+model, status) with the part count and cycle-time sums. The analytics API
+and exports read those rows instead of walking every station row on each
+request:
+
+* hours fully covered by the rollups (before ``covered_until`` of the
+  watermark) come from ``analytics_rollup``;
+* the partial hours at the edges of the requested range and everything
+  after ``covered_until`` are aggregated live from the station tables
+  with one GROUP BY query per station (query_buckets).
+
+The per-station queries (live buckets, most recent rows) run on the
+station thread pool and are merged afterwards (collect_bucket_analytics).
+
+collect_sql_analytics uses the GROUP BY queries for the whole range, for
+deployments where the rollups have not been built yet.
+
+``update_analytics_rollups`` keeps the table current: it reads the
+``part_event`` log past the watermark, works out which (station, day)
+buckets those events touch and recomputes just those days. Status changes
+on older parts therefore show up after the next catch-up run.
+
+part_event ids are handed out at insert, not at commit, so a row can
+become visible after rows with higher ids. A catch-up run only consumes
+events created at least EVENT_SETTLE_SECONDS before it started, and stops
+at the first one that is newer, so the watermark never moves past an id
+whose transaction may still be open.
+"""
+
+import heapq
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import (
+    Case, CharField, Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum, Value, When,
+)
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import AnalyticsRollup, PartEvent, RollupWatermark
+from .station_pool import map_stations
+from .views import (
+    MACHINE_CONFIGS,
+    ASSEMBLY_CONFIGS,
+    OP80_CONFIG,
+    STANDARD_CYCLE_TIMES,
+    get_machine_config_by_id,
+    get_post_match_rules,
+    determine_shift,
+    calculate_cycle_time,
+    calculate_oee_for_shift,
+)
+
+
+ROLLUP_WATERMARK = 'analytics_rollup'
+
+# Days recomputed per query when rebuilding a station from scratch
+REBUILD_CHUNK_DAYS = 7
+
+# Age a part_event row must reach before a catch-up run consumes it
+EVENT_SETTLE_SECONDS = 60
+
+
+# ============================================================================
+# STATION ROWS
+# ============================================================================
+
+def get_all_configs():
+    return MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]
+
+
+def get_station_model(config):
+    """Table with one row per part for a station (the unload table for washing unload)"""
+    if config.get('type') == 'washing' and config.get('operation') == 'unload':
+        return config['post_model']
+    return config['prep_model']
+
+
+def get_time_field(model):
+    return 'event_time' if hasattr(model, 'event_time') else 'timestamp_internal'
+
+
+def station_rows(config, start, end):
+    """Station rows with start <= event time < end"""
+    model = get_station_model(config)
+    time_field = get_time_field(model)
+    queryset = model.objects.filter(**{f'{time_field}__gte': start, f'{time_field}__lt': end})
+    if get_post_match_rules(config):
+        queryset = queryset.select_related('post')
+    return queryset
+
+
+def describe_row(config, row):
+    """Analytics view of one station row: QR, status, model, shift and cycle time"""
+    machine_type = config.get('type')
+    model = get_station_model(config)
+    dt = timezone.localtime(getattr(row, get_time_field(model)))
+
+    if machine_type == 'assembly':
+        timestamp = dt
+        qr_value = row.qr_data_internal
+        model_name = getattr(row, 'model_name_internal', 'N/A')
+        status = row.status if row.qr_data_external and row.qr_data_housing else 'Pending'
+        cycle_time = calculate_cycle_time(row.timestamp_internal, row.timestamp_external or row.timestamp_internal)
+
+    elif machine_type == 'washing':
+        timestamp = row.timestamp
+        qr_value = row.qr_data
+        model_name = getattr(row, 'model_name', 'N/A')
+        status = getattr(row, 'status', 'OK')
+        cycle_time = None  # No cycle time for washing load / unload
+
+    else:
+        timestamp = row.timestamp
+        if machine_type == 'painting':
+            qr_value = row.qr_data_housing
+        elif machine_type in ('lubrication', 'op80'):
+            qr_value = row.qr_data_piston
+        else:
+            qr_value = row.qr_data
+        model_name = getattr(row, 'model_name', 'N/A')
+        post = row.post
+        status = post.status if post else 'Pending'
+        cycle_time = calculate_cycle_time(row.timestamp, post.timestamp if post else None)
+
+    return {
+        'machine': config['name'],
+        'display_name': config.get('display_name', config['name']),
+        'qr_code': qr_value,
+        'timestamp': timestamp,
+        'status': status,
+        'model_name': model_name,
+        'shift': determine_shift(dt),
+        'cycle_time': cycle_time,
+        'dt': dt,
+    }
+
+
+def status_q(config, status_filter):
+    """SQL equivalent of describe_row()['status'] == status_filter"""
+    if status_filter == 'all':
+        return Q()
+
+    machine_type = config.get('type')
+    if machine_type == 'washing':
+        return Q(status=status_filter)
+
+    if machine_type == 'assembly':
+        complete = Q(qr_data_external__gt='') & Q(qr_data_housing__gt='')
+        if status_filter == 'Pending':
+            return ~complete | Q(status='Pending')
+        return complete & Q(status=status_filter)
+
+    if status_filter == 'Pending':
+        return Q(post__isnull=True) | Q(post__status='Pending')
+    return Q(post__status=status_filter)
+
+
+# ============================================================================
+# BUCKETS: {(station, date, hour, shift, model_name, status): [count, ct_sum, ct_count]}
+# ============================================================================
+
+def new_buckets():
+    return defaultdict(lambda: [0, 0.0, 0])
+
+
+def merge_buckets(target, source):
+    for key, (count, ct_sum, ct_count) in source.items():
+        bucket = target[key]
+        bucket[0] += count
+        bucket[1] += ct_sum
+        bucket[2] += ct_count
+    return target
+
+
+def query_buckets(config, start, end):
+    """Buckets for one station with start <= event time < end, aggregated by the database"""
+    model = get_station_model(config)
+    time_field = get_time_field(model)
+    machine_type = config.get('type')
+    field_names = {field.name for field in model._meta.fields}
+
+    cycle_time = None
+    if machine_type == 'assembly':
+        complete = Q(qr_data_external__gt='') & Q(qr_data_housing__gt='')
+        status = Case(When(complete, then=F('status')), default=Value('Pending'), output_field=CharField())
+        model_name = F('model_name_internal')
+        cycle_time = F('timestamp_external') - F('timestamp_internal')
+        has_cycle_time = Q(timestamp_external__gt=F('timestamp_internal'))
+    elif machine_type == 'washing':
+        status = F('status')
+        model_name = F('model_name')
+    else:
+        status = Case(When(post__isnull=True, then=Value('Pending')), default=F('post__status'), output_field=CharField())
+        model_name = F('model_name') if 'model_name' in field_names else Value('N/A', output_field=CharField())
+        cycle_time = F('post__event_time') - F('event_time')
+        has_cycle_time = Q(post__event_time__gt=F('event_time'))
+
+    # Same boundaries as determine_shift(): A 06-14, B 14-22, C 22-06
+    shift = Case(
+        When(bucket_hour__gte=6, bucket_hour__lt=14, then=Value('A')),
+        When(bucket_hour__gte=14, bucket_hour__lt=22, then=Value('B')),
+        default=Value('C'),
+        output_field=CharField(),
+    )
+    aggregates = {'bucket_count': Count('id')}
+    if cycle_time is not None:
+        aggregates['bucket_ct_sum'] = Sum(ExpressionWrapper(cycle_time, output_field=DurationField()), filter=has_cycle_time)
+        aggregates['bucket_ct_count'] = Count('id', filter=has_cycle_time)
+
+    rows = (
+        model.objects.filter(**{f'{time_field}__gte': start, f'{time_field}__lt': end})
+        .annotate(
+            bucket_date=TruncDate(time_field),
+            bucket_hour=ExtractHour(time_field),
+            bucket_model=model_name,
+            bucket_status=status,
+        )
+        .annotate(bucket_shift=shift)
+        .order_by()
+        .values('bucket_date', 'bucket_hour', 'bucket_shift', 'bucket_model', 'bucket_status')
+        .annotate(**aggregates)
+    )
+
+    buckets = new_buckets()
+    for row in rows:
+        bucket = buckets[(
+            config['name'], row['bucket_date'], row['bucket_hour'], row['bucket_shift'],
+            row['bucket_model'], row['bucket_status'],
+        )]
+        bucket[0] += row['bucket_count']
+        if row.get('bucket_ct_count'):
+            bucket[1] += row['bucket_ct_sum'].total_seconds() / 60
+            bucket[2] += row['bucket_ct_count']
+    return buckets
+
+
+def floor_hour(dt):
+    return timezone.localtime(dt).replace(minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(dt):
+    floored = floor_hour(dt)
+    return floored if floored == timezone.localtime(dt) else floored + timedelta(hours=1)
+
+
+def get_rollup_window(start, end):
+    """Whole hours of start <= event time < end the rollups cover, as (start, end), or None"""
+    watermark = RollupWatermark.objects.filter(name=ROLLUP_WATERMARK).first()
+    covered_until = watermark.covered_until if watermark else None
+
+    rollup_start = ceil_hour(start)
+    rollup_end = floor_hour(min(end, covered_until)) if covered_until else rollup_start
+    if rollup_start < rollup_end:
+        return rollup_start, rollup_end
+    return None
+
+
+def read_rollup_rows(configs, rollup_start, rollup_end):
+    """Buckets stored in analytics_rollup for the hours rollup_start..rollup_end"""
+    stations = [config['name'] for config in configs]
+    first, last = timezone.localtime(rollup_start), timezone.localtime(rollup_end)
+    rows = AnalyticsRollup.objects.filter(
+        Q(station__in=stations),
+        Q(production_date__gt=first.date()) | Q(production_date=first.date(), hour__gte=first.hour),
+        Q(production_date__lt=last.date()) | Q(production_date=last.date(), hour__lt=last.hour),
+    ).values_list(
+        'station', 'production_date', 'hour', 'shift', 'model_name', 'status',
+        'count', 'cycle_time_sum', 'cycle_time_count',
+    )
+
+    buckets = new_buckets()
+    for station, day, hour, shift, model_name, status, count, ct_sum, ct_count in rows:
+        bucket = buckets[(station, day, hour, shift, model_name, status)]
+        bucket[0] += count
+        bucket[1] += ct_sum
+        bucket[2] += ct_count
+    return buckets
+
+
+# ============================================================================
+# ANALYTICS RESPONSE FROM BUCKETS
+# ============================================================================
+
+def build_analytics_data(configs, buckets, status_filter='all', selected_op_code=None):
+    """Analytics payload (same shape as collect_analytics_data) from aggregated buckets"""
+    data = {
+        'total_parts': 0,
+        'ok_parts': 0,
+        'ng_parts': 0,
+        'pending_parts': 0,
+        'machine_stats': [],
+        'timeline_data': {'labels': [], 'ok': [], 'ng': []},
+        'hourly_data': {'labels': [], 'values': []},
+        'trend_data': {'labels': [], 'values': []},
+        'detailed_data': [],
+        'active_machines': 0,
+        'model_breakdown': {},
+        'shift_data': {
+            'A': {'ok': 0, 'ng': 0, 'pending': 0, 'total': 0},
+            'B': {'ok': 0, 'ng': 0, 'pending': 0, 'total': 0},
+            'C': {'ok': 0, 'ng': 0, 'pending': 0, 'total': 0}
+        },
+        'oee_data': {
+            'availability': 0,
+            'performance': 0,
+            'quality': 0,
+            'oee': 0,
+            'shift_A_oee': {},
+            'shift_B_oee': {},
+            'shift_C_oee': {}
+        },
+        'rejection_rate': 0,
+        'avg_cycle_time': 0,
+        'productivity': 0,
+        'shift_timeline': {
+            'labels': [],
+            'shift_A_ok': [],
+            'shift_A_ng': [],
+            'shift_B_ok': [],
+            'shift_B_ng': [],
+            'shift_C_ok': [],
+            'shift_C_ng': []
+        },
+        'cycle_time_data': {
+            'labels': [],
+            'actual': [],
+            'standard': []
+        }
+    }
+
+    machine_stats = {}
+    for config in configs:
+        machine_stats[config['name']] = {
+            'machine': config['name'],
+            'display_name': config.get('display_name', config['name']),
+            'ok': 0,
+            'ng': 0,
+            'pending': 0,
+            'op_code': config.get('op_code', 'unknown'),
+        }
+
+    daily_data = defaultdict(lambda: {'ok': 0, 'ng': 0})
+    shift_daily_data = defaultdict(lambda: {
+        'A': {'ok': 0, 'ng': 0},
+        'B': {'ok': 0, 'ng': 0},
+        'C': {'ok': 0, 'ng': 0}
+    })
+    hourly_data = defaultdict(int)
+    cycle_time_sum = 0.0
+    cycle_time_count = 0
+    cycle_time_by_date = defaultdict(lambda: [0.0, 0, 0.0, 0])  # actual sum, count, standard sum, count
+
+    for (station, day, hour, shift, model_name, status), (count, ct_sum, ct_count) in buckets.items():
+        stats = machine_stats.get(station)
+        if stats is None:
+            continue
+        date_key = day.strftime('%Y-%m-%d')
+
+        # Cycle times are taken before the status filter
+        if ct_count:
+            cycle_time_sum += ct_sum
+            cycle_time_count += ct_count
+            by_date = cycle_time_by_date[date_key]
+            by_date[0] += ct_sum
+            by_date[1] += ct_count
+            standard_ct = STANDARD_CYCLE_TIMES.get(stats['op_code'], 0)
+            if standard_ct > 0:
+                by_date[2] += standard_ct * ct_count
+                by_date[3] += ct_count
+
+        if status_filter != 'all' and status != status_filter:
+            continue
+
+        key = 'ok' if status == 'OK' else 'ng' if status == 'NG' else 'pending'
+        data['total_parts'] += count
+        data[f'{key}_parts'] += count
+        stats[key] += count
+
+        data['shift_data'][shift]['total'] += count
+        data['shift_data'][shift][key] += count
+
+        if model_name not in data['model_breakdown']:
+            data['model_breakdown'][model_name] = {'ok': 0, 'ng': 0, 'pending': 0, 'total': 0}
+        data['model_breakdown'][model_name]['total'] += count
+        data['model_breakdown'][model_name][key] += count
+
+        if key != 'pending':
+            daily_data[date_key][key] += count
+            shift_daily_data[date_key][shift][key] += count
+        hourly_data[f'{hour:02d}:00'] += count
+
+    data['machine_stats'] = [
+        stats for stats in machine_stats.values()
+        if stats['ok'] + stats['ng'] + stats['pending'] > 0
+    ]
+
+    # OEE
+    op_code_for_oee = selected_op_code or 'op-110A'
+    overall_oee = calculate_oee_for_shift(
+        {'total': data['total_parts'], 'ok': data['ok_parts'], 'ng': data['ng_parts']}, op_code_for_oee
+    )
+    data['oee_data']['availability'] = overall_oee['availability']
+    data['oee_data']['performance'] = overall_oee['performance']
+    data['oee_data']['quality'] = overall_oee['quality']
+    data['oee_data']['oee'] = overall_oee['oee']
+    data['oee_data']['downtime_minutes'] = overall_oee.get('downtime_minutes', 0)
+    for shift in ('A', 'B', 'C'):
+        data['oee_data'][f'shift_{shift}_oee'] = calculate_oee_for_shift(data['shift_data'][shift], op_code_for_oee)
+
+    completed = data['ok_parts'] + data['ng_parts']
+    data['rejection_rate'] = round((data['ng_parts'] / completed * 100), 2) if completed > 0 else 0
+    if cycle_time_count:
+        data['avg_cycle_time'] = round(cycle_time_sum / cycle_time_count, 2)
+    data['productivity'] = round((data['ok_parts'] / data['total_parts'] * 100), 2) if data['total_parts'] > 0 else 0
+
+    # Daily timeline, shift timeline and yield trend
+    sorted_dates = sorted(daily_data.keys())
+    data['timeline_data']['labels'] = sorted_dates
+    data['timeline_data']['ok'] = [daily_data[date]['ok'] for date in sorted_dates]
+    data['timeline_data']['ng'] = [daily_data[date]['ng'] for date in sorted_dates]
+
+    data['shift_timeline']['labels'] = sorted_dates
+    for date in sorted_dates:
+        for shift in ('A', 'B', 'C'):
+            data['shift_timeline'][f'shift_{shift}_ok'].append(shift_daily_data[date][shift]['ok'])
+            data['shift_timeline'][f'shift_{shift}_ng'].append(shift_daily_data[date][shift]['ng'])
+
+    for date in sorted_dates:
+        total_completed = daily_data[date]['ok'] + daily_data[date]['ng']
+        yield_rate = (daily_data[date]['ok'] / total_completed * 100) if total_completed > 0 else 0
+        data['trend_data']['labels'].append(date)
+        data['trend_data']['values'].append(round(yield_rate, 2))
+
+    if hourly_data:
+        sorted_hours = sorted(hourly_data.keys())
+        data['hourly_data']['labels'] = sorted_hours
+        data['hourly_data']['values'] = [hourly_data[hour] for hour in sorted_hours]
+
+    for date in sorted(cycle_time_by_date.keys()):
+        actual_sum, actual_count, standard_sum, standard_count = cycle_time_by_date[date]
+        data['cycle_time_data']['labels'].append(date)
+        data['cycle_time_data']['actual'].append(round(actual_sum / actual_count, 2))
+        data['cycle_time_data']['standard'].append(round(standard_sum / standard_count, 2) if standard_count else 0)
+
+    return data
+
+
+DETAILED_RECORD_LIMIT = 100
+
+
+def station_recent_records(config, start, end, status_filter='all', limit=DETAILED_RECORD_LIMIT):
+    """The most recent `limit` rows of one station with start <= event time < end"""
+    time_field = get_time_field(get_station_model(config))
+    queryset = (
+        station_rows(config, start, end)
+        .filter(status_q(config, status_filter))
+        .order_by(f'-{time_field}', '-id')
+    )
+    return [describe_row(config, row) for row in queryset[:limit]]
+
+
+def stream_station_records(config, start, end, status_filter='all', chunk_size=2000):
+    """Every row of one station with start <= event time < end, oldest first, fetched in chunks"""
+    time_field = get_time_field(get_station_model(config))
+    queryset = (
+        station_rows(config, start, end)
+        .filter(status_q(config, status_filter))
+        .order_by(time_field, 'id')
+    )
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield describe_row(config, row)
+
+
+def stream_detailed_records(configs, start, end, status_filter='all', chunk_size=2000):
+    """Every row with start <= event time <= end across the stations, merged oldest first"""
+    end = end + timedelta(microseconds=1)
+    return heapq.merge(
+        *(stream_station_records(config, start, end, status_filter, chunk_size) for config in configs),
+        key=lambda record: record['dt'],
+    )
+
+
+def latest_records(records, limit=DETAILED_RECORD_LIMIT):
+    """The most recent `limit` of the stations' records, oldest first"""
+    records.sort(key=lambda record: record['dt'])
+    records = records[-limit:]
+    for record in records:
+        del record['dt']
+    return records
+
+
+def station_has_rows(config):
+    model = config.get('prep_model') or config.get('post_model')
+    return model is not None and model.objects.exists()
+
+
+def select_configs(machine_filter):
+    """Configs to report on and the op code used for OEE"""
+    if machine_filter == 'all':
+        return get_all_configs(), None
+    config = get_machine_config_by_id(machine_filter)
+    if config:
+        return [config], config.get('op_code')
+    return [], None
+
+
+def collect_station(config, live_ranges, start, end, status_filter):
+    """One station's partial: live buckets, its most recent rows and whether it has any rows at all"""
+    buckets = new_buckets()
+    for live_start, live_end in live_ranges:
+        if live_start < live_end:
+            merge_buckets(buckets, query_buckets(config, live_start, live_end))
+    return buckets, station_recent_records(config, start, end, status_filter), station_has_rows(config)
+
+
+def collect_bucket_analytics(use_rollups, start_date, end_date, machine_filter='all', status_filter='all'):
+    """Analytics payload for start <= event time <= end from per-station partials run on the station pool"""
+    configs, selected_op_code = select_configs(machine_filter)
+    end = end_date + timedelta(microseconds=1)
+
+    # Hours the rollups cover are read for all stations at once; the stations scan the rest live
+    window = get_rollup_window(start_date, end) if use_rollups else None
+    if window:
+        buckets = read_rollup_rows(configs, *window)
+        live_ranges = [(start_date, window[0]), (window[1], end)]
+    else:
+        buckets = new_buckets()
+        live_ranges = [(start_date, end)]
+
+    records = []
+    active_machines = 0
+    for station_buckets, station_records, has_rows in map_stations(
+        collect_station, configs, live_ranges, start_date, end, status_filter
+    ):
+        merge_buckets(buckets, station_buckets)
+        records.extend(station_records)
+        active_machines += has_rows
+
+    data = build_analytics_data(configs, buckets, status_filter, selected_op_code)
+    data['detailed_data'] = latest_records(records)
+    data['active_machines'] = active_machines
+    return data
+
+
+def collect_rollup_analytics(start_date, end_date, machine_filter='all', status_filter='all'):
+    """Analytics payload for the API and exports, read from the hourly rollups"""
+    return collect_bucket_analytics(True, start_date, end_date, machine_filter, status_filter)
+
+
+def collect_sql_analytics(start_date, end_date, machine_filter='all', status_filter='all'):
+    """Analytics payload aggregated with GROUP BY queries per station (no rollups needed)"""
+    return collect_bucket_analytics(False, start_date, end_date, machine_filter, status_filter)
+
+
+# ============================================================================
+# ROLLUP MAINTENANCE
+# ============================================================================
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def rebuild_rollups(config, first_day, last_day):
+    """Recompute one station's rollup rows for local days first_day..last_day"""
+    buckets = query_buckets(config, local_midnight(first_day), local_midnight(last_day + timedelta(days=1)))
+
+    rows = [
+        AnalyticsRollup(
+            station=station,
+            op_code=config.get('op_code', 'unknown'),
+            production_date=day,
+            hour=hour,
+            shift=shift,
+            model_name=model_name,
+            status=status,
+            count=count,
+            cycle_time_sum=ct_sum,
+            cycle_time_count=ct_count,
+        )
+        for (station, day, hour, shift, model_name, status), (count, ct_sum, ct_count) in buckets.items()
+    ]
+
+    with transaction.atomic():
+        AnalyticsRollup.objects.filter(
+            station=config['name'], production_date__range=(first_day, last_day)
+        ).delete()
+        AnalyticsRollup.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def get_station_days(config):
+    """First and last local day with rows for a station, or (None, None)"""
+    model = get_station_model(config)
+    time_field = get_time_field(model)
+    bounds = model.objects.aggregate(first=Min(time_field), last=Max(time_field))
+    if not bounds['first']:
+        return None, None
+    return timezone.localtime(bounds['first']).date(), timezone.localtime(bounds['last']).date()
+
+
+def rebuild_all_rollups(first_day=None, last_day=None):
+    """Recompute the rollups for every station; a full rebuild also resets the watermark"""
+    started = timezone.now()
+    last_event_id = PartEvent.objects.aggregate(last=Max('id'))['last'] or 0
+
+    rebuilt = 0
+    for config in get_all_configs():
+        station_first, station_last = get_station_days(config)
+        if station_first is None:
+            continue
+        day = max(first_day, station_first) if first_day else station_first
+        end_day = min(last_day, station_last) if last_day else station_last
+        while day <= end_day:
+            chunk_end = min(day + timedelta(days=REBUILD_CHUNK_DAYS - 1), end_day)
+            rebuilt += rebuild_rollups(config, day, chunk_end)
+            day = chunk_end + timedelta(days=1)
+
+    if first_day is None and last_day is None:
+        RollupWatermark.objects.update_or_create(
+            name=ROLLUP_WATERMARK,
+            defaults={'last_event_id': last_event_id, 'covered_until': started},
+        )
+    return rebuilt
+
+
+def get_rollup_sources():
+    """db_table -> (config, role); role is 'row' for station rows and 'post' for paired post tables"""
+    sources = {}
+    for config in get_all_configs():
+        sources[get_station_model(config)._meta.db_table] = (config, 'row')
+        if get_post_match_rules(config):
+            sources[config['post_model']._meta.db_table] = (config, 'post')
+    return sources
+
+
+def find_dirty_station_days(events):
+    """(config, local day) pairs whose rollups are affected by the given part_event rows"""
+    sources = get_rollup_sources()
+    dirty = {}
+    post_ids = defaultdict(set)
+
+    for source_table, source_id, event_time in events:
+        if source_table not in sources:
+            continue
+        config, role = sources[source_table]
+        if role == 'post':
+            # A post row changes the status of the prep rows paired with it
+            post_ids[config['name']].add(source_id)
+        elif event_time:
+            dirty[(config['name'], timezone.localtime(event_time).date())] = config
+
+    for config in get_all_configs():
+        ids = list(post_ids.get(config['name'], ()))
+        time_field = get_time_field(config['prep_model']) if ids else None
+        for i in range(0, len(ids), 1000):
+            prep_times = config['prep_model'].objects.filter(post_id__in=ids[i:i + 1000]).values_list(time_field, flat=True)
+            for prep_time in prep_times:
+                if prep_time:
+                    dirty[(config['name'], timezone.localtime(prep_time).date())] = config
+
+    return [(config, day) for (_, day), config in sorted(dirty.items(), key=lambda item: item[0])]
+
+
+def update_rollups(batch_size=50000, settle_seconds=EVENT_SETTLE_SECONDS):
+    """Fold part_event rows past the watermark into the rollups; returns (events read, station-days rebuilt)"""
+    started = timezone.now()
+    settled_before = started - timedelta(seconds=settle_seconds)
+
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=ROLLUP_WATERMARK)
+        events = list(
+            PartEvent.objects.filter(id__gt=watermark.last_event_id)
+            .order_by('id')
+            .values_list('id', 'source_table', 'source_id', 'event_time', 'created_at')[:batch_size]
+        )
+        drained = len(events) < batch_size
+
+        # Lower ids may still be committing behind a recent event: leave it and everything after it
+        for index, event in enumerate(events):
+            if event[4] >= settled_before:
+                events = events[:index]
+                break
+
+        dirty = find_dirty_station_days([event[1:4] for event in events])
+        for config, day in dirty:
+            rebuild_rollups(config, day, day)
+
+        if events:
+            watermark.last_event_id = events[-1][0]
+        # Only claim coverage once the backlog has been drained
+        if drained:
+            watermark.covered_until = settled_before
+        watermark.save()
+
+    return len(events), len(dirty)
@@ -0,0 +1,86 @@
+"""
+Model signal handlers for the station tables.
+"""
+
+from django.db import connections
+from django.db.models.signals import pre_save, post_save, post_delete
+from . import models
+from .pairing import get_pairing_sources, resolve_post_ids, pair_post_row
+from .part_events import get_part_event_sources, build_part_events
+from .timestamps import to_event_time
+
+
+def set_event_time(sender, instance, **kwargs):
+    """Keep event_time in step with the raw timestamp string on every ORM save"""
+    instance.event_time = to_event_time(instance.timestamp)
+
+
+for model in models.EVENT_TIME_MODELS:
+    pre_save.connect(set_event_time, sender=model, dispatch_uid=f'set_event_time_{model._meta.db_table}')
+
+
+# ============================================================================
+# PART EVENT LOG (PostgreSQL uses the part_event triggers instead)
+# ============================================================================
+
+PART_EVENT_SOURCES = {source['model']: source for source in get_part_event_sources()}
+
+
+def remember_status(sender, instance, using, **kwargs):
+    """Stash the stored status so post_save can tell whether it changed"""
+    source = PART_EVENT_SOURCES[sender]
+    instance._part_event_old_status = None
+    if connections[using].vendor == 'postgresql' or not source['status_field'] or instance.pk is None:
+        return
+    instance._part_event_old_status = (
+        sender.objects.using(using).filter(pk=instance.pk).values_list(source['status_field'], flat=True).first()
+    )
+
+
+def record_part_event(sender, instance, created, using, **kwargs):
+    """Append part_event rows for an insert or a status change"""
+    if connections[using].vendor == 'postgresql':
+        return
+    source = PART_EVENT_SOURCES[sender]
+    if not created:
+        if not source['status_field']:
+            return
+        if getattr(instance, source['status_field']) == getattr(instance, '_part_event_old_status', None):
+            return
+    models.PartEvent.objects.using(using).bulk_create(build_part_events(source, instance))
+
+
+for model in PART_EVENT_SOURCES:
+    pre_save.connect(remember_status, sender=model, dispatch_uid=f'part_event_status_{model._meta.db_table}')
+    post_save.connect(record_part_event, sender=model, dispatch_uid=f'part_event_{model._meta.db_table}')
+
+
+# ============================================================================
+# PREP -> POST PAIRING (PostgreSQL uses the pairing triggers instead)
+# ============================================================================
+
+PAIRING_BY_PREP = {source['prep_model']: source for source in get_pairing_sources()}
+PAIRING_BY_POST = {source['post_model']: source for source in get_pairing_sources()}
+
+
+def pair_prep(sender, instance, using, **kwargs):
+    """Resolve post_id for a prep row as it is saved"""
+    if connections[using].vendor == 'postgresql':
+        return
+    source = PAIRING_BY_PREP[sender]
+    instance.post_id = resolve_post_ids([instance], source['post_model'], source['rules'])[0]
+
+
+def pair_post(sender, instance, using, **kwargs):
+    """Point the affected prep rows at a new / changed post row, or away from a deleted one"""
+    if connections[using].vendor == 'postgresql':
+        return
+    pair_post_row(instance, PAIRING_BY_POST[sender])
+
+
+for model in PAIRING_BY_PREP:
+    pre_save.connect(pair_prep, sender=model, dispatch_uid=f'pair_prep_{model._meta.db_table}')
+
+for model in PAIRING_BY_POST:
+    post_save.connect(pair_post, sender=model, dispatch_uid=f'pair_post_{model._meta.db_table}')
+    post_delete.connect(pair_post, sender=model, dispatch_uid=f'unpair_post_{model._meta.db_table}')
@@ -0,0 +1,82 @@
+"""
+Bounded thread pool for per-station work.
+
+Analytics reads every station table with its own queries. Run one after
+the other, an "all machines" request takes the sum of 22+ stations' round
+trips; fanned out to the pool it takes roughly as long as the slowest
+station.
+
+All requests of a process share one pool of ANALYTICS_WORKERS threads
+(settings, default 8), so concurrent analytics requests queue for the same
+threads instead of each starting its own, and the process never holds more
+than ANALYTICS_WORKERS station connections at once. A call hands the pool
+at most that many jobs; each takes stations off the call's queue until it
+is empty, on the thread's own database connection (Django connections are
+per thread), which it closes before finishing, so no connections outlive
+the request.
+
+Work runs inline when the pool would not help: one station, one worker,
+a caller inside a transaction, whose uncommitted rows the workers'
+connections could not see, or a caller already on a pool thread, which
+would otherwise wait on the pool it is holding.
+"""
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+DEFAULT_WORKERS = 8
+
+THREAD_NAME_PREFIX = 'tracebility-station'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_worker_count():
+    return getattr(settings, 'ANALYTICS_WORKERS', DEFAULT_WORKERS)
+
+
+def get_executor():
+    """The process-wide station pool, started on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_worker_count(), thread_name_prefix=THREAD_NAME_PREFIX)
+        return _executor
+
+
+def on_pool_thread():
+    return threading.current_thread().name.startswith(THREAD_NAME_PREFIX)
+
+
+def map_stations(func, configs, *args, using=DEFAULT_DB_ALIAS):
+    """[func(config, *args) for config in configs], run on worker threads when that helps"""
+    workers = min(get_worker_count(), len(configs))
+    if workers <= 1 or connections[using].in_atomic_block or on_pool_thread():
+        return [func(config, *args) for config in configs]
+
+    tasks = queue.SimpleQueue()
+    for index, config in enumerate(configs):
+        tasks.put((index, config))
+    results = [None] * len(configs)
+
+    def work():
+        try:
+            while True:
+                try:
+                    index, config = tasks.get_nowait()
+                except queue.Empty:
+                    return
+                results[index] = func(config, *args)
+        finally:
+            connections.close_all()
+
+    executor = get_executor()
+    futures = [executor.submit(work) for _ in range(workers)]
+    for future in futures:
+        future.result()
+    return results
@@ -1,3 +1,1319 @@
-from django.test import TestCase
+import asyncio
+import json
+import random
+import threading
+import tracemalloc
+from datetime import datetime, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
 
-# Create your tests here.
+from . import models
+from .timestamps import parse_timestamp_string, parse_timestamp_strptime, parse_timestamp_to_datetime, to_event_time
+from .qr_search import qr_search_q
+from .part_events import get_part_history
+from .views import MACHINE_CONFIGS, ASSEMBLY_CONFIGS, OP80_CONFIG, get_post_match_rules
+
+
+class EventTimeTests(TestCase):
+    """event_time is filled on insert and by the backfill command"""
+
+    def test_event_time_set_on_insert(self):
+        prep = models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025, 07:06:00 PM', machine_name='CNC1', qr_data='CNC1000001', model_name='MODEL_A'
+        )
+        expected = timezone.make_aware(datetime(2025, 12, 17, 19, 6))
+        self.assertEqual(prep.event_time, expected)
+
+    def test_trigger_follows_raw_timestamp_updates(self):
+        from django.db import connection
+
+        if connection.vendor != 'postgresql':
+            self.skipTest('event_time trigger is PostgreSQL only')
+        prep = models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 19:06:00', machine_name='CNC1', qr_data='CNC1000001', model_name='MODEL_A'
+        )
+        models.Cnc1Preprocessing.objects.filter(id=prep.id).update(timestamp='18/12/2025 08:30:00')
+
+        prep.refresh_from_db()
+        self.assertEqual(prep.event_time, timezone.make_aware(datetime(2025, 12, 18, 8, 30)))
+
+    def test_unparseable_timestamp_leaves_event_time_empty(self):
+        self.assertIsNone(to_event_time('not a timestamp'))
+
+    def test_backfill_fills_missing_event_time(self):
+        post = models.Cnc1Postprocessing.objects.create(
+            timestamp='17/12/2025 19:08:00', qr_data='CNC1000001', status='OK'
+        )
+        models.Cnc1Postprocessing.objects.filter(id=post.id).update(event_time=None)
+
+        call_command('backfill_event_time', table=['cnc1_postprocessing'], batch_size=1, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertEqual(post.event_time, timezone.make_aware(datetime(2025, 12, 17, 19, 8)))
+
+
+class TimestampParserTests(TestCase):
+    """The fixed-width parser gives the same result as the strptime chain"""
+
+    SAMPLES = [
+        '05/06/2025, 01:02:03 PM',  # day first wins when both fit
+        '05/13/2025, 01:02:03 pm',  # month first when the middle field is not a month
+        '17/12/2025, 12:06:00 AM',
+        '31/02/2025, 01:02:03 PM',
+        '13/13/2025, 01:02:03 PM',
+        '00/12/2025, 13:02:03 PM',
+        '05/06/2025, 01:60:03 PM',
+        '05/06/2025, 01:02:61 PM',
+        '05/O6/2025, 01:02:03 PM',
+        '17/12/2025 19:08:00',
+        '2025-12-17 19:08:00',
+        '2025-12-17 19:08:00.5',
+        '2025-12-17 19:08:00.123456',
+        '05-06-2025 19:08:00',
+        '05-13-2025 19:08:00',
+        '2025-12-17T19:08:00Z',
+        '2025-12-17T19:08:00+05:30',
+        '17/12/2025 24:08:00',
+        '',
+        'not a timestamp',
+    ]
+
+    def test_matches_strptime_chain(self):
+        parse_timestamp_string.cache_clear()
+        for timestamp in self.SAMPLES:
+            with self.subTest(timestamp=timestamp):
+                self.assertEqual(parse_timestamp_to_datetime(timestamp), parse_timestamp_strptime(timestamp))
+
+    def test_datetimes_pass_through(self):
+        value = datetime(2025, 12, 17, 19, 8)
+        self.assertIs(parse_timestamp_to_datetime(value), value)
+        self.assertIsNone(parse_timestamp_to_datetime(None))
+
+
+class QrJoinIndexTests(TestCase):
+    """Every prep -> post QR join column must be backed by an index"""
+
+    def assertIndexed(self, model, field_name):
+        field = model._meta.get_field(field_name)
+        self.assertTrue(
+            field.db_index or field.unique,
+            f"{model._meta.db_table}.{field_name} is used as a QR join column but has no index",
+        )
+
+    def test_join_columns_are_indexed(self):
+        for config in MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]:
+            for prep_field, post_field in get_post_match_rules(config):
+                with self.subTest(machine=config['name'], field=post_field):
+                    self.assertIndexed(config['prep_model'], prep_field)
+                    self.assertIndexed(config['post_model'], post_field)
+
+
+class QrSearchTests(TestCase):
+    """Complete QR codes are looked up by equality first; anything else matches as a substring"""
+
+    def setUp(self):
+        for qr in ('CNC1000001', 'CNC1000001-R1', 'XCNC1000001', 'CNC1000002', 'OP80PST0000012'):
+            models.Cnc1Preprocessing.objects.create(
+                timestamp='17/12/2025 19:06:00', machine_name='CNC1', qr_data=qr, model_name='MODEL_A'
+            )
+
+    def search(self, qr_code):
+        model = models.Cnc1Preprocessing
+        queryset = model.objects.filter(qr_search_q(qr_code, 'qr_data', model=model))
+        return sorted(queryset.values_list('qr_data', flat=True))
+
+    def test_complete_qr_with_an_exact_row_matches_only_that_row(self):
+        self.assertEqual(self.search(' CNC1000001 '), ['CNC1000001'])
+        self.assertEqual(
+            qr_search_q('CNC1000001', 'qr_data', model=models.Cnc1Preprocessing), Q(qr_data='CNC1000001')
+        )
+
+    def test_complete_qr_without_an_exact_row_falls_back_to_substring(self):
+        self.assertEqual(self.search('PST0000012'), ['OP80PST0000012'])
+        self.assertEqual(self.search('cnc1000001-r1'), ['CNC1000001-R1'])
+
+    def test_partial_qr_matches_substring_case_insensitive(self):
+        self.assertEqual(self.search('c100000'), ['CNC1000001', 'CNC1000001-R1', 'CNC1000002', 'XCNC1000001'])
+
+    def test_without_model_every_code_matches_as_substring(self):
+        queryset = models.Cnc1Preprocessing.objects.filter(qr_search_q('CNC1000001', 'qr_data'))
+        self.assertEqual(queryset.count(), 3)
+
+
+class PartEventTests(TestCase):
+    """part_event is appended on insert and status change, and filled by the backfill command"""
+
+    def test_insert_and_status_change_are_logged(self):
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 19:06:00', machine_name='CNC1', qr_data='CNC1000001', model_name='MODEL_A'
+        )
+        post = models.Cnc1Postprocessing.objects.create(
+            timestamp='17/12/2025 19:08:00', qr_data='CNC1000001', status='NG'
+        )
+        post.status = 'OK'
+        post.save()
+        post.save()  # no status change, nothing logged
+
+        history = list(get_part_history('CNC1000001').values_list('op_code', 'stage', 'status'))
+        self.assertEqual(history, [
+            ('op-110A', 'pre', None),
+            ('op-110A', 'post', 'NG'),
+            ('op-110A', 'post', 'OK'),
+        ])
+
+    def test_backfill_logs_every_qr_column_once(self):
+        prep = models.Op80Preprocessing.objects.create(
+            timestamp='17/12/2025 19:06:00', qr_data_piston='PST0001', qr_data_housing='HSG0001',
+            model_name_internal='MODEL_A', previous_machine_status='OK'
+        )
+        models.PartEvent.objects.all().delete()
+
+        call_command('backfill_part_events', table=['op80_preprocessing'], stdout=StringIO())
+        call_command('backfill_part_events', table=['op80_preprocessing'], stdout=StringIO())
+
+        events = models.PartEvent.objects.filter(source_table='op80_preprocessing', source_id=prep.id)
+        self.assertEqual(sorted(events.values_list('qr_role', 'qr')), [
+            ('qr_data_housing', 'HSG0001'),
+            ('qr_data_piston', 'PST0001'),
+        ])
+
+
+class PostPairingTests(TestCase):
+    """prep.post_id follows the QR join rules as post rows arrive, change and disappear"""
+
+    def test_newest_post_is_paired_and_repaired_on_delete(self):
+        prep = models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 19:06:00', machine_name='CNC1', qr_data='CNC1000001', model_name='MODEL_A'
+        )
+        first = models.Cnc1Postprocessing.objects.create(timestamp='17/12/2025 19:08:00', qr_data='CNC1000001', status='NG')
+        second = models.Cnc1Postprocessing.objects.create(timestamp='17/12/2025 19:20:00', qr_data='CNC1000001', status='OK')
+
+        prep.refresh_from_db()
+        self.assertEqual(prep.post_id, second.id)
+
+        second.delete()
+        prep.refresh_from_db()
+        self.assertEqual(prep.post_id, first.id)
+
+    def test_op80_falls_back_to_housing_new(self):
+        prep = models.Op80Preprocessing.objects.create(
+            timestamp='17/12/2025 19:06:00', qr_data_piston='PST0001', qr_data_housing='HSG0001',
+            model_name_internal='MODEL_A', previous_machine_status='OK'
+        )
+        post = models.Op80Postprocessing.objects.create(
+            timestamp='17/12/2025 19:08:00', qr_data_housing_new='HSG0001', match_status='OK', status='OK'
+        )
+
+        prep.refresh_from_db()
+        self.assertEqual(prep.post_id, post.id)
+
+    def test_backfill_pairs_existing_rows(self):
+        prep = models.LubPreprocessing.objects.create(
+            timestamp='17/12/2025 19:06:00', qr_data_piston='PST0001', model_name_piston='MODEL_A',
+            previous_machine_status='OK'
+        )
+        post = models.LubPostprocessing.objects.create(timestamp='17/12/2025 19:08:00', qr_data_piston='PST0001', status='OK')
+        models.LubPreprocessing.objects.filter(id=prep.id).update(post_id=None)
+
+        call_command('backfill_post_pairing', table=['lub_preprocessing'], stdout=StringIO())
+
+        prep.refresh_from_db()
+        self.assertEqual(prep.post_id, post.id)
+
+
+    def test_load_posts_batches_the_op80_fallback_chain(self):
+        from .pairing import load_posts
+
+        preps = [
+            models.Op80Preprocessing.objects.create(
+                timestamp='17/12/2025 19:06:00', qr_data_piston=f'PST000{i}', qr_data_housing=f'HSG000{i}',
+                model_name_internal='MODEL_A', previous_machine_status='OK'
+            )
+            for i in range(4)
+        ]
+        by_housing = models.Op80Postprocessing.objects.create(
+            timestamp='17/12/2025 19:08:00', qr_data_housing='HSG0000', qr_data_housing_new='NEW0000', match_status='OK', status='OK'
+        )
+        by_housing_new = models.Op80Postprocessing.objects.create(
+            timestamp='17/12/2025 19:08:00', qr_data_housing_new='HSG0001', match_status='OK', status='NG'
+        )
+        by_piston = models.Op80Postprocessing.objects.create(
+            timestamp='17/12/2025 19:08:00', qr_data_housing='PST0002', qr_data_housing_new='NEW0002', match_status='OK', status='OK'
+        )
+
+        with self.assertNumQueries(4):  # one per rule, then the post rows
+            posts = load_posts(OP80_CONFIG, preps)
+        self.assertEqual(posts, {
+            preps[0].id: by_housing, preps[1].id: by_housing_new, preps[2].id: by_piston, preps[3].id: None,
+        })
+
+    def test_rework_search_queries_per_station_not_per_row(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .rework_views import search_across_all_machines
+
+        def search_queries(rows):
+            for i in range(rows):
+                qr = f'CNC1{rows:02d}{i:04d}'
+                models.Cnc1Preprocessing.objects.create(timestamp='17/12/2025 19:06:00', machine_name='CNC1', qr_data=qr, model_name='MODEL_A')
+                models.Cnc1Postprocessing.objects.create(timestamp='17/12/2025 19:08:00', qr_data=qr, status='OK')
+            with CaptureQueriesContext(connection) as queries:
+                results = search_across_all_machines({'machine': 'dmg_mori1op_110a'})
+            self.assertTrue(all(record['status'] == 'OK' and record['post_id'] for record in results))
+            return len(queries)
+
+        self.assertEqual(search_queries(2), search_queries(20))
+
+
+class AnalyticsRollupTests(TestCase):
+    """Analytics read from the hourly rollups matches the row-by-row calculation"""
+
+    def setUp(self):
+        for i, (prep_time, post_time, status) in enumerate([
+            ('17/12/2025 07:06:00', '17/12/2025 07:09:30', 'OK'),
+            ('17/12/2025 15:20:00', '17/12/2025 15:26:00', 'NG'),
+            ('17/12/2025 23:40:00', None, None),
+        ]):
+            qr = f'CNC10000{i}'
+            models.Cnc1Preprocessing.objects.create(
+                timestamp=prep_time, machine_name='CNC1', qr_data=qr, model_name='MODEL_A'
+            )
+            if post_time:
+                models.Cnc1Postprocessing.objects.create(timestamp=post_time, qr_data=qr, status=status)
+
+        models.PrewashingPreprocessing.objects.create(
+            timestamp='18/12/2025 09:15:00', qr_data='WSH0001', previous_machine_status='OK',
+            status='OK', model_name='MODEL_B'
+        )
+        models.Op40AProcessing.objects.create(
+            timestamp_internal=timezone.make_aware(datetime(2025, 12, 18, 10, 5)),
+            qr_data_internal='INT0001', previous_machine_internal_status='OK', model_name_internal='MODEL_C',
+            timestamp_external=timezone.make_aware(datetime(2025, 12, 18, 10, 8)),
+            qr_data_external='EXT0001', qr_data_housing='HSG0001', status='OK'
+        )
+
+        self.start = timezone.make_aware(datetime(2025, 12, 17, 0, 0, 0))
+        self.end = timezone.make_aware(datetime(2025, 12, 18, 23, 59, 59))
+
+    def assert_matches_reference(self, machine_filter='all', status_filter='all'):
+        from .views import collect_analytics_data
+        from .rollups import collect_rollup_analytics
+
+        expected = collect_analytics_data(self.start, self.end, machine_filter, status_filter)
+        actual = collect_rollup_analytics(self.start, self.end, machine_filter, status_filter)
+        self.assertEqual(actual, expected)
+
+    def test_rollups_match_row_scan(self):
+        call_command('update_analytics_rollups', rebuild=True, stdout=StringIO())
+        self.assertTrue(models.AnalyticsRollup.objects.exists())
+
+        self.assert_matches_reference()
+        self.assert_matches_reference(status_filter='Pending')
+        self.assert_matches_reference(machine_filter='dmg_mori1op_110a', status_filter='OK')
+
+    def test_live_scan_without_rollups(self):
+        self.assert_matches_reference()
+
+    def test_catch_up_picks_up_late_status(self):
+        call_command('update_analytics_rollups', rebuild=True, stdout=StringIO())
+        models.Cnc1Postprocessing.objects.create(timestamp='18/12/2025 00:05:00', qr_data='CNC100002', status='OK')
+
+        call_command('update_analytics_rollups', settle_seconds=0, stdout=StringIO())
+
+        self.assert_matches_reference()
+        self.assertFalse(
+            models.AnalyticsRollup.objects.filter(station='DMG MORI1(op-110A)', status='Pending').exists()
+        )
+
+    def test_catch_up_stops_at_unsettled_events(self):
+        from .rollups import ROLLUP_WATERMARK, update_rollups
+
+        call_command('update_analytics_rollups', rebuild=True, stdout=StringIO())
+        watermark = models.RollupWatermark.objects.get(name=ROLLUP_WATERMARK)
+        models.Cnc1Postprocessing.objects.create(timestamp='18/12/2025 00:05:00', qr_data='CNC100002', status='OK')
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='18/12/2025 09:00:00', machine_name='CNC1', qr_data='CNC100003', model_name='MODEL_A'
+        )
+        first, second = models.PartEvent.objects.filter(id__gt=watermark.last_event_id).order_by('id')
+
+        # A settled event behind a recent one (its transaction may still be open) waits as well
+        models.PartEvent.objects.filter(id=second.id).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(update_rollups(), (0, 0))
+        watermark.refresh_from_db()
+        self.assertLess(watermark.last_event_id, first.id)
+
+        models.PartEvent.objects.filter(id=first.id).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(update_rollups()[0], 2)
+        self.assert_matches_reference()
+
+
+class AnalyticsSqlModeTests(TestCase):
+    """collect_analytics_data(mode='sql') returns the same dict as the Python row loop"""
+
+    def setUp(self):
+        rng = random.Random(7)
+        base = datetime(2025, 12, 16, 0, 0)
+
+        def stamp(minutes):
+            return (base + timedelta(minutes=minutes)).strftime('%d/%m/%Y %H:%M:%S')
+
+        for i in range(60):
+            minute = rng.randrange(0, 3 * 24 * 60)
+            status = rng.choice(['OK', 'NG', 'Pending', None])
+
+            models.Cnc1Preprocessing.objects.create(
+                timestamp=stamp(minute), machine_name='CNC1', qr_data=f'CNC1{i:06d}', model_name=rng.choice(['M1', 'M2'])
+            )
+            models.PaintingPreprocessing.objects.create(
+                timestamp=stamp(minute), qr_data_housing=f'HSGP{i:06d}', previous_machine_status='OK', pre_status='OK'
+            )
+            models.Op80Preprocessing.objects.create(
+                timestamp=stamp(minute), qr_data_piston=f'PST8{i:06d}', qr_data_housing=f'HSG8{i:06d}',
+                model_name_internal='M1', previous_machine_status='OK'
+            )
+            models.PrewashingPostprocessing.objects.create(
+                timestamp=stamp(minute), qr_data=f'WSH{i:06d}', previous_machine_status='OK',
+                status=rng.choice(['OK', 'NG']), model_name='M2'
+            )
+            models.Op40AProcessing.objects.create(
+                timestamp_internal=timezone.make_aware(base + timedelta(minutes=minute)),
+                qr_data_internal=f'INT{i:06d}', previous_machine_internal_status='OK', model_name_internal='M3',
+                timestamp_external=timezone.make_aware(base + timedelta(minutes=minute + rng.randrange(0, 9))),
+                qr_data_external=f'EXT{i:06d}' if status else None, qr_data_housing=f'HSGA{i:06d}',
+                status=status
+            )
+
+            if status:
+                post_time = stamp(minute + rng.randrange(1, 15))
+                models.Cnc1Postprocessing.objects.create(timestamp=post_time, qr_data=f'CNC1{i:06d}', status=status)
+                models.PaintingPostprocessing.objects.create(
+                    timestamp=post_time, qr_data_piston=f'PSTP{i:06d}', qr_data_housing=f'HSGP{i:06d}', status=status
+                )
+                models.Op80Postprocessing.objects.create(
+                    timestamp=post_time, qr_data_housing_new=f'HSG8{i:06d}', match_status='OK', status=status
+                )
+
+    def test_sql_mode_matches_python(self):
+        from .views import collect_analytics_data
+
+        start = timezone.make_aware(datetime(2025, 12, 16, 5, 30))
+        end = timezone.make_aware(datetime(2025, 12, 18, 20, 15))
+        for machine_filter in ('all', 'dmg_mori1op_110a', 'paintingop85', 'op40a', 'op80_leak_test'):
+            for status_filter in ('all', 'OK', 'NG', 'Pending'):
+                with self.subTest(machine=machine_filter, status=status_filter):
+                    self.assertEqual(
+                        collect_analytics_data(start, end, machine_filter, status_filter, mode='sql'),
+                        collect_analytics_data(start, end, machine_filter, status_filter),
+                    )
+
+
+class ParallelAnalyticsTests(TransactionTestCase):
+    """Station partials collected on the thread pool merge into the same payload as the serial loop"""
+
+    setUp = AnalyticsSqlModeTests.setUp
+
+    def test_pool_matches_serial(self):
+        from unittest import mock
+        from django.test import override_settings
+        from . import rollups
+
+        start = timezone.make_aware(datetime(2025, 12, 16, 5, 30))
+        end = timezone.make_aware(datetime(2025, 12, 18, 20, 15))
+        with override_settings(ANALYTICS_WORKERS=1):
+            expected = rollups.collect_sql_analytics(start, end)
+
+        threads = set()
+
+        def collect_station(*args):
+            threads.add(threading.current_thread().name)
+            return original(*args)
+
+        original = rollups.collect_station
+        with mock.patch.object(rollups, 'collect_station', collect_station):
+            self.assertEqual(rollups.collect_sql_analytics(start, end), expected)
+        self.assertGreater(len(threads), 1)
+        self.assertTrue(all(name.startswith('tracebility-station') for name in threads))
+
+    def test_concurrent_requests_share_bounded_pool(self):
+        import time
+        from .station_pool import get_worker_count, map_stations
+
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def station(config):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return config
+
+        configs = list(range(get_worker_count() * 2))
+        results = []
+        requests = [
+            threading.Thread(target=lambda: results.append(map_stations(station, configs)))
+            for _ in range(3)
+        ]
+        for thread in requests:
+            thread.start()
+        for thread in requests:
+            thread.join()
+
+        self.assertEqual(results, [configs] * 3)
+        self.assertLessEqual(running[1], get_worker_count())
+
+
+class ChunkedAnalyticsTests(TransactionTestCase):
+    """Production-day partials reduced in the parent match the single-process payload"""
+
+    setUp = AnalyticsSqlModeTests.setUp
+
+    def test_split_at_production_day_start(self):
+        from .chunked_analytics import split_production_days
+
+        start = timezone.make_aware(datetime(2025, 12, 16, 5, 30))
+        end = timezone.make_aware(datetime(2025, 12, 19, 7, 0))
+        day_ends = [chunk_end for chunk_start, chunk_end in split_production_days(start, end)]
+        self.assertEqual(day_ends, [timezone.make_aware(datetime(2025, 12, day, 6, 0)) for day in (16, 17, 18, 19)] + [end])
+
+        runs = split_production_days(start, end, chunks=2)
+        self.assertEqual(runs, [(start, day_ends[2]), (day_ends[2], end)])
+
+    def test_process_pool_matches_single_process(self):
+        from .views import collect_analytics_data
+        from .chunked_analytics import collect_chunked_analytics
+
+        start = timezone.make_aware(datetime(2025, 12, 16, 5, 30))
+        end = timezone.make_aware(datetime(2025, 12, 18, 20, 15))
+        for machine_filter, status_filter in (('all', 'all'), ('all', 'Pending'), ('op40a', 'OK')):
+            with self.subTest(machine=machine_filter, status=status_filter):
+                self.assertEqual(
+                    collect_chunked_analytics(start, end, machine_filter, status_filter, processes=2),
+                    collect_analytics_data(start, end, machine_filter, status_filter, mode='sql'),
+                )
+
+
+class AnalyticsCacheTests(TestCase):
+    """The API and exports share cached results; open ranges follow the table watermarks"""
+
+    def setUp(self):
+        from .analytics_cache import get_cache
+        get_cache().clear()
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 07:06:00', machine_name='CNC1', qr_data='CNC1000001', model_name='MODEL_A'
+        )
+        models.Cnc1Postprocessing.objects.create(timestamp='17/12/2025 07:09:30', qr_data='CNC1000001', status='OK')
+
+    def test_export_reuses_closed_range_result(self):
+        from .analytics_cache import get_cache_stats
+
+        params = {'start_date': '2025-12-17', 'end_date': '2025-12-17', 'machine': 'dmg_mori1op_110a'}
+        self.assertEqual(self.client.get('/api/analytics/', params).json()['total_parts'], 1)
+        # The summary comes from the cache (after reading the watermarks); only the streamed
+        # detail rows read the tables
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/analytics/export/', params)
+        self.assertIn(b'Total Parts,1', b''.join(response.streaming_content))
+
+        stats = get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_open_range_sees_new_rows(self):
+        from .analytics_cache import get_cached_analytics
+
+        end = timezone.now()
+        start = end - timedelta(days=1)
+        self.assertEqual(get_cached_analytics(start, end, 'dmg_mori1op_110a')['total_parts'], 0)
+
+        recent = timezone.localtime(end - timedelta(minutes=5)).strftime('%d/%m/%Y %H:%M:%S')
+        models.Cnc1Preprocessing.objects.create(
+            timestamp=recent, machine_name='CNC1', qr_data='CNC1000002', model_name='MODEL_A'
+        )
+        self.assertEqual(get_cached_analytics(start, end, 'dmg_mori1op_110a')['total_parts'], 1)
+
+    def test_status_edit_retires_results(self):
+        from .analytics_cache import get_cached_analytics
+
+        start = timezone.make_aware(datetime(2025, 12, 17))
+        end = timezone.make_aware(datetime(2025, 12, 17, 23, 59, 59))
+        self.assertEqual(get_cached_analytics(start, end, 'dmg_mori1op_110a')['ok_parts'], 1)
+
+        post = models.Cnc1Postprocessing.objects.get()
+        post.status = 'NG'
+        post.save()
+        self.assertEqual(get_cached_analytics(start, end, 'dmg_mori1op_110a')['ng_parts'], 1)
+
+    def test_closed_range_follows_rollup_runs(self):
+        from .analytics_cache import get_cached_analytics
+        from .rollups import rebuild_all_rollups, update_rollups
+
+        rebuild_all_rollups()
+        start = timezone.make_aware(datetime(2025, 12, 17))
+        end = timezone.make_aware(datetime(2025, 12, 17, 23, 59, 59))
+        self.assertEqual(get_cached_analytics(start, end, 'dmg_mori1op_110a')['ok_parts'], 1)
+
+        # Late row for the closed day: served from the cache until the rollups take it in
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 09:00:00', machine_name='CNC1', qr_data='CNC1000003', model_name='MODEL_A'
+        )
+        self.assertEqual(get_cached_analytics(start, end, 'dmg_mori1op_110a')['total_parts'], 1)
+        update_rollups(settle_seconds=0)
+        self.assertEqual(get_cached_analytics(start, end, 'dmg_mori1op_110a')['total_parts'], 2)
+
+
+class CsvExportTests(TestCase):
+    """CSV exports stream every row in the requested range, optionally gzipped"""
+
+    def setUp(self):
+        base = datetime(2025, 12, 17, 6, 0)
+        models.Cnc1Preprocessing.objects.bulk_create([
+            models.Cnc1Preprocessing(
+                timestamp=(base + timedelta(minutes=i * 10)).strftime('%d/%m/%Y %H:%M:%S'),
+                event_time=timezone.make_aware(base + timedelta(minutes=i * 10)),
+                machine_name='CNC1', qr_data=f'CNC1{i:06d}', model_name='MODEL_A',
+            )
+            for i in range(150)
+        ])
+
+    def get_rows(self, path, params=None):
+        response = self.client.get(path, params or {})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_machine_export_has_full_history_and_date_range(self):
+        rows = self.get_rows('/export/dmg_mori1op_110a/')
+        self.assertEqual(len(rows), 151)
+        self.assertIn(',CNC1000149,', rows[1])  # newest first
+        self.assertIn(',CNC1000000,', rows[-1])
+
+        rows = self.get_rows('/export/dmg_mori1op_110a/', {'start_date': '2025-12-18', 'end_date': '2025-12-18'})
+        self.assertEqual(len(rows), 1 + 150 - 108)  # 06:00 + 18h = midnight at i=108
+
+    def test_gzip_download(self):
+        import gzip
+
+        plain = self.client.get('/export/dmg_mori1op_110a/')
+        compressed = self.client.get('/export/dmg_mori1op_110a/', {'gzip': '1'})
+        self.assertEqual(compressed['Content-Type'], 'application/gzip')
+        self.assertIn('dmg_mori1op_110a_data.csv.gz', compressed['Content-Disposition'])
+        self.assertEqual(gzip.decompress(b''.join(compressed.streaming_content)), b''.join(plain.streaming_content))
+
+    def test_analytics_export_lists_every_record_oldest_first(self):
+        rows = self.get_rows('/api/analytics/export/', {
+            'start_date': '2025-12-17', 'end_date': '2025-12-18', 'machine': 'dmg_mori1op_110a',
+        })
+        detail = rows[rows.index('Detailed Records') + 2:]
+        self.assertEqual(len(detail), 150)
+        self.assertIn('CNC1000000', detail[0])
+        self.assertIn('CNC1000149', detail[-1])
+
+    def test_invalid_date(self):
+        self.assertEqual(self.client.get('/export/dmg_mori1op_110a/', {'start_date': '17/12/2025'}).status_code, 400)
+
+
+class ExcelExportTests(TestCase):
+    """Excel exports are write-only workbooks streamed row by row"""
+
+    setUp = CsvExportTests.setUp
+
+    def get_workbook(self, path, params):
+        import io
+        from openpyxl import load_workbook
+
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+        return load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_analytics_workbook_has_every_detailed_record(self):
+        wb = self.get_workbook('/api/analytics/export/excel/', {
+            'start_date': '2025-12-17', 'end_date': '2025-12-18', 'machine': 'dmg_mori1op_110a',
+        })
+        self.assertEqual(wb.sheetnames, [
+            'Executive Summary', 'Shift Analysis', 'Machine Breakdown', 'Model Breakdown', 'Detailed Records', 'OEE Reference',
+        ])
+        details = list(wb['Detailed Records'].iter_rows(min_row=4, values_only=True))
+        self.assertEqual(len(details), 150)
+        self.assertEqual(details[0][2], 'CNC1000000')
+        self.assertEqual(details[-1][7], 'Pending')
+        self.assertEqual(wb['Detailed Records']['A3'].style, 'header')
+        self.assertEqual(wb['Detailed Records']['H4'].style, 'pending')
+
+    def test_monitoring_workbook_is_newest_first_without_search_limit(self):
+        wb = self.get_workbook('/monitoring/export-excel/', {
+            'start_date': '2025-12-17', 'end_date': '2025-12-18', 'machine': 'dmg_mori1op_110a',
+        })
+        ws = wb['Monitoring Data']
+        self.assertEqual(ws.freeze_panes, 'F2')
+        rows = list(ws.iter_rows(min_row=2, values_only=True))
+        self.assertEqual(len(rows), 150)
+        self.assertEqual([rows[0][4], rows[-1][4]], ['CNC1000149', 'CNC1000000'])
+        self.assertEqual(rows[0][7], 'Pending')
+
+
+class MonitoringSearchPageTests(TestCase):
+    """Monitoring search pages by cursor across stations, with every filter in SQL"""
+
+    params = {'start_date': '2025-12-17', 'end_date': '2025-12-18'}
+
+    def setUp(self):
+        CsvExportTests.setUp(self)
+        base = datetime(2025, 12, 17, 6, 0)
+        # CNC2 rows at the same event times as every third CNC1 row
+        models.Cnc2Preprocessing.objects.bulk_create([
+            models.Cnc2Preprocessing(
+                timestamp=(base + timedelta(minutes=i * 10)).strftime('%d/%m/%Y %H:%M:%S'),
+                event_time=timezone.make_aware(base + timedelta(minutes=i * 10)),
+                machine_name='CNC2', qr_data=f'CNC2{i:06d}', model_name='MODEL_B',
+            )
+            for i in range(0, 150, 3)
+        ])
+        for i in range(0, 150, 5):
+            models.Cnc1Postprocessing.objects.create(
+                timestamp=(base + timedelta(minutes=i * 10 + 5)).strftime('%d/%m/%Y %H:%M:%S'),
+                qr_data=f'CNC1{i:06d}', status='NG',
+            )
+        for i in range(10):
+            models.Op40AProcessing.objects.create(
+                timestamp_internal=timezone.make_aware(base + timedelta(minutes=i * 10)),
+                qr_data_internal=f'INT{i:04d}', previous_machine_internal_status='OK', model_name_internal='MODEL_A',
+                qr_data_external=f'EXT{i:04d}' if i % 2 else None, qr_data_housing=f'HSG{i:04d}' if i % 2 else None,
+                status='OK',
+            )
+
+    def get_pages(self, limit, **params):
+        pages = []
+        after = None
+        while True:
+            query = {**self.params, **params, 'limit': limit}
+            if after:
+                query['after'] = after
+            data = self.client.get('/monitoring/search/', query).json()
+            pages.append(data)
+            after = data['next']
+            if not after:
+                return pages
+
+    def test_pages_cover_every_row_once_newest_first(self):
+        pages = self.get_pages(7)
+        records = [record for page in pages for record in page['results']]
+        self.assertEqual(len(pages), 30)
+        self.assertEqual((pages[0]['total'], pages[0]['total_exact']), (210, True))
+        self.assertNotIn('total', pages[1])
+
+        # Newest first by event time, ties broken by station table then id
+        stations = [
+            ('DMG MORI1(op-110A)', models.Cnc1Preprocessing, 'event_time'),
+            ('DMG MORI2(op-110B)', models.Cnc2Preprocessing, 'event_time'),
+            ('OP40A', models.Op40AProcessing, 'timestamp_internal'),
+        ]
+        expected = sorted(
+            ((getattr(row, field), model._meta.db_table, row.id, name)
+             for name, model, field in stations for row in model.objects.all()),
+            reverse=True,
+        )
+        keys = [(record['machine_name'], record['prep_id']) for record in records]
+        self.assertEqual(keys, [(name, row_id) for _, _, row_id, name in expected])
+
+    def test_status_filter_runs_before_the_page_limit(self):
+        ng = self.get_pages(1000, status='NG')
+        self.assertEqual(len(ng), 1)
+        self.assertEqual((ng[0]['count'], ng[0]['total']), (30, 30))
+        self.assertTrue(all(record['status'] == 'NG' for record in ng[0]['results']))
+
+        pending = [record for page in self.get_pages(50, status='Pending') for record in page['results']]
+        self.assertEqual(len(pending), 120 + 50 + 5)
+        self.assertTrue(all(record['status'] == 'Pending' for record in pending))
+        self.assertEqual(self.get_pages(50, status='OK', machine='op40a')[0]['count'], 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/monitoring/search/', {**self.params, 'after': '2025-12-17,7'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_chart_counts_every_matching_row(self):
+        from collections import Counter
+
+        records = [record for page in self.get_pages(1000) for record in page['results']]
+        statuses = Counter(record['status'] for record in records)
+
+        data = self.client.get('/monitoring/chart-data/', self.params).json()['data']
+        self.assertEqual(data['summary'], {
+            'total': 210, 'ok': statuses['OK'], 'ng': statuses['NG'], 'pending': statuses['Pending'],
+        })
+        self.assertEqual(sum(data['time_series']['ok'] + data['time_series']['ng'] + data['time_series']['pending']), 210)
+
+        # 5-minute buckets in plant time: 06:00 on both days, three stations on the first
+        series = data['time_series']
+        at_six = series['labels'].index('06:00')
+        self.assertEqual(series['ok'][at_six] + series['ng'][at_six] + series['pending'][at_six], 5)
+
+        machines = dict(zip(data['machine_breakdown']['machines'], data['machine_breakdown']['ng']))
+        self.assertEqual(machines['CNC 1'], 30)
+        models_ok = dict(zip(data['model_breakdown']['models'], data['model_breakdown']['ok']))
+        self.assertEqual(models_ok['MODEL_A'], 5)
+
+        ng = self.client.get('/monitoring/chart-data/', {**self.params, 'status': 'NG'}).json()['data']
+        self.assertEqual(ng['summary']['total'], self.get_pages(1000, status='NG')[0]['total'])
+
+
+class ReportJobTests(TestCase):
+    """Heavy exports are queued, built by run_report_worker and downloaded when done"""
+
+    params = {'kind': 'monitoring_xlsx', 'start_date': '2025-12-17', 'end_date': '2025-12-18', 'machine': 'dmg_mori1op_110a'}
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        from unittest import mock
+
+        CsvExportTests.setUp(self)
+        # The worker drops its connection between jobs; keep the test transaction's
+        worker_connections = mock.patch('tracebility.management.commands.run_report_worker.close_old_connections')
+        worker_connections.start()
+        self.addCleanup(worker_connections.stop)
+        reports_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(reports_dir.cleanup)
+        reports_setting = override_settings(REPORTS_DIR=reports_dir.name)
+        reports_setting.enable()
+        self.addCleanup(reports_setting.disable)
+
+    def submit(self, **params):
+        return self.client.post('/api/reports/', {**self.params, **params})
+
+    def test_identical_requests_share_the_queued_job(self):
+        first = self.submit()
+        second = self.submit()
+        other = self.submit(status='NG')
+        self.assertEqual([first.status_code, second.status_code, other.status_code], [202, 200, 202])
+        self.assertEqual(first.json()['job_id'], second.json()['job_id'])
+        self.assertNotEqual(first.json()['job_id'], other.json()['job_id'])
+        self.assertEqual(models.ReportJob.objects.count(), 2)
+
+    def test_queued_job_offers_the_direct_export(self):
+        # What the page falls back to when no worker picks the job up
+        direct_url = self.submit().json()['direct_url']
+        self.assertTrue(direct_url.startswith('/monitoring/export-excel/?'))
+        self.assertIn('machine=dmg_mori1op_110a', direct_url)
+        response = self.client.get(direct_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('monitoring_detailed_', response['Content-Disposition'])
+
+    def test_active_jobs_are_unique_per_request(self):
+        from django.db import IntegrityError, transaction
+
+        job = models.ReportJob.objects.create(kind='analytics_csv', params_hash='x')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.ReportJob.objects.create(kind='analytics_csv', params_hash='x', status='running')
+        job.status = models.ReportJob.DONE
+        job.save()
+        models.ReportJob.objects.create(kind='analytics_csv', params_hash='x')
+
+    def test_worker_builds_the_file_for_download(self):
+        import io
+        from openpyxl import load_workbook
+
+        job_id = self.submit().json()['job_id']
+        self.assertEqual(self.client.get(f'/api/reports/{job_id}/download/').status_code, 409)
+
+        call_command('run_report_worker', '--once', stdout=StringIO())
+
+        status = self.client.get(f'/api/reports/{job_id}/').json()
+        self.assertEqual(status['status'], 'done')
+        response = self.client.get(status['download_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('monitoring_detailed_', response['Content-Disposition'])
+        wb = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(wb['Monitoring Data'].max_row, 151)
+
+        # A finished job no longer absorbs new requests
+        self.assertEqual(self.submit().status_code, 202)
+
+    def test_csv_report_and_failures(self):
+        csv_job = self.submit(kind='analytics_csv').json()['job_id']
+        bad_job = models.ReportJob.objects.create(kind='unknown', params_hash='y').id
+        call_command('run_report_worker', '--once', stdout=StringIO())
+
+        content = b''.join(self.client.get(f'/api/reports/{csv_job}/download/').streaming_content).decode()
+        self.assertIn('CNC1000149', content)
+        bad = models.ReportJob.objects.get(id=bad_job)
+        self.assertEqual(bad.status, models.ReportJob.FAILED)
+        self.assertIn('Unknown report kind', bad.error)
+        self.assertEqual(self.submit(kind='nope').status_code, 400)
+
+    def test_long_ranges_without_rollups_are_chunked(self):
+        from unittest import mock
+        from . import chunked_analytics
+
+        chunked = mock.patch.object(
+            chunked_analytics, 'collect_chunked_analytics', wraps=chunked_analytics.collect_chunked_analytics,
+        )
+        with chunked as collect:
+            short_job = self.submit(kind='analytics_csv').json()['job_id']
+            long_job = self.submit(kind='analytics_xlsx', start_date='2025-12-01', end_date='2025-12-31').json()['job_id']
+            call_command('run_report_worker', '--once', stdout=StringIO())
+
+        self.assertEqual(collect.call_count, 1)
+        self.assertEqual(timezone.localtime(collect.call_args.args[0]).date().isoformat(), '2025-12-01')
+        jobs = models.ReportJob.objects.filter(id__in=[short_job, long_job])
+        self.assertEqual({job.status for job in jobs}, {models.ReportJob.DONE})
+
+    def test_only_jobs_without_heartbeat_are_requeued(self):
+        import threading
+        from unittest import mock
+        from .report_jobs import beat, claim_next_job, requeue_stale_jobs
+
+        self.submit()
+        job = claim_next_job()
+        long_ago = timezone.now() - timedelta(hours=2)
+        models.ReportJob.objects.filter(id=job.id).update(started_at=long_ago)
+
+        # Running for hours, but its worker is alive
+        stop = mock.Mock(spec=threading.Event)
+        stop.wait.side_effect = [False, True]
+        with mock.patch('tracebility.report_jobs.connection'):
+            beat(job, stop)
+        self.assertEqual(requeue_stale_jobs(60), 0)
+
+        models.ReportJob.objects.filter(id=job.id).update(heartbeat_at=long_ago)
+        self.assertEqual(requeue_stale_jobs(60), 1)
+        requeued = models.ReportJob.objects.get(id=job.id)
+        self.assertEqual((requeued.status, requeued.claim_token), (models.ReportJob.QUEUED, ''))
+
+    def test_presumed_dead_claim_does_not_overwrite_the_takeover(self):
+        import os
+        from django.conf import settings
+        from .report_jobs import claim_next_job, requeue_stale_jobs, run_job
+
+        self.submit()
+        first = claim_next_job()
+        models.ReportJob.objects.filter(id=first.id).update(heartbeat_at=timezone.now() - timedelta(hours=2))
+        requeue_stale_jobs(60)
+        second = claim_next_job()
+        self.assertNotEqual(first.claim_token, second.claim_token)
+
+        run_job(second)
+        finished = run_job(first)
+        self.assertEqual(finished.status, models.ReportJob.DONE)
+        self.assertIn(second.claim_token, finished.file_name)
+        self.assertEqual(os.listdir(settings.REPORTS_DIR), [finished.file_name])
+
+
+class DashboardCountTests(TestCase):
+    """Dashboard OK / NG / Pending counters are one aggregate query per machine"""
+
+    def test_machine_counts_use_stored_pairing(self):
+        from .views import get_machine_counts
+
+        for i, status in enumerate(['OK', 'OK', 'NG', None]):
+            models.Cnc1Preprocessing.objects.create(
+                timestamp='17/12/2025 19:06:00', machine_name='CNC1', qr_data=f'CNC10000{i}', model_name='MODEL_A'
+            )
+            if status:
+                models.Cnc1Postprocessing.objects.create(timestamp='17/12/2025 19:08:00', qr_data=f'CNC10000{i}', status=status)
+
+        with self.assertNumQueries(1):
+            counts = get_machine_counts(models.Cnc1Preprocessing, models.Cnc1Postprocessing)
+        self.assertEqual(counts, {'ok': 2, 'ng': 1, 'pending': 1})
+
+    def test_assembly_counts(self):
+        from .views import get_assembly_counts
+
+        for i, (external, status) in enumerate([('EXT1', None), ('EXT2', 'NG'), (None, 'OK')]):
+            models.Op40AProcessing.objects.create(
+                timestamp_internal=timezone.now(), qr_data_internal=f'INT{i}', previous_machine_internal_status='OK',
+                model_name_internal='MODEL_C', qr_data_external=external, qr_data_housing=f'HSG{i}', status=status
+            )
+
+        with self.assertNumQueries(1):
+            counts = get_assembly_counts(models.Op40AProcessing)
+        self.assertEqual(counts, {'ok': 1, 'ng': 1, 'pending': 1})
+
+
+class ChangeFeedTests(TestCase):
+    """The shared change feed detects new rows with one query for every watched table"""
+
+    def test_poller_publishes_changed_tables(self):
+        from django.db import connection
+        from .change_feed import ChangeFeed
+
+        feed = ChangeFeed()
+        feed.watched.update(['cnc1_preprocessing', 'cnc1_postprocessing'])
+        last_ids = feed.poll_once(connection, {})
+
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 19:06:00', machine_name='CNC1', qr_data='CNC1000001', model_name='MODEL_A'
+        )
+        with self.assertNumQueries(1):
+            feed.poll_once(connection, last_ids)
+
+        self.assertEqual(feed.version(['cnc1_preprocessing']), 1)
+        self.assertEqual(feed.version(['cnc1_postprocessing']), 0)
+
+    def test_wait_returns_on_publish(self):
+        from .change_feed import ChangeFeed
+
+        feed = ChangeFeed()
+        self.assertEqual(feed.wait(['op80_preprocessing'], 0, timeout=0.01), 0)
+
+        feed.publish(['op80_preprocessing', 'cnc1_preprocessing'])
+        self.assertEqual(feed.wait(['op80_preprocessing'], 0, timeout=5), 1)
+
+
+class BroadcastHubTests(TestCase):
+    """A channel snapshot is built once per change however many clients subscribe"""
+
+    def setUp(self):
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 19:06:00', machine_name='CNC1', qr_data='CNC1000001', model_name='MODEL_A'
+        )
+
+    def count_refresh_queries(self, subscribers):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .broadcast import BroadcastHub
+        from .change_feed import ChangeFeed
+        from .views import activity_tracker, get_stream_channel
+
+        feed = ChangeFeed()
+        hub = BroadcastHub(get_stream_channel, feed=feed, autostart=False)
+        streams = [hub.subscribe('machine:dmg_mori1op_110a', timeout=0.01) for _ in range(subscribers)]
+        # Both runs start from a cold activity cache
+        activity_tracker.loaded_at = None
+
+        feed.publish(['cnc1_preprocessing'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(hub.refresh(), ['machine:dmg_mori1op_110a'])
+
+        payloads = {next(stream)[1] for stream in streams}
+        self.assertEqual(len(payloads), 1)
+        self.assertIn('CNC1000001', payloads.pop())
+        return len(queries)
+
+    def test_query_count_independent_of_subscribers(self):
+        one = self.count_refresh_queries(1)
+        self.assertGreater(one, 0)
+        self.assertEqual(self.count_refresh_queries(25), one)
+
+    def test_unchanged_channel_is_not_rebuilt(self):
+        from .broadcast import BroadcastHub
+        from .change_feed import ChangeFeed
+        from .views import get_stream_channel
+
+        feed = ChangeFeed()
+        hub = BroadcastHub(get_stream_channel, feed=feed, autostart=False)
+        hub.subscribe('dashboard')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(hub.refresh(), [])
+
+    def test_closing_unstarted_subscription_drops_subscriber(self):
+        from .broadcast import BroadcastHub
+        from .change_feed import ChangeFeed
+        from .views import get_stream_channel
+
+        hub = BroadcastHub(get_stream_channel, feed=ChangeFeed(), autostart=False)
+        stream = hub.subscribe('dashboard')
+        self.assertEqual(hub.channels['dashboard']['subscribers'], 1)
+
+        stream.close()
+        stream.close()
+        self.assertEqual(hub.channels['dashboard']['subscribers'], 0)
+
+
+class StreamPatchTests(TestCase):
+    """Subscribers holding the previous version get a patch, everyone else a full snapshot"""
+
+    CHANNEL = 'machine:dmg_mori1op_110a'
+
+    def setUp(self):
+        from .broadcast import BroadcastHub
+        from .change_feed import ChangeFeed
+        from .views import get_stream_channel
+
+        for i in range(20):
+            models.Cnc1Preprocessing.objects.create(
+                timestamp=f'17/12/2025 19:{i:02d}:00', machine_name='CNC1', qr_data=f'CNC10000{i:02d}', model_name='MODEL_A'
+            )
+        self.feed = ChangeFeed()
+        self.hub = BroadcastHub(get_stream_channel, feed=self.feed, autostart=False)
+
+    def publish_change(self):
+        self.feed.publish(['cnc1_preprocessing'])
+        self.assertEqual(self.hub.refresh(), [self.CHANNEL])
+
+    def apply_patch(self, snapshot, patch):
+        from .views import get_record_key
+
+        rows = {get_record_key(record): record for record in snapshot['records']}
+        rows.update((get_record_key(record), record) for record in patch['changed'])
+        order = patch.get('order', [get_record_key(record) for record in snapshot['records']])
+        return dict(snapshot, **patch['fields'], version=patch['version'], records=[rows[key] for key in order])
+
+    def test_patch_carries_only_new_rows(self):
+        stream = self.hub.subscribe(self.CHANNEL, timeout=0.01)
+        self.publish_change()
+        first = json.loads(next(stream)[1])
+        self.assertEqual(first['type'], 'update')
+        self.assertEqual(len(first['records']), 20)
+
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 20:00:00', machine_name='CNC1', qr_data='CNC1000099', model_name='MODEL_A'
+        )
+        self.publish_change()
+        data = next(stream)[1]
+        patch = json.loads(data)
+        self.assertEqual(patch['type'], 'patch')
+        self.assertEqual(patch['base_version'], first['version'])
+        self.assertEqual([record['qr_code'] for record in patch['changed']], ['CNC1000099'])
+
+        full = json.loads(self.hub.channels[self.CHANNEL]['payload'])
+        self.assertEqual(self.apply_patch(first, patch), full)
+        self.assertLess(len(data), len(self.hub.channels[self.CHANNEL]['payload']) / 5)
+
+    def test_lagging_subscriber_is_replayed_missed_patches(self):
+        stream = self.hub.subscribe(self.CHANNEL, timeout=0.01)
+        self.publish_change()
+        next(stream)
+
+        self.publish_change()
+        self.publish_change()
+        events = [next(stream), next(stream)]
+        self.assertEqual([event_id.split('-')[1] for event_id, data in events], ['2', '3'])
+        self.assertEqual([json.loads(data)['base_version'] for event_id, data in events], [1, 2])
+
+    def test_resume_from_last_event_id(self):
+        stream = self.hub.subscribe(self.CHANNEL, timeout=0.01)
+        self.publish_change()
+        last_event_id, data = next(stream)
+        stream.close()
+
+        # Row added while the client was disconnected
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 20:00:00', machine_name='CNC1', qr_data='CNC1000099', model_name='MODEL_A'
+        )
+        self.feed.publish(['cnc1_preprocessing'])
+
+        stream = self.hub.subscribe(self.CHANNEL, timeout=0.01, last_event_id=last_event_id)
+        self.assertEqual(self.hub.refresh(), [self.CHANNEL])
+        patch = json.loads(next(stream)[1])
+        self.assertEqual(patch['type'], 'patch')
+        self.assertEqual(patch['base_version'], json.loads(data)['version'])
+        self.assertEqual([record['qr_code'] for record in patch['changed']], ['CNC1000099'])
+
+    def test_snapshot_once_buffer_moved_past_client(self):
+        from unittest import mock
+
+        with mock.patch('tracebility.broadcast.EVENT_BUFFER_SIZE', 2):
+            stream = self.hub.subscribe(self.CHANNEL, timeout=0.01)
+            self.publish_change()
+            last_event_id, data = next(stream)
+            stream.close()
+
+        # Another viewer keeps the channel publishing while this client is away
+        self.hub.subscribe(self.CHANNEL, timeout=0.01)
+        for _ in range(3):
+            self.publish_change()
+        for event_id in (last_event_id, 'elsewhere-1'):
+            stream = self.hub.subscribe(self.CHANNEL, timeout=0.01, last_event_id=event_id)
+            data = json.loads(next(stream)[1])
+            self.assertEqual((data['type'], data['version']), ('update', 4))
+            stream.close()
+
+
+class ActivityTrackerTests(TestCase):
+    """Active/inactive flags come from one cached max(id) read, refreshed by the change feed"""
+
+    def setUp(self):
+        from unittest import mock
+        from .activity import ActivityTracker
+        from .change_feed import ChangeFeed
+        from .views import get_activity_model
+
+        self.feed = ChangeFeed()
+        running = mock.patch.object(self.feed, 'running', return_value=True)
+        running.start()
+        self.addCleanup(running.stop)
+        self.tracker = ActivityTracker(
+            [get_activity_model(config) for config in MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]
+             if get_activity_model(config)],
+            feed=self.feed,
+        )
+
+    def add_cnc1_row(self, minutes_ago):
+        stamp = timezone.localtime() - timedelta(minutes=minutes_ago)
+        models.Cnc1Preprocessing.objects.create(
+            timestamp=stamp.strftime('%d/%m/%Y %H:%M:%S'), machine_name='CNC1', qr_data=f'CNC1{minutes_ago:06d}', model_name='MODEL_A'
+        )
+
+    def test_all_stations_read_in_one_query(self):
+        self.add_cnc1_row(5)
+        with self.assertNumQueries(1):
+            self.assertTrue(self.tracker.is_active('cnc1_preprocessing'))
+            self.assertFalse(self.tracker.is_active('op40a_processing'))
+            self.assertFalse(self.tracker.is_active('prewashing_postprocessing'))
+
+    def test_change_feed_refreshes_changed_table_only(self):
+        self.add_cnc1_row(30)
+        self.assertFalse(self.tracker.is_active('cnc1_preprocessing'))
+        self.assertTrue(self.tracker.is_active('cnc1_preprocessing', minutes=45))
+
+        self.add_cnc1_row(1)
+        with self.assertNumQueries(0):
+            self.assertFalse(self.tracker.is_active('cnc1_preprocessing'))
+        self.feed.publish(['cnc1_preprocessing'])
+        with self.assertNumQueries(1):
+            self.assertTrue(self.tracker.is_active('cnc1_preprocessing'))
+
+
+class RecordWindowTests(TestCase):
+    """Machine stream windows read only new and changed rows but match the full reload"""
+
+    def setUp(self):
+        for i in range(5):
+            models.Cnc1Preprocessing.objects.create(
+                timestamp=f'17/12/2025 19:0{i}:00', machine_name='CNC1', qr_data=f'CNC100000{i}', model_name='MODEL_A'
+            )
+
+    def test_late_post_row_costs_one_query_for_one_row(self):
+        from .views import get_machine_data, get_record_window, get_stream_config
+
+        config, is_assembly = get_stream_config('dmg_mori1op_110a')
+        window = get_record_window(config, is_assembly)
+        self.assertEqual(window.refresh(), get_machine_data(config['prep_model'], config['post_model']))
+
+        models.Cnc1Postprocessing.objects.create(timestamp='17/12/2025 19:10:00', qr_data='CNC1000002', status='NG')
+        built = []
+        build_record = window.build_record
+        window.build_record = lambda row: built.append(row.id) or build_record(row)
+        with self.assertNumQueries(1):
+            records = window.refresh()
+
+        self.assertEqual(len(built), 1)
+        self.assertEqual(records, get_machine_data(config['prep_model'], config['post_model']))
+        self.assertEqual(records[0]['post_status'], 'NG')
+
+    def test_completed_assembly_row_is_refetched(self):
+        from .views import get_assembly_machine_data, get_record_window, get_stream_config
+
+        config, is_assembly = get_stream_config('op40a')
+        prep = models.Op40AProcessing.objects.create(
+            timestamp_internal=timezone.make_aware(datetime(2025, 12, 18, 10, 5)),
+            qr_data_internal='INT0001', previous_machine_internal_status='OK', model_name_internal='MODEL_C',
+        )
+        window = get_record_window(config, is_assembly)
+        self.assertEqual(window.refresh()[0]['post_status'], 'Pending')
+
+        models.Op40AProcessing.objects.filter(id=prep.id).update(
+            qr_data_external='EXT0001', qr_data_housing='HSG0001', status='OK'
+        )
+        with self.assertNumQueries(1):
+            records = window.refresh()
+        self.assertEqual(records, get_assembly_machine_data(config['prep_model'], config['post_model']))
+        self.assertEqual(records[0]['post_status'], 'OK')
+
+    def test_window_keeps_newest_rows(self):
+        from .record_window import RecordWindow
+        from .views import build_washing_load_record
+
+        window = RecordWindow(models.Cnc1Preprocessing.objects.all(), build_washing_load_record, size=3)
+        window.refresh()
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 19:09:00', machine_name='CNC1', qr_data='CNC1000009', model_name='MODEL_A'
+        )
+        self.assertEqual(
+            [record['qr_code'] for record in window.refresh()],
+            ['CNC1000009', 'CNC1000004', 'CNC1000003'],
+        )
+
+
+class AsyncStreamLoadTests(TransactionTestCase):
+    """Hundreds of idle ASGI streams share the event loop: no thread per viewer"""
+
+    CLIENTS = 200
+
+    async def open_stream(self, handler, path, received, disconnect):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'root_path': '', 'headers': [(b'host', b'testserver')],
+            'client': ('127.0.0.1', 40000), 'server': ('testserver', 80),
+        }
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.body' and message.get('body', b'').startswith(b'id:'):
+                received.append(message['body'])
+
+        await handler(scope, receive, send)
+
+    def test_200_idle_clients_stay_flat(self):
+        from unittest import mock
+        from asgiref.sync import async_to_sync, sync_to_async
+        from django.core.handlers.asgi import ASGIHandler
+        from .broadcast import BroadcastHub
+        from .change_feed import ChangeFeed
+        from . import views
+
+        models.Cnc1Preprocessing.objects.create(
+            timestamp='17/12/2025 19:06:00', machine_name='CNC1', qr_data='CNC1000001', model_name='MODEL_A'
+        )
+        feed = ChangeFeed()
+        hub = BroadcastHub(views.get_stream_channel, feed=feed, autostart=False)
+
+        async def scenario():
+            handler = ASGIHandler()
+            received = []
+            disconnect = asyncio.Event()
+            paths = ['/stream/dashboard/', '/stream/machine/dmg_mori1op_110a/']
+
+            threads_before = threading.active_count()
+            tracemalloc.start()
+            memory_before = tracemalloc.get_traced_memory()[0]
+
+            clients = [
+                asyncio.create_task(self.open_stream(handler, paths[i % 2], received, disconnect))
+                for i in range(self.CLIENTS)
+            ]
+            for _ in range(500):
+                if sum(entry['subscribers'] for entry in hub.channels.values()) == self.CLIENTS:
+                    break
+                await asyncio.sleep(0.01)
+
+            memory_per_client = (tracemalloc.get_traced_memory()[0] - memory_before) / self.CLIENTS
+            threads_connected = threading.active_count()
+
+            feed.publish(['cnc1_preprocessing'])
+            self.assertEqual(sorted(await sync_to_async(hub.refresh)()), ['dashboard', 'machine:dmg_mori1op_110a'])
+            for _ in range(500):
+                if len(received) == self.CLIENTS:
+                    break
+                await asyncio.sleep(0.01)
+
+            threads_after = threading.active_count()
+            tracemalloc.stop()
+            disconnect.set()
+            await asyncio.wait_for(asyncio.gather(*clients), timeout=10)
+            return received, threads_before, threads_connected, threads_after, memory_per_client
+
+        with mock.patch.object(views, 'stream_hub', hub):
+            received, threads_before, threads_connected, threads_after, memory_per_client = async_to_sync(scenario)()
+
+        self.assertEqual(len(received), self.CLIENTS)
+        self.assertLessEqual(threads_connected - threads_before, 2)
+        self.assertLessEqual(threads_after - threads_before, 2)
+        self.assertLess(memory_per_client, 64 * 1024)
+        self.assertEqual([entry['subscribers'] for entry in hub.channels.values()], [0, 0])
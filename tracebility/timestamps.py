@@ -0,0 +1,184 @@
+"""
+Timestamp helpers shared by the views, signals and management commands.
+
+Station tables store their timestamp as the string sent by the PLC gateway.
+These helpers turn those strings into datetimes and into the timezone-aware
+value stored in the indexed ``event_time`` column.
+
+parse_timestamp_to_datetime() recognises the fixed-width formats the
+gateways send by their shape (length and separator positions) and slices
+the fields directly; anything else falls back to the strptime chain in
+parse_timestamp_strptime(), whose results it reproduces exactly. Strings
+that need the fallback are memoized in a bounded LRU cache; the
+fixed-width parse costs about as much as a cache lookup, so it is not.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from django.utils import timezone
+
+
+TIMESTAMP_CACHE_SIZE = 65536
+
+# %I + %p -> 24-hour %H; strptime matches AM/PM in any case
+HOURS_24 = {
+    f'{hour:02d}{meridiem}': hour % 12 + (12 if pm else 0)
+    for hour in range(1, 13)
+    for pm, names in ((False, ('AM', 'am', 'Am', 'aM')), (True, ('PM', 'pm', 'Pm', 'pM')))
+    for meridiem in names
+}
+
+# Two-digit fields; a missing key means the slice is not two ASCII digits
+# (or, for minutes and seconds, not one strptime would accept)
+TWO_DIGITS = {f'{value:02d}': value for value in range(100)}
+SIXTY = {f'{value:02d}': value for value in range(60)}
+
+# Distinct 'dd/mm/yyyy' date parts seen by the 12-hour format (a few per day)
+SLASH_DATE_CACHE_SIZE = 4096
+
+
+def parse_timestamp_to_datetime(timestamp):
+    """Convert timestamp string to datetime object"""
+    if isinstance(timestamp, str):
+        dt = parse_fixed_width(timestamp)
+        if dt is None:
+            dt = parse_timestamp_string(timestamp)
+        return dt
+
+    if hasattr(timestamp, 'strftime'):
+        return timestamp
+
+    return None
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_timestamp_string(timestamp):
+    return parse_timestamp_strptime(timestamp)
+
+
+def from_iso(value):
+    """datetime.fromisoformat() that returns None instead of raising"""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def parse_fixed_width(s):
+    """Parse a known fixed-width format (None: not one of them, or not a valid date in it)
+
+    The 12-hour shape builds the datetime from its sliced fields, with the
+    date part memoized by parse_slash_date(); the others are sliced into ISO order for the C fromisoformat(). Formats sharing a
+    shape are tried in the order of the strptime chain, day first then month
+    first, so ambiguous dates parse the same way (a middle field above 12
+    cannot be a month, so the day-first attempt is skipped).
+    """
+    n = len(s)
+    if n < 19 or not s.isascii():
+        return None
+
+    # %d/%m/%Y, %I:%M:%S %p, then %m/%d/%Y, %I:%M:%S %p
+    if n == 23 and s[2] == '/' == s[5] and s[10] == ',' and s[11] == ' ' == s[20] and s[14] == ':' == s[17]:
+        date = parse_slash_date(s[0:10])
+        hour = HOURS_24.get(s[12:14] + s[21:23])
+        minute, second = SIXTY.get(s[15:17]), SIXTY.get(s[18:20])
+        if date is None or hour is None or minute is None or second is None:
+            return None
+        return datetime(*date, hour, minute, second)
+
+    if n == 19 and s[10] == ' ' and s[13] == ':' == s[16]:
+        # %d/%m/%Y %H:%M:%S
+        if s[2] == '/' == s[5]:
+            return from_iso(f'{s[6:10]}-{s[3:5]}-{s[0:2]}{s[10:]}')
+
+        # %Y-%m-%d %H:%M:%S
+        if s[4] == '-' == s[7]:
+            return from_iso(s)
+
+        # %d-%m-%Y %H:%M:%S, then %m-%d-%Y %H:%M:%S
+        if s[2] == '-' == s[5]:
+            return (
+                s[3:5] <= '12' and from_iso(f'{s[6:10]}-{s[3:5]}-{s[0:2]}{s[10:]}')
+                or from_iso(f'{s[6:10]}-{s[0:2]}-{s[3:5]}{s[10:]}')
+            )
+        return None
+
+    if s[4] == '-' == s[7]:
+        # %Y-%m-%d %H:%M:%S.%f
+        if n <= 26 and s[10] == ' ' and s[13] == ':' == s[16] and s[19] == '.':
+            return from_iso(f'{s[:20]}{s[20:]:0<6}') if s[20:].isdigit() else None
+
+        # No strptime format has a 'T' there: the chain would end in fromisoformat()
+        if s[10] == 'T':
+            return from_iso(s.replace('Z', '+00:00'))
+
+    return None
+
+
+@lru_cache(maxsize=SLASH_DATE_CACHE_SIZE)
+def parse_slash_date(s):
+    """(year, month, day) of 'dd/mm/yyyy', else of 'mm/dd/yyyy' (None if neither is a valid date)"""
+    first, second, year = TWO_DIGITS.get(s[0:2]), TWO_DIGITS.get(s[3:5]), s[6:10]
+    if first is None or second is None or not year.isdigit():
+        return None
+    year = int(year)
+    for month, day in ((second, first), (first, second)):
+        if month <= 12:
+            try:
+                datetime(year, month, day)
+            except ValueError:
+                continue
+            return year, month, day
+    return None
+
+
+def parse_timestamp_strptime(timestamp):
+    """Try every known format with strptime, in order (the reference for parse_fixed_width)"""
+    # ADD THIS FIRST - DD/MM/YYYY HH:MM:SS (24-hour, no comma)
+    try:
+        return datetime.strptime(timestamp, '%d/%m/%Y %H:%M:%S')
+    except:
+        pass
+
+    try:
+        return datetime.strptime(timestamp, '%d/%m/%Y, %I:%M:%S %p')
+    except:
+        pass
+
+    try:
+        return datetime.strptime(timestamp, '%m/%d/%Y, %I:%M:%S %p')
+    except:
+        pass
+
+    formats = [
+        '%Y-%m-%d %H:%M:%S',
+        '%Y-%m-%d %H:%M:%S.%f',
+        '%d-%m-%Y %H:%M:%S',
+        '%m-%d-%Y %H:%M:%S',
+    ]
+
+    for fmt in formats:
+        try:
+            return datetime.strptime(timestamp, fmt)
+        except:
+            continue
+
+    try:
+        return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    except:
+        pass
+
+    return None
+
+
+def to_event_time(timestamp):
+    """Convert a raw station timestamp to the timezone-aware value stored in event_time"""
+    dt = parse_timestamp_to_datetime(timestamp)
+    if dt is None:
+        return None
+
+    # Naive strings are local plant time (settings.TIME_ZONE)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+
+    return dt
@@ -2,6 +2,7 @@ from django.urls import path
 from . import views
 from . import rework_views
 from . import monitoring_views
+from . import report_views
 app_name = 'dashboard'
 
 urlpatterns = [
@@ -20,10 +21,16 @@ urlpatterns = [
     # Analytics
     path('analytics/', views.analytics_view, name='analytics'),
     path('api/analytics/', views.analytics_api, name='analytics_api'),
+    path('api/analytics/cache-stats/', views.analytics_cache_stats_api, name='analytics_cache_stats'),
     # Export URLs
     path('api/analytics/export/', views.analytics_export, name='analytics_export'),
     path('api/analytics/export/excel/', views.analytics_export_excel, name='analytics_export_excel'),  # NEW
 
+    # Background report jobs (heavy exports built by run_report_worker)
+    path('api/reports/', report_views.report_submit_api, name='report_submit_api'),
+    path('api/reports/<int:job_id>/', report_views.report_status_api, name='report_status_api'),
+    path('api/reports/<int:job_id>/download/', report_views.report_download, name='report_download'),
+
 
 
     # 🔧 Rework
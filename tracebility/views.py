@@ -4,12 +4,18 @@ from django.db.models import Q, Count
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.core.serializers.json import DjangoJSONEncoder
+from django.core.handlers.asgi import ASGIRequest
 from datetime import timedelta, datetime
 from collections import defaultdict
-import csv
 import json
-import time
 from . import models
+from .timestamps import parse_timestamp_to_datetime
+from .qr_search import qr_search_q
+from .change_feed import get_station_tables
+from .broadcast import BroadcastHub, diff_snapshot
+from .record_window import RecordWindow, late_post_q
+from .activity import ACTIVITY_THRESHOLD_MINUTES, ActivityTracker
+from .csv_export import EXPORT_CHUNK_SIZE, csv_response, parse_export_range
 
 
 # ============================================================================
@@ -67,53 +73,58 @@ OP80_CONFIG = {
     'type': 'op80'
 }
 
+# Prep -> post QR join columns per machine type, tried in order: (prep field, post field)
+# Every post field listed here must be indexed (see tests.QrJoinIndexTests)
+POST_MATCH_RULES = {
+    'standard': [('qr_data', 'qr_data')],
+    'painting': [('qr_data_housing', 'qr_data_housing')],
+    'lubrication': [('qr_data_piston', 'qr_data_piston')],
+    'op80': [
+        ('qr_data_housing', 'qr_data_housing'),
+        ('qr_data_housing', 'qr_data_housing_new'),
+        ('qr_data_piston', 'qr_data_housing'),
+    ],
+}
+
+
+def get_post_match_rules(config):
+    """Return the prep -> post QR join rules for a machine config (empty for washing / assembly)"""
+    machine_type = config.get('type')
+    if machine_type in ('washing', 'assembly'):
+        return []
+    return POST_MATCH_RULES.get(machine_type, POST_MATCH_RULES['standard'])
+
 
 # ============================================================================
 # HELPER FUNCTION TO GET OK/NG COUNTS
 # ============================================================================
 
+RECENT_COUNT_WINDOW = 100
+
+
+def count_recent_statuses(model, ok_q, ng_q, limit=RECENT_COUNT_WINDOW):
+    """OK / NG / Pending counts over the latest `limit` rows of a table in one aggregate query"""
+    latest_ids = model.objects.order_by('-id').values('id')[:limit]
+    totals = model.objects.filter(id__in=latest_ids).aggregate(
+        total=Count('id'),
+        ok=Count('id', filter=ok_q),
+        ng=Count('id', filter=ng_q),
+    )
+    return {
+        'ok': totals['ok'],
+        'ng': totals['ng'],
+        'pending': totals['total'] - totals['ok'] - totals['ng'],
+    }
+
+
 def get_machine_counts(prep_model, post_model, machine_type='standard'):
     """Get OK and NG counts for a machine - FIXED OP80"""
     counts = {'ok': 0, 'ng': 0, 'pending': 0}
     
     try:
-        prep_records = prep_model.objects.all()[:100]
-        
-        for prep in prep_records:
-            if machine_type == 'painting':
-                qr_value = prep.qr_data_housing
-                post = post_model.objects.filter(qr_data_housing=qr_value).first()
-            elif machine_type == 'lubrication':
-                qr_value = prep.qr_data_piston
-                post = post_model.objects.filter(qr_data_piston=qr_value).first()
-            elif machine_type == 'op80':
-                # FIXED: Try multiple matching strategies
-                qr_housing = prep.qr_data_housing
-                qr_piston = prep.qr_data_piston
-                
-                # Try matching with qr_data_housing field first
-                post = post_model.objects.filter(qr_data_housing=qr_housing).first()
-                
-                # If not found, try qr_data_housing_new
-                if not post:
-                    post = post_model.objects.filter(qr_data_housing_new=qr_housing).first()
-                
-                # If still not found, try matching with piston QR
-                if not post:
-                    post = post_model.objects.filter(qr_data_housing=qr_piston).first()
-            else:
-                qr_value = prep.qr_data
-                post = post_model.objects.filter(qr_data=qr_value).first()
-            
-            if post:
-                if post.status == 'OK':
-                    counts['ok'] += 1
-                elif post.status == 'NG':
-                    counts['ng'] += 1
-                else:
-                    counts['pending'] += 1
-            else:
-                counts['pending'] += 1
+        # post_id is resolved on write (see pairing.py), so the status is one LEFT JOIN away;
+        # unpaired rows count as pending
+        counts = count_recent_statuses(prep_model, Q(post__status='OK'), Q(post__status='NG'))
     except Exception as e:
         print(f"Error getting counts: {e}")
     
@@ -125,19 +136,13 @@ def get_assembly_counts(prep_model):
     counts = {'ok': 0, 'ng': 0, 'pending': 0}
     
     try:
-        prep_records = prep_model.objects.all()[:100]
-        
-        for prep in prep_records:
-            if prep.qr_data_external and prep.qr_data_housing:
-                status = prep.status or 'OK'
-                if status == 'OK':
-                    counts['ok'] += 1
-                elif status == 'NG':
-                    counts['ng'] += 1
-                else:
-                    counts['pending'] += 1
-            else:
-                counts['pending'] += 1
+        # Parts without external and housing QR are pending; a complete part with no status counts as OK
+        complete = Q(qr_data_external__gt='') & Q(qr_data_housing__gt='')
+        counts = count_recent_statuses(
+            prep_model,
+            complete & (Q(status='OK') | Q(status__isnull=True) | Q(status='')),
+            complete & Q(status='NG'),
+        )
     except Exception as e:
         print(f"Error getting assembly counts: {e}")
     
@@ -149,26 +154,10 @@ def get_washing_counts(prep_model, post_model, operation='load'):
     counts = {'ok': 0, 'ng': 0, 'pending': 0}
     
     try:
-        if operation == 'load' and prep_model:
-            records = prep_model.objects.all()[:100]
-            for record in records:
-                status = getattr(record, 'status', 'OK')
-                if status == 'OK':
-                    counts['ok'] += 1
-                elif status == 'NG':
-                    counts['ng'] += 1
-                else:
-                    counts['pending'] += 1
-        elif operation == 'unload' and post_model:
-            records = post_model.objects.all()[:100]
-            for record in records:
-                status = getattr(record, 'status', 'OK')
-                if status == 'OK':
-                    counts['ok'] += 1
-                elif status == 'NG':
-                    counts['ng'] += 1
-                else:
-                    counts['pending'] += 1
+        # Status is on the preprocessing table for LOAD and on postprocessing for UNLOAD
+        model = prep_model if operation == 'load' else post_model if operation == 'unload' else None
+        if model:
+            counts = count_recent_statuses(model, Q(status='OK'), Q(status='NG'))
     except Exception as e:
         print(f"Error getting washing counts: {e}")
     
@@ -232,28 +221,32 @@ def get_washing_load_data(prep_model):
     prep_records = prep_model.objects.all()[:100]
     
     for prep in prep_records:
-        model_name = getattr(prep, 'model_name', 'N/A')
-        previous_machine_status = getattr(prep, 'previous_machine_status', '-')
-        
-        record = {
-            'prep_id': prep.id,
-            'prep_timestamp': prep.timestamp,
-            'qr_code': getattr(prep, 'qr_data', '-'),
-            'prep_status': getattr(prep, 'status', 'OK'),
-            'previous_machine_status': previous_machine_status,
-            'model_name': model_name,
-            'post_id': None,
-            'post_timestamp': None,
-            'post_status': 'N/A',
-            'overall_status': getattr(prep, 'status', 'OK'),
-            'status_class': 'load-only',
-            'sort_priority': 1,
-        }
-        records.append(record)
+        records.append(build_washing_load_record(prep))
     
     return records
 
 
+def build_washing_load_record(prep):
+    """Record for one washing Load (preprocessing) row"""
+    model_name = getattr(prep, 'model_name', 'N/A')
+    previous_machine_status = getattr(prep, 'previous_machine_status', '-')
+    
+    return {
+        'prep_id': prep.id,
+        'prep_timestamp': prep.timestamp,
+        'qr_code': getattr(prep, 'qr_data', '-'),
+        'prep_status': getattr(prep, 'status', 'OK'),
+        'previous_machine_status': previous_machine_status,
+        'model_name': model_name,
+        'post_id': None,
+        'post_timestamp': None,
+        'post_status': 'N/A',
+        'overall_status': getattr(prep, 'status', 'OK'),
+        'status_class': 'load-only',
+        'sort_priority': 1,
+    }
+
+
 def get_washing_unload_data(post_model):
     """Get Unload data for washing machines (Postprocessing only)"""
     records = []
@@ -264,28 +257,32 @@ def get_washing_unload_data(post_model):
     post_records = post_model.objects.all()[:100]
     
     for post in post_records:
-        model_name = getattr(post, 'model_name', 'N/A')
-        previous_machine_status = getattr(post, 'previous_machine_status', '-')
-        
-        record = {
-            'prep_id': None,
-            'prep_timestamp': None,
-            'qr_code': getattr(post, 'qr_data', '-'),
-            'prep_status': 'N/A',
-            'previous_machine_status': previous_machine_status,
-            'model_name': model_name,
-            'post_id': post.id,
-            'post_timestamp': post.timestamp,
-            'post_status': getattr(post, 'status', 'OK'),
-            'overall_status': getattr(post, 'status', 'OK'),
-            'status_class': 'unload-only',
-            'sort_priority': 1,
-        }
-        records.append(record)
+        records.append(build_washing_unload_record(post))
     
     return records
 
 
+def build_washing_unload_record(post):
+    """Record for one washing Unload (postprocessing) row"""
+    model_name = getattr(post, 'model_name', 'N/A')
+    previous_machine_status = getattr(post, 'previous_machine_status', '-')
+    
+    return {
+        'prep_id': None,
+        'prep_timestamp': None,
+        'qr_code': getattr(post, 'qr_data', '-'),
+        'prep_status': 'N/A',
+        'previous_machine_status': previous_machine_status,
+        'model_name': model_name,
+        'post_id': post.id,
+        'post_timestamp': post.timestamp,
+        'post_status': getattr(post, 'status', 'OK'),
+        'overall_status': getattr(post, 'status', 'OK'),
+        'status_class': 'unload-only',
+        'sort_priority': 1,
+    }
+
+
 def get_latest_washing_load_record(prep_model):
     """Get the latest load (preprocessing) record"""
     if not prep_model:
@@ -353,125 +350,117 @@ def get_latest_washing_unload_record(post_model):
 def get_machine_data(prep_model, post_model, machine_type='standard'):
     """Aggregate preprocessing and postprocessing data - FIXED OP80 logic"""
     records = []
-    prep_records = prep_model.objects.all()[:100]
+    prep_records = prep_model.objects.select_related('post')[:100]
     
     for prep in prep_records:
-        # Determine QR code field based on machine type
-        if machine_type == 'painting':
-            qr_value_housing_prep = prep.qr_data_housing
-            qr_value_piston_prep = prep.qr_data_piston
-            post = post_model.objects.filter(qr_data_housing=qr_value_housing_prep).first()
-            
-        elif machine_type == 'lubrication':
-            qr_value = prep.qr_data_piston
-            qr_value_housing = prep.qr_data_housing
-            post = post_model.objects.filter(qr_data_piston=qr_value).first()
-            
-        elif machine_type == 'op80':
-            # FIXED: Try multiple matching strategies for OP80
-            qr_value_piston = prep.qr_data_piston
-            qr_value_housing = prep.qr_data_housing
-            
-            # Try matching with qr_data_housing field first (most likely)
-            post = post_model.objects.filter(qr_data_housing=qr_value_housing).first()
-            
-            # If not found, try matching with qr_data_housing_new
-            if not post:
-                post = post_model.objects.filter(qr_data_housing_new=qr_value_housing).first()
-            
-            # If still not found, try matching with piston QR
-            if not post:
-                post = post_model.objects.filter(qr_data_housing=qr_value_piston).first()
-            
-            # Set the main qr_value to piston for consistency
-            qr_value = qr_value_piston
-            
-        else:
-            qr_value = prep.qr_data
-            post = post_model.objects.filter(qr_data=qr_value).first()
-        
-        # Determine overall status
-        if post:
-            overall_status = post.status
-            status_class = 'completed-ok' if post.status == 'OK' else 'completed-ng'
-            post_id = post.id
-            post_timestamp = post.timestamp
-            post_status = post.status
-        else:
-            overall_status = 'Pending'
-            status_class = 'in-progress'
-            post_id = None
-            post_timestamp = None
-            post_status = 'Pending'
-        
-        # Get gauge values if applicable
-        gauge_values = {}
-        if post and hasattr(post, 'value1'):
-            for i in range(1, 7):
-                val = getattr(post, f'value{i}', None)
-                if val is not None:
-                    gauge_values[f'value{i}'] = val
-        
-        # FIXED: Get model_name based on machine type
-        if machine_type == 'op80':
-            model_name_internal = getattr(prep, 'model_name_internal', 'N/A')
-            model_name_external = getattr(prep, 'model_name_external', 'N/A')
-            model_name = model_name_internal  # Use internal as primary
-        else:
-            model_name = getattr(prep, 'model_name', 'N/A')
-        
-        machine_name = getattr(prep, 'machine_name', 'N/A')
-        previous_machine_status = getattr(prep, 'previous_machine_status', '-')
-        
-        record = {
-            'prep_id': prep.id,
-            'prep_timestamp': prep.timestamp,
-            'prep_machine_name': machine_name,
-            'model_name': model_name,
-            'previous_machine_status': previous_machine_status,
-            'prep_status': 'OK',
-            'qr_code': qr_value if machine_type not in ['painting', 'op80'] else (qr_value_housing_prep if machine_type == 'painting' else qr_value_piston),
-            'post_id': post_id,
-            'post_timestamp': post_timestamp,
-            'post_status': post_status,
-            'overall_status': overall_status,
-            'status_class': status_class,
-            'gauge_values': gauge_values,
-            'sort_priority': 1 if post else 2,
-        }
-        
-        # Add additional fields for special machines
-        if machine_type == 'painting':
-            record['qr_housing_prep'] = qr_value_housing_prep
-            record['qr_housing_post'] = post.qr_data_housing if post else None
-            record['qr_piston_prep'] = qr_value_piston_prep
-            record['qr_piston_post'] = post.qr_data_piston if post else None
-            record['pre_status'] = prep.pre_status
-            record['model_name_housing'] = getattr(prep, 'model_name_housing', 'N/A')
-            record['model_name_piston'] = getattr(prep, 'model_name_piston', 'N/A')
-            
-        elif machine_type == 'lubrication':
-            record['qr_housing'] = qr_value_housing
-            record['model_name_piston'] = getattr(prep, 'model_name_piston', 'N/A')
-            record['model_name_housing'] = getattr(prep, 'model_name_housing', 'N/A')
-            
-        elif machine_type == 'op80':
-            record['qr_piston'] = qr_value_piston
-            record['qr_housing_prep'] = qr_value_housing
-            record['model_name_internal'] = model_name_internal
-            record['model_name_external'] = model_name_external
-            
-            if post:
-                record['qr_housing_post'] = post.qr_data_housing if hasattr(post, 'qr_data_housing') else None
-                record['qr_housing_new'] = post.qr_data_housing_new
-                record['match_status'] = post.match_status
-        
-        records.append(record)
+        records.append(build_machine_record(prep, machine_type))
     
     records.sort(key=lambda x: (x['sort_priority'], -x['prep_id']))
     return records
 
 
+def build_machine_record(prep, machine_type='standard'):
+    """Record for one prep row and its stored post pairing (prep.post)"""
+    post = prep.post
+    
+    # Determine QR code field based on machine type
+    if machine_type == 'painting':
+        qr_value_housing_prep = prep.qr_data_housing
+        qr_value_piston_prep = prep.qr_data_piston
+    
+    elif machine_type == 'lubrication':
+        qr_value = prep.qr_data_piston
+        qr_value_housing = prep.qr_data_housing
+    
+    elif machine_type == 'op80':
+        qr_value_piston = prep.qr_data_piston
+        qr_value_housing = prep.qr_data_housing
+    
+        # Set the main qr_value to piston for consistency
+        qr_value = qr_value_piston
+    
+    else:
+        qr_value = prep.qr_data
+    
+    # Determine overall status
+    if post:
+        overall_status = post.status
+        status_class = 'completed-ok' if post.status == 'OK' else 'completed-ng'
+        post_id = post.id
+        post_timestamp = post.timestamp
+        post_status = post.status
+    else:
+        overall_status = 'Pending'
+        status_class = 'in-progress'
+        post_id = None
+        post_timestamp = None
+        post_status = 'Pending'
+    
+    # Get gauge values if applicable
+    gauge_values = {}
+    if post and hasattr(post, 'value1'):
+        for i in range(1, 7):
+            val = getattr(post, f'value{i}', None)
+            if val is not None:
+                gauge_values[f'value{i}'] = val
+    
+    # FIXED: Get model_name based on machine type
+    if machine_type == 'op80':
+        model_name_internal = getattr(prep, 'model_name_internal', 'N/A')
+        model_name_external = getattr(prep, 'model_name_external', 'N/A')
+        model_name = model_name_internal  # Use internal as primary
+    else:
+        model_name = getattr(prep, 'model_name', 'N/A')
+    
+    machine_name = getattr(prep, 'machine_name', 'N/A')
+    previous_machine_status = getattr(prep, 'previous_machine_status', '-')
+    
+    record = {
+        'prep_id': prep.id,
+        'prep_timestamp': prep.timestamp,
+        'prep_machine_name': machine_name,
+        'model_name': model_name,
+        'previous_machine_status': previous_machine_status,
+        'prep_status': 'OK',
+        'qr_code': qr_value if machine_type not in ['painting', 'op80'] else (qr_value_housing_prep if machine_type == 'painting' else qr_value_piston),
+        'post_id': post_id,
+        'post_timestamp': post_timestamp,
+        'post_status': post_status,
+        'overall_status': overall_status,
+        'status_class': status_class,
+        'gauge_values': gauge_values,
+        'sort_priority': 1 if post else 2,
+    }
+    
+    # Add additional fields for special machines
+    if machine_type == 'painting':
+        record['qr_housing_prep'] = qr_value_housing_prep
+        record['qr_housing_post'] = post.qr_data_housing if post else None
+        record['qr_piston_prep'] = qr_value_piston_prep
+        record['qr_piston_post'] = post.qr_data_piston if post else None
+        record['pre_status'] = prep.pre_status
+        record['model_name_housing'] = getattr(prep, 'model_name_housing', 'N/A')
+        record['model_name_piston'] = getattr(prep, 'model_name_piston', 'N/A')
+    
+    elif machine_type == 'lubrication':
+        record['qr_housing'] = qr_value_housing
+        record['model_name_piston'] = getattr(prep, 'model_name_piston', 'N/A')
+        record['model_name_housing'] = getattr(prep, 'model_name_housing', 'N/A')
+    
+    elif machine_type == 'op80':
+        record['qr_piston'] = qr_value_piston
+        record['qr_housing_prep'] = qr_value_housing
+        record['model_name_internal'] = model_name_internal
+        record['model_name_external'] = model_name_external
+    
+        if post:
+            record['qr_housing_post'] = post.qr_data_housing if hasattr(post, 'qr_data_housing') else None
+            record['qr_housing_new'] = post.qr_data_housing_new
+            record['match_status'] = post.match_status
+    
+    return record
+
+
    
 
 
@@ -481,149 +470,90 @@ def get_assembly_machine_data(prep_model, post_model):
     prep_records = prep_model.objects.all()[:100]
     
     for prep in prep_records:
-        qr_internal = prep.qr_data_internal
-        
-        model_name_internal = getattr(prep, 'model_name_internal', 'N/A')
-        model_name_external = getattr(prep, 'model_name_external', 'N/A')
-        model_name_housing = getattr(prep, 'model_name_housing', 'N/A')
-        previous_machine_internal_status = getattr(prep, 'previous_machine_internal_status', '-')
-        previous_machine_housing_status = getattr(prep, 'previous_machine_housing_status', '-')
-        
-        if prep.qr_data_external and prep.qr_data_housing:
-            overall_status = prep.status or 'COMPLETE'
-            status_class = 'completed-ok' if prep.status == 'OK' else 'completed-ng'
-            post_id = prep.id
-            qr_external = prep.qr_data_external
-            qr_housing = prep.qr_data_housing
-            post_timestamp = prep.timestamp_external or prep.timestamp_internal
-            post_status = prep.status or 'OK'
-        else:
-            overall_status = 'Pending'
-            status_class = 'in-progress'
-            post_id = None
-            qr_external = '-'
-            qr_housing = '-'
-            post_timestamp = None
-            post_status = 'Pending'
-        
-        records.append({
-            'prep_id': prep.id,
-            'prep_timestamp': prep.timestamp_internal,
-            'prep_machine_name': 'Assembly',
-            'prep_status': 'OK',
-            'qr_code': qr_internal,
-            'qr_external': qr_external,
-            'qr_housing': qr_housing,
-            'model_name_internal': model_name_internal,
-            'model_name_external': model_name_external,
-            'model_name_housing': model_name_housing,
-            'previous_machine_internal_status': previous_machine_internal_status,
-            'previous_machine_housing_status': previous_machine_housing_status,
-            'post_id': post_id,
-            'post_timestamp': post_timestamp,
-            'post_status': post_status,
-            'overall_status': overall_status,
-            'status_class': status_class,
-            'sort_priority': 1 if post_id else 2,
-        })
+        records.append(build_assembly_record(prep))
     
     records.sort(key=lambda x: (x['sort_priority'], -x['prep_id']))
     return records
+
+
+def build_assembly_record(prep):
+    """Record for one OP40 row (internal, external and housing parts share the row)"""
+    qr_internal = prep.qr_data_internal
+    
+    model_name_internal = getattr(prep, 'model_name_internal', 'N/A')
+    model_name_external = getattr(prep, 'model_name_external', 'N/A')
+    model_name_housing = getattr(prep, 'model_name_housing', 'N/A')
+    previous_machine_internal_status = getattr(prep, 'previous_machine_internal_status', '-')
+    previous_machine_housing_status = getattr(prep, 'previous_machine_housing_status', '-')
+    
+    if prep.qr_data_external and prep.qr_data_housing:
+        overall_status = prep.status or 'COMPLETE'
+        status_class = 'completed-ok' if prep.status == 'OK' else 'completed-ng'
+        post_id = prep.id
+        qr_external = prep.qr_data_external
+        qr_housing = prep.qr_data_housing
+        post_timestamp = prep.timestamp_external or prep.timestamp_internal
+        post_status = prep.status or 'OK'
+    else:
+        overall_status = 'Pending'
+        status_class = 'in-progress'
+        post_id = None
+        qr_external = '-'
+        qr_housing = '-'
+        post_timestamp = None
+        post_status = 'Pending'
+    
+    return {
+        'prep_id': prep.id,
+        'prep_timestamp': prep.timestamp_internal,
+        'prep_machine_name': 'Assembly',
+        'prep_status': 'OK',
+        'qr_code': qr_internal,
+        'qr_external': qr_external,
+        'qr_housing': qr_housing,
+        'model_name_internal': model_name_internal,
+        'model_name_external': model_name_external,
+        'model_name_housing': model_name_housing,
+        'previous_machine_internal_status': previous_machine_internal_status,
+        'previous_machine_housing_status': previous_machine_housing_status,
+        'post_id': post_id,
+        'post_timestamp': post_timestamp,
+        'post_status': post_status,
+        'overall_status': overall_status,
+        'status_class': status_class,
+        'sort_priority': 1 if post_id else 2,
+    }
    
 
 
 
-def parse_timestamp_to_datetime(timestamp):
-    """Convert timestamp string to datetime object"""
-    if timestamp is None:
-        return None
-    
-    if hasattr(timestamp, 'strftime'):
-        return timestamp
-    
-    if isinstance(timestamp, str):
-        # ADD THIS FIRST - DD/MM/YYYY HH:MM:SS (24-hour, no comma)
-        try:
-            return datetime.strptime(timestamp, '%d/%m/%Y %H:%M:%S')
-        except:
-            pass
-        
-        try:
-            return datetime.strptime(timestamp, '%d/%m/%Y, %I:%M:%S %p')
-        except:
-            pass
-        
-        try:
-            return datetime.strptime(timestamp, '%m/%d/%Y, %I:%M:%S %p')
-        except:
-            pass
-        
-        formats = [
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%d %H:%M:%S.%f',
-            '%d-%m-%Y %H:%M:%S',
-            '%m-%d-%Y %H:%M:%S',
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(timestamp, fmt)
-            except:
-                continue
-        
-        try:
-            return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-        except:
-            pass
-    
-    return None
+def get_activity_model(config):
+    """Table whose newest row tells whether a machine is active (washing Unload only has a post table)"""
+    if config.get('type') == 'washing' and config.get('operation') == 'unload':
+        return config['post_model']
+    return config['prep_model']
 
-def check_machine_status(prep_model):
-    """Check if machine is active"""
-    threshold = timezone.now() - timedelta(minutes=21)
-    
-    try:
-        latest_record = prep_model.objects.first()
-        if not latest_record:
-            return False
-        
-        try:
-            timestamp = latest_record.timestamp_internal
-            field_name = 'timestamp_internal'
-        except AttributeError:
-            timestamp = latest_record.timestamp
-            field_name = 'timestamp'
-        
-        if hasattr(timestamp, 'timestamp'):
-            if timezone.is_naive(timestamp):
-                timestamp = timezone.make_aware(timestamp)
-            
-            is_active = timestamp >= threshold
-            return is_active
-        
-        if isinstance(timestamp, str):
-            parsed_dt = parse_timestamp_to_datetime(timestamp)
-            
-            if parsed_dt:
-                if timezone.is_naive(parsed_dt):
-                    parsed_dt = timezone.make_aware(parsed_dt)
-                
-                is_active = parsed_dt >= threshold
-                return is_active
-            else:
-                return False
-        
-        return False
-        
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
+
+activity_tracker = ActivityTracker([
+    get_activity_model(config)
+    for config in MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]
+    if get_activity_model(config)
+])
+
+
+def check_machine_status(config):
+    """Check if machine is active: its newest row is younger than config['inactive_after'] minutes"""
+    model = get_activity_model(config)
+    if not model:
         return False
+    
+    minutes = config.get('inactive_after', ACTIVITY_THRESHOLD_MINUTES)
+    return activity_tracker.is_active(model._meta.db_table, minutes)
 
 
 def get_latest_machine_record(prep_model, post_model, machine_type='standard'):
     """Get the latest record for a machine - FIXED OP80"""
-    latest_prep = prep_model.objects.first()
+    latest_prep = prep_model.objects.select_related('post').first()
     if not latest_prep:
         return None
     
@@ -640,36 +570,23 @@ def get_latest_machine_record(prep_model, post_model, machine_type='standard'):
     if machine_type == 'painting':
         qr_value = latest_prep.qr_data_housing
         qr_piston = latest_prep.qr_data_piston
-        post = post_model.objects.filter(qr_data_housing=qr_value).first()
         model_name_housing = getattr(latest_prep, 'model_name_housing', 'N/A')
         model_name_piston = getattr(latest_prep, 'model_name_piston', 'N/A')
         
     elif machine_type == 'lubrication':
         qr_value = latest_prep.qr_data_piston
         qr_housing = latest_prep.qr_data_housing
-        post = post_model.objects.filter(qr_data_piston=qr_value).first()
         model_name_piston = getattr(latest_prep, 'model_name_piston', 'N/A')
         model_name_housing = getattr(latest_prep, 'model_name_housing', 'N/A')
         
     elif machine_type == 'op80':
-        # FIXED: Try multiple matching strategies
         qr_value = latest_prep.qr_data_piston
         qr_housing = latest_prep.qr_data_housing
         
-        # Try matching with qr_data_housing field first
-        post = post_model.objects.filter(qr_data_housing=qr_housing).first()
-        
-        # If not found, try qr_data_housing_new
-        if not post:
-            post = post_model.objects.filter(qr_data_housing_new=qr_housing).first()
-        
-        # If still not found, try matching with piston QR
-        if not post:
-            post = post_model.objects.filter(qr_data_housing=qr_value).first()
-        
     else:
         qr_value = latest_prep.qr_data
-        post = post_model.objects.filter(qr_data=qr_value).first()
+    
+    post = latest_prep.post
     
     gauge_values = {}
     if post and hasattr(post, 'value1'):
@@ -761,31 +678,11 @@ def dashboard_view(request):
             operation = config.get('operation', 'load')
             
             if operation == 'load' and config['prep_model']:
-                is_active = check_machine_status(config['prep_model'])
+                is_active = check_machine_status(config)
                 latest_record = get_latest_washing_load_record(config['prep_model'])
                 counts = get_washing_counts(config['prep_model'], None, 'load')
             elif operation == 'unload' and config['post_model']:
-                try:
-                    latest_post = config['post_model'].objects.first()
-                    if latest_post:
-                        threshold = timezone.now() - timedelta(minutes=21)
-                        timestamp = latest_post.timestamp
-                        if hasattr(timestamp, 'timestamp'):
-                            if timezone.is_naive(timestamp):
-                                timestamp = timezone.make_aware(timestamp)
-                            is_active = timestamp >= threshold
-                        else:
-                            parsed_dt = parse_timestamp_to_datetime(timestamp)
-                            if parsed_dt:
-                                if timezone.is_naive(parsed_dt):
-                                    parsed_dt = timezone.make_aware(parsed_dt)
-                                is_active = parsed_dt >= threshold
-                            else:
-                                is_active = False
-                    else:
-                        is_active = False
-                except:
-                    is_active = False
+                is_active = check_machine_status(config)
                 
                 latest_record = get_latest_washing_unload_record(config['post_model'])
                 counts = get_washing_counts(None, config['post_model'], 'unload')
@@ -795,7 +692,7 @@ def dashboard_view(request):
                 counts = {'ok': 0, 'ng': 0, 'pending': 0}
         else:
             # Regular machines
-            is_active = check_machine_status(config['prep_model'])
+            is_active = check_machine_status(config)
             
             machine_type = 'standard'
             if 'Painting' in config['name']:
@@ -820,7 +717,7 @@ def dashboard_view(request):
         })
     
     for config in ASSEMBLY_CONFIGS:
-        is_active = check_machine_status(config['prep_model'])
+        is_active = check_machine_status(config)
         latest_record = get_latest_assembly_record(config['prep_model'], config['post_model'])
         counts = get_assembly_counts(config['prep_model'])
         
@@ -838,7 +735,7 @@ def dashboard_view(request):
         })
     
     # Add OP80
-    is_active = check_machine_status(OP80_CONFIG['prep_model'])
+    is_active = check_machine_status(OP80_CONFIG)
     latest_record = get_latest_machine_record(
         OP80_CONFIG['prep_model'], 
         OP80_CONFIG['post_model'], 
@@ -907,7 +804,7 @@ def machine_detail_view(request, machine_name):
             machine_type = 'op80'
         records = get_machine_data(config['prep_model'], config['post_model'], machine_type)
     
-    is_active = check_machine_status(config['prep_model']) if config['prep_model'] else False
+    is_active = check_machine_status(config)
     
     records_json = []
     for record in records:
@@ -965,25 +862,11 @@ def machine_data_api(request, machine_name):
         
         if operation == 'load':
             records = get_washing_load_data(config['prep_model'])
-            is_active = check_machine_status(config['prep_model']) if config['prep_model'] else False
+            is_active = check_machine_status(config)
             counts = get_washing_counts(config['prep_model'], None, 'load')
         else:
             records = get_washing_unload_data(config['post_model'])
-            try:
-                latest_post = config['post_model'].objects.first()
-                if latest_post:
-                    threshold = timezone.now() - timedelta(minutes=21)
-                    timestamp = latest_post.timestamp
-                    if hasattr(timestamp, 'timestamp'):
-                        if timezone.is_naive(timestamp):
-                            timestamp = timezone.make_aware(timestamp)
-                        is_active = timestamp >= threshold
-                    else:
-                        is_active = False
-                else:
-                    is_active = False
-            except:
-                is_active = False
+            is_active = check_machine_status(config)
             counts = get_washing_counts(None, config['post_model'], 'unload')
         
         for record in records:
@@ -1021,7 +904,7 @@ def machine_data_api(request, machine_name):
         records = get_machine_data(config['prep_model'], config['post_model'], machine_type)
         counts = get_machine_counts(config['prep_model'], config['post_model'], machine_type)
     
-    is_active = check_machine_status(config['prep_model'])
+    is_active = check_machine_status(config)
     
     for record in records:
         if hasattr(record['prep_timestamp'], 'isoformat'):
@@ -1056,7 +939,7 @@ def search_qr_code(request):
         if config.get('type') == 'washing':
             operation = config.get('operation', 'load')
             if operation == 'load' and config['prep_model']:
-                prep_records = config['prep_model'].objects.filter(qr_data__icontains=qr_code)
+                prep_records = config['prep_model'].objects.filter(qr_search_q(qr_code, 'qr_data', model=config['prep_model']))
                 if prep_records.exists():
                     results.append({
                         'machine': config['name'],
@@ -1065,7 +948,7 @@ def search_qr_code(request):
                         'postprocessing_count': 0,
                     })
             elif operation == 'unload' and config['post_model']:
-                post_records = config['post_model'].objects.filter(qr_data__icontains=qr_code)
+                post_records = config['post_model'].objects.filter(qr_search_q(qr_code, 'qr_data', model=config['post_model']))
                 if post_records.exists():
                     results.append({
                         'machine': config['name'],
@@ -1077,22 +960,22 @@ def search_qr_code(request):
         
         if 'Painting' in config['name']:
             prep_records = config['prep_model'].objects.filter(
-                Q(qr_data_housing__icontains=qr_code) | Q(qr_data_piston__icontains=qr_code)
+                qr_search_q(qr_code, 'qr_data_housing', 'qr_data_piston', model=config['prep_model'])
             )
-            post_records = config['post_model'].objects.filter(qr_data_housing__icontains=qr_code)
+            post_records = config['post_model'].objects.filter(qr_search_q(qr_code, 'qr_data_housing', model=config['post_model']))
         elif 'Lubrication' in config['name']:
             prep_records = config['prep_model'].objects.filter(
-                Q(qr_data_piston__icontains=qr_code) | Q(qr_data_housing__icontains=qr_code)
+                qr_search_q(qr_code, 'qr_data_piston', 'qr_data_housing', model=config['prep_model'])
             )
-            post_records = config['post_model'].objects.filter(qr_data_piston__icontains=qr_code)
+            post_records = config['post_model'].objects.filter(qr_search_q(qr_code, 'qr_data_piston', model=config['post_model']))
         elif 'Oring_leak' in config['name']:
             prep_records = config['prep_model'].objects.filter(
-                Q(qr_data_piston__icontains=qr_code) | Q(qr_data_housing__icontains=qr_code)
+                qr_search_q(qr_code, 'qr_data_piston', 'qr_data_housing', model=config['prep_model'])
             )
-            post_records = config['post_model'].objects.filter(qr_data_housing_new__icontains=qr_code)
+            post_records = config['post_model'].objects.filter(qr_search_q(qr_code, 'qr_data_housing_new', model=config['post_model']))
         else:
-            prep_records = config['prep_model'].objects.filter(qr_data__icontains=qr_code)
-            post_records = config['post_model'].objects.filter(qr_data__icontains=qr_code) if config['post_model'] else []
+            prep_records = config['prep_model'].objects.filter(qr_search_q(qr_code, 'qr_data', model=config['prep_model']))
+            post_records = config['post_model'].objects.filter(qr_search_q(qr_code, 'qr_data', model=config['post_model'])) if config['post_model'] else []
         
         if prep_records.exists() or (post_records and post_records.exists()):
             results.append({
@@ -1104,9 +987,7 @@ def search_qr_code(request):
     
     for config in ASSEMBLY_CONFIGS:
         prep_records = config['prep_model'].objects.filter(
-            Q(qr_data_internal__icontains=qr_code) |
-            Q(qr_data_external__icontains=qr_code) |
-            Q(qr_data_housing__icontains=qr_code)
+            qr_search_q(qr_code, 'qr_data_internal', 'qr_data_external', 'qr_data_housing', model=config['prep_model'])
         )
         
         if prep_records.exists():
@@ -1118,9 +999,9 @@ def search_qr_code(request):
             })
     
     prep_records = OP80_CONFIG['prep_model'].objects.filter(
-        Q(qr_data_piston__icontains=qr_code) | Q(qr_data_housing__icontains=qr_code)
+        qr_search_q(qr_code, 'qr_data_piston', 'qr_data_housing', model=OP80_CONFIG['prep_model'])
     )
-    post_records = OP80_CONFIG['post_model'].objects.filter(qr_data_housing_new__icontains=qr_code)
+    post_records = OP80_CONFIG['post_model'].objects.filter(qr_search_q(qr_code, 'qr_data_housing_new', model=OP80_CONFIG['post_model']))
     
     if prep_records.exists() or post_records.exists():
         results.append({
@@ -1156,32 +1037,24 @@ def export_machine_data(request, machine_name):
     if not config:
         return HttpResponse('Machine not found', status=404)
     
-    if is_assembly:
-        records = get_assembly_machine_data(config['prep_model'], config['post_model'])
-    elif config.get('type') == 'washing':
-        operation = config.get('operation', 'load')
-        if operation == 'load':
-            records = get_washing_load_data(config['prep_model'])
-        else:
-            records = get_washing_unload_data(config['post_model'])
-    else:
-        machine_type = 'standard'
-        if 'Painting' in config['name']:
-            machine_type = 'painting'
-        elif 'Lubrication' in config['name']:
-            machine_type = 'lubrication'
-        records = get_machine_data(config['prep_model'], config['post_model'], machine_type)
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{machine_name}_data.csv"'
-    
-    writer = csv.writer(response)
+    try:
+        start_date, end_date = parse_export_range(request)
+    except ValueError:
+        return HttpResponse('Invalid date, use YYYY-MM-DD', status=400)
     
+    rows = machine_export_rows(config, is_assembly, start_date, end_date)
+    return csv_response(request, rows, f'{machine_name}_data')
+
+
+def machine_export_rows(config, is_assembly, start_date=None, end_date=None):
+    """CSV header and one row per station record in the date range (all history by default), newest first"""
     if is_assembly:
-        writer.writerow(['ID', 'QR Internal', 'QR External', 'QR Housing', 'Model Internal', 'Model External', 'Model Housing',
-                        'Prep Timestamp', 'Post Timestamp', 'Status', 'Overall Status', 'Prev Machine Internal', 'Prev Machine Housing'])
-        for record in records:
-            writer.writerow([
+        yield ['ID', 'QR Internal', 'QR External', 'QR Housing', 'Model Internal', 'Model External', 'Model Housing',
+               'Prep Timestamp', 'Post Timestamp', 'Status', 'Overall Status', 'Prev Machine Internal', 'Prev Machine Housing']
+        model = config['prep_model']
+        for prep in model.objects.filter(event_time_q(model, start_date, end_date)).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            record = build_assembly_record(prep)
+            yield [
                 record['prep_id'], record['qr_code'], record.get('qr_external', '-'),
                 record.get('qr_housing', '-'), 
                 record.get('model_name_internal', 'N/A'), record.get('model_name_external', 'N/A'), record.get('model_name_housing', 'N/A'),
@@ -1189,32 +1062,44 @@ def export_machine_data(request, machine_name):
                 record['post_timestamp'] or '-', record['post_status'] or '-',
                 record['overall_status'],
                 record.get('previous_machine_internal_status', '-'), record.get('previous_machine_housing_status', '-'),
-            ])
-    else:
-        writer.writerow(['ID', 'QR Code', 'Model Name', 'Prep Timestamp', 'Post Timestamp', 
-                        'Status', 'Overall Status', 'Previous Machine Status', 'Gauge Values'])
-        for record in records:
-            writer.writerow([
-                record.get('prep_id') or record.get('post_id'), record['qr_code'], record.get('model_name', 'N/A'),
-                record.get('prep_timestamp') or '-',
-                record.get('post_timestamp') or '-', record.get('post_status') or '-',
-                record['overall_status'], record.get('previous_machine_status', '-'), record.get('gauge_values', '-') or '-',
-            ])
+            ]
+        return
     
-    return response
+    yield ['ID', 'QR Code', 'Model Name', 'Prep Timestamp', 'Post Timestamp', 
+           'Status', 'Overall Status', 'Previous Machine Status', 'Gauge Values']
+    
+    if config.get('type') == 'washing':
+        if config.get('operation', 'load') == 'load':
+            model, build_record = config['prep_model'], build_washing_load_record
+        else:
+            model, build_record = config['post_model'], build_washing_unload_record
+        if not model:
+            return
+        rows = model.objects.filter(event_time_q(model, start_date, end_date))
+    else:
+        machine_type = 'standard'
+        if 'Painting' in config['name']:
+            machine_type = 'painting'
+        elif 'Lubrication' in config['name']:
+            machine_type = 'lubrication'
+        model = config['prep_model']
+        rows = model.objects.filter(event_time_q(model, start_date, end_date)).select_related('post')
+        build_record = lambda prep: build_machine_record(prep, machine_type)
+    
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        record = build_record(row)
+        yield [
+            record.get('prep_id') or record.get('post_id'), record['qr_code'], record.get('model_name', 'N/A'),
+            record.get('prep_timestamp') or '-',
+            record.get('post_timestamp') or '-', record.get('post_status') or '-',
+            record['overall_status'], record.get('previous_machine_status', '-'), record.get('gauge_values', '-') or '-',
+        ]
 
 
 # ============================================================================
 # REAL-TIME STREAMING (SSE) - UPDATED FOR WASHING MACHINES AND COUNTS
 # ============================================================================
 
-def get_latest_record_count(model):
-    """Get the count of records for change detection"""
-    if not model:
-        return 0
-    return model.objects.count()
-
-
 def get_dashboard_summary():
     """Get summary data for all machines"""
     machines_data = []
@@ -1224,25 +1109,11 @@ def get_dashboard_summary():
             operation = config.get('operation', 'load')
             
             if operation == 'load' and config['prep_model']:
-                is_active = check_machine_status(config['prep_model'])
+                is_active = check_machine_status(config)
                 latest_record = get_latest_washing_load_record(config['prep_model'])
                 counts = get_washing_counts(config['prep_model'], None, 'load')
             elif operation == 'unload' and config['post_model']:
-                try:
-                    latest_post = config['post_model'].objects.first()
-                    if latest_post:
-                        threshold = timezone.now() - timedelta(minutes=21)
-                        timestamp = latest_post.timestamp
-                        if hasattr(timestamp, 'timestamp'):
-                            if timezone.is_naive(timestamp):
-                                timestamp = timezone.make_aware(timestamp)
-                            is_active = timestamp >= threshold
-                        else:
-                            is_active = False
-                    else:
-                        is_active = False
-                except:
-                    is_active = False
+                is_active = check_machine_status(config)
                 
                 latest_record = get_latest_washing_unload_record(config['post_model'])
                 counts = get_washing_counts(None, config['post_model'], 'unload')
@@ -1251,7 +1122,7 @@ def get_dashboard_summary():
                 latest_record = None
                 counts = {'ok': 0, 'ng': 0, 'pending': 0}
         else:
-            is_active = check_machine_status(config['prep_model'])
+            is_active = check_machine_status(config)
             machine_type = 'standard'
             if 'Painting' in config['name']:
                 machine_type = 'painting'
@@ -1274,7 +1145,7 @@ def get_dashboard_summary():
         })
     
     for config in ASSEMBLY_CONFIGS:
-        is_active = check_machine_status(config['prep_model'])
+        is_active = check_machine_status(config)
         latest_record = get_latest_assembly_record(config['prep_model'], config['post_model'])
         counts = get_assembly_counts(config['prep_model'])
         
@@ -1291,7 +1162,7 @@ def get_dashboard_summary():
             'counts': counts,
         })
     
-    is_active = check_machine_status(OP80_CONFIG['prep_model'])
+    is_active = check_machine_status(OP80_CONFIG)
     latest_record = get_latest_machine_record(
         OP80_CONFIG['prep_model'], 
         OP80_CONFIG['post_model'], 
@@ -1299,230 +1170,248 @@ def get_dashboard_summary():
     )
     counts = get_machine_counts(OP80_CONFIG['prep_model'], OP80_CONFIG['post_model'], 'op80')
     
-    machines_data.append({
-        'name': OP80_CONFIG['name'],
-        'display_name': OP80_CONFIG.get('display_name', OP80_CONFIG['name']),
-        'ip': OP80_CONFIG.get('ip', 'N/A'),
-        'op_code': OP80_CONFIG.get('op_code', 'N/A'),
-        'machine_id': 'op80_leak_test',
+    machines_data.append({
+        'name': OP80_CONFIG['name'],
+        'display_name': OP80_CONFIG.get('display_name', OP80_CONFIG['name']),
+        'ip': OP80_CONFIG.get('ip', 'N/A'),
+        'op_code': OP80_CONFIG.get('op_code', 'N/A'),
+        'machine_id': 'op80_leak_test',
+        'is_active': is_active,
+        'latest_record': latest_record,
+        'type': 'op80',
+        'counts': counts,
+    })
+    
+    return machines_data
+
+
+# ============================================================================
+# SSE BROADCAST (one snapshot per change, shared by every subscriber)
+# ============================================================================
+
+def get_stream_config(machine_name):
+    """Machine config and assembly flag for a stream machine id"""
+    for m in MACHINE_CONFIGS:
+        machine_id = m['name'].lower().replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_')
+        if machine_id == machine_name:
+            return m, False
+    
+    for m in ASSEMBLY_CONFIGS:
+        if m['name'].lower().replace(' ', '_') == machine_name:
+            return m, True
+            
+    if machine_name == 'op80_leak_test':
+        return OP80_CONFIG, False
+    
+    return None, False
+
+
+def get_dashboard_stream_payload():
+    """Payload pushed on the dashboard channel"""
+    machines_data = get_dashboard_summary()
+    
+    for machine in machines_data:
+        if machine.get('latest_record') and machine['latest_record'].get('prep_timestamp'):
+            if hasattr(machine['latest_record']['prep_timestamp'], 'isoformat'):
+                machine['latest_record']['prep_timestamp'] = machine['latest_record']['prep_timestamp'].isoformat()
+    
+    return {
+        'type': 'update',
+        'machines': machines_data
+    }
+
+
+def get_stream_machine_type(config):
+    """machine_type of a prep/post paired machine"""
+    if 'Painting' in config['name']:
+        return 'painting'
+    elif 'Lubrication' in config['name']:
+        return 'lubrication'
+    elif 'Oring_leak' in config['name']:
+        return 'op80'
+    return 'standard'
+
+
+def completed_assembly_q(records):
+    """Pending OP40 rows of a stream window whose external and housing parts have since been added"""
+    pending = [row_id for row_id, record in records.items() if record['post_id'] is None]
+    return (
+        Q(id__in=pending)
+        & ~Q(qr_data_external__isnull=True) & ~Q(qr_data_external='')
+        & ~Q(qr_data_housing__isnull=True) & ~Q(qr_data_housing='')
+    )
+
+
+def get_record_window(config, is_assembly):
+    """Incrementally refreshed record table of a machine channel (see record_window.py)"""
+    completed_first = lambda record: (record['sort_priority'], -record['prep_id'])
+    
+    if config.get('type') == 'washing':
+        if config.get('operation', 'load') == 'load':
+            return RecordWindow(config['prep_model'].objects.all(), build_washing_load_record)
+        return RecordWindow(config['post_model'].objects.all(), build_washing_unload_record)
+    
+    if is_assembly:
+        return RecordWindow(
+            config['prep_model'].objects.all(), build_assembly_record,
+            changed_q=completed_assembly_q, sort_key=completed_first,
+        )
+    
+    machine_type = get_stream_machine_type(config)
+    return RecordWindow(
+        config['prep_model'].objects.select_related('post'),
+        lambda prep: build_machine_record(prep, machine_type),
+        changed_q=late_post_q, sort_key=completed_first,
+    )
+
+
+def get_machine_stream_payload(config, is_assembly, window=None):
+    """Payload pushed on a machine:<id> channel - UPDATED for washing machines"""
+    if config.get('type') == 'washing':
+        operation = config.get('operation', 'load')
+        machine_type = 'washing'
+        
+        if operation == 'load':
+            records = window.refresh() if window else get_washing_load_data(config['prep_model'])
+            is_active = check_machine_status(config)
+            counts = get_washing_counts(config['prep_model'], None, 'load')
+        else:
+            records = window.refresh() if window else get_washing_unload_data(config['post_model'])
+            is_active = check_machine_status(config)
+            counts = get_washing_counts(None, config['post_model'], 'unload')
+    
+    elif is_assembly:
+        records = window.refresh() if window else get_assembly_machine_data(config['prep_model'], config['post_model'])
+        machine_type = 'assembly'
+        is_active = check_machine_status(config)
+        counts = get_assembly_counts(config['prep_model'])
+    else:
+        machine_type = get_stream_machine_type(config)
+        records = window.refresh() if window else get_machine_data(config['prep_model'], config['post_model'], machine_type)
+        is_active = check_machine_status(config)
+        counts = get_machine_counts(config['prep_model'], config['post_model'], machine_type)
+    
+    for record in records:
+        if record.get('prep_timestamp') and hasattr(record['prep_timestamp'], 'isoformat'):
+            record['prep_timestamp'] = record['prep_timestamp'].isoformat()
+        if record.get('post_timestamp') and hasattr(record['post_timestamp'], 'isoformat'):
+            record['post_timestamp'] = record['post_timestamp'].isoformat()
+    
+    response_data = {
+        'type': 'update',
+        'machine_name': config['name'],
+        'display_name': config.get('display_name', config['name']),
+        'ip': config.get('ip', 'N/A'),
+        'op_code': config.get('op_code', 'N/A'),
+        'machine_type': machine_type,
         'is_active': is_active,
-        'latest_record': latest_record,
-        'type': 'op80',
+        'records': records,
+        'is_assembly': is_assembly,
         'counts': counts,
-    })
+    }
     
-    return machines_data
+    if config.get('type') == 'washing':
+        response_data['operation'] = config.get('operation', 'load')
+    
+    return response_data
 
 
-def sse_dashboard_stream(request):
-    """Server-Sent Events stream for dashboard updates"""
+def get_record_key(record):
+    """Row key used by machine stream patches (washing unload rows only have a post id)"""
+    return record['prep_id'] if record.get('prep_id') is not None else record.get('post_id')
+
+
+def diff_dashboard_payload(old, new):
+    """Dashboard patch: only the machines whose summary changed"""
+    return diff_snapshot(old, new, 'machines', lambda machine: machine['machine_id'])
+
+
+def diff_machine_payload(old, new):
+    """Machine patch: changed counters/flags plus new and changed rows keyed by prep_id"""
+    return diff_snapshot(old, new, 'records', get_record_key)
+
+
+def get_stream_channel(channel):
+    """Tables to follow, snapshot builder and differ for a broadcast channel ('dashboard' or 'machine:<id>')"""
+    if channel == 'dashboard':
+        return (
+            get_station_tables(MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]),
+            get_dashboard_stream_payload,
+            diff_dashboard_payload,
+        )
     
-    def event_stream():
-        last_counts = {}
-        
-        for config in MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]:
-            if config.get('prep_model'):
-                prep_table = config['prep_model']._meta.db_table
-                last_counts[prep_table] = get_latest_record_count(config['prep_model'])
-            if config.get('post_model'):
-                post_table = config['post_model']._meta.db_table
-                last_counts[post_table] = get_latest_record_count(config['post_model'])
-        
-        while True:
-            try:
-                changed = False
-                for config in MACHINE_CONFIGS + ASSEMBLY_CONFIGS + [OP80_CONFIG]:
-                    if config.get('prep_model'):
-                        prep_table = config['prep_model']._meta.db_table
-                        current_prep_count = get_latest_record_count(config['prep_model'])
-                        
-                        if current_prep_count != last_counts.get(prep_table, 0):
-                            changed = True
-                            last_counts[prep_table] = current_prep_count
-                    
-                    if config.get('post_model'):
-                        post_table = config['post_model']._meta.db_table
-                        current_post_count = get_latest_record_count(config['post_model'])
-                        
-                        if current_post_count != last_counts.get(post_table, 0):
-                            changed = True
-                            last_counts[post_table] = current_post_count
-                
-                if changed:
-                    machines_data = get_dashboard_summary()
-                    
-                    for machine in machines_data:
-                        if machine.get('latest_record') and machine['latest_record'].get('prep_timestamp'):
-                            if hasattr(machine['latest_record']['prep_timestamp'], 'isoformat'):
-                                machine['latest_record']['prep_timestamp'] = machine['latest_record']['prep_timestamp'].isoformat()
-                    
-                    data = json.dumps({
-                        'type': 'update',
-                        'machines': machines_data
-                    }, cls=DjangoJSONEncoder)
-                    
-                    yield f"data: {data}\n\n"
-                
-                yield f": heartbeat\n\n"
-                time.sleep(2)
-                
-            except GeneratorExit:
-                break
-            except Exception as e:
-                print(f"SSE Error: {e}")
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
-                time.sleep(5)
+    if channel.startswith('machine:'):
+        config, is_assembly = get_stream_config(channel[len('machine:'):])
+        if config:
+            window = get_record_window(config, is_assembly)
+            return (
+                get_station_tables([config]),
+                lambda: get_machine_stream_payload(config, is_assembly, window),
+                diff_machine_payload,
+            )
+    
+    return None
+
+
+stream_hub = BroadcastHub(get_stream_channel)
+
+
+# Idle ASGI streams send a comment this often to keep proxies from closing them
+ASYNC_HEARTBEAT_INTERVAL = 15
+
+
+def format_event(event):
+    """SSE text for a hub event; idle ticks become a heartbeat comment"""
+    if event is None:
+        return ": heartbeat\n\n"
+    event_id, data = event
+    return f"id: {event_id}\ndata: {data}\n\n"
+
+
+async def async_event_stream(channel, last_event_id=None):
+    async for event in stream_hub.subscribe_async(channel, timeout=ASYNC_HEARTBEAT_INTERVAL, last_event_id=last_event_id):
+        yield format_event(event)
+
+
+def sync_event_stream(channel, last_event_id=None):
+    subscription = stream_hub.subscribe(channel, last_event_id=last_event_id)
+    try:
+        for event in subscription:
+            yield format_event(event)
+    finally:
+        subscription.close()
+
+
+def sse_response(request, channel):
+    """Stream a broadcast channel as Server-Sent Events, resuming after Last-Event-ID"""
+    # Browsers send the header on automatic reconnects; the dashboard JS passes
+    # it as a parameter when it opens a new EventSource itself
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    
+    if isinstance(request, ASGIRequest):
+        stream = async_event_stream(channel, last_event_id)
+    else:
+        # WSGI servers (runserver, waitress) can only serve a blocking iterator
+        stream = sync_event_stream(channel, last_event_id)
     
-    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
     response['Cache-Control'] = 'no-cache'
     response['X-Accel-Buffering'] = 'no'
     return response
 
 
-def sse_machine_stream(request, machine_name):
+async def sse_dashboard_stream(request):
+    """Server-Sent Events stream for dashboard updates"""
+    return sse_response(request, 'dashboard')
+
+
+async def sse_machine_stream(request, machine_name):
     """Server-Sent Events stream for specific machine updates - UPDATED for washing machines"""
-    
-    config = None
-    is_assembly = False
-    
-    for m in MACHINE_CONFIGS:
-        machine_id = m['name'].lower().replace(' ', '_').replace('(', '').replace(')', '').replace('-', '_')
-        if machine_id == machine_name:
-            config = m
-            break
-    
-    if not config:
-        for m in ASSEMBLY_CONFIGS:
-            if m['name'].lower().replace(' ', '_') == machine_name:
-                config = m
-                is_assembly = True
-                break
-            
-    if not config and machine_name == 'op80_leak_test':
-        config = OP80_CONFIG
-    
+    config, is_assembly = get_stream_config(machine_name)
     if not config:
         return StreamingHttpResponse("Machine not found", status=404)
     
-    def event_stream():
-        # Handle washing machines separately for counting
-        if config.get('type') == 'washing':
-            operation = config.get('operation', 'load')
-            if operation == 'load':
-                last_prep_count = get_latest_record_count(config['prep_model']) if config['prep_model'] else 0
-                last_post_count = 0
-            else:
-                last_prep_count = 0
-                last_post_count = get_latest_record_count(config['post_model']) if config['post_model'] else 0
-        else:
-            last_prep_count = get_latest_record_count(config.get('prep_model'))
-            last_post_count = get_latest_record_count(config.get('post_model'))
-        
-        while True:
-            try:
-                if config.get('type') == 'washing':
-                    operation = config.get('operation', 'load')
-                    if operation == 'load':
-                        current_prep_count = get_latest_record_count(config['prep_model']) if config['prep_model'] else 0
-                        current_post_count = 0
-                    else:
-                        current_prep_count = 0
-                        current_post_count = get_latest_record_count(config['post_model']) if config['post_model'] else 0
-                else:
-                    current_prep_count = get_latest_record_count(config.get('prep_model'))
-                    current_post_count = get_latest_record_count(config.get('post_model'))
-                
-                if (current_prep_count != last_prep_count or 
-                    current_post_count != last_post_count):
-                    
-                    last_prep_count = current_prep_count
-                    last_post_count = current_post_count
-                    
-                    # Get updated machine data
-                    if config.get('type') == 'washing':
-                        operation = config.get('operation', 'load')
-                        machine_type = 'washing'
-                        
-                        if operation == 'load':
-                            records = get_washing_load_data(config['prep_model'])
-                            is_active = check_machine_status(config['prep_model']) if config['prep_model'] else False
-                            counts = get_washing_counts(config['prep_model'], None, 'load')
-                        else:
-                            records = get_washing_unload_data(config['post_model'])
-                            try:
-                                latest_post = config['post_model'].objects.first()
-                                if latest_post:
-                                    threshold = timezone.now() - timedelta(minutes=21)
-                                    timestamp = latest_post.timestamp
-                                    if hasattr(timestamp, 'timestamp'):
-                                        if timezone.is_naive(timestamp):
-                                            timestamp = timezone.make_aware(timestamp)
-                                        is_active = timestamp >= threshold
-                                    else:
-                                        is_active = False
-                                else:
-                                    is_active = False
-                            except:
-                                is_active = False
-                            counts = get_washing_counts(None, config['post_model'], 'unload')
-                    
-                    elif is_assembly:
-                        records = get_assembly_machine_data(config['prep_model'], config['post_model'])
-                        machine_type = 'assembly'
-                        is_active = check_machine_status(config['prep_model'])
-                        counts = get_assembly_counts(config['prep_model'])
-                    else:
-                        machine_type = 'standard'
-                        if 'Painting' in config['name']:
-                            machine_type = 'painting'
-                        elif 'Lubrication' in config['name']:
-                            machine_type = 'lubrication'
-                        elif 'Oring_leak' in config['name']:
-                            machine_type = 'op80'
-                        records = get_machine_data(config['prep_model'], config['post_model'], machine_type)
-                        is_active = check_machine_status(config['prep_model'])
-                        counts = get_machine_counts(config['prep_model'], config['post_model'], machine_type)
-                    
-                    for record in records:
-                        if record.get('prep_timestamp') and hasattr(record['prep_timestamp'], 'isoformat'):
-                            record['prep_timestamp'] = record['prep_timestamp'].isoformat()
-                        if record.get('post_timestamp') and hasattr(record['post_timestamp'], 'isoformat'):
-                            record['post_timestamp'] = record['post_timestamp'].isoformat()
-                    
-                    response_data = {
-                        'type': 'update',
-                        'machine_name': config['name'],
-                        'display_name': config.get('display_name', config['name']),
-                        'ip': config.get('ip', 'N/A'),
-                        'op_code': config.get('op_code', 'N/A'),
-                        'machine_type': machine_type,
-                        'is_active': is_active,
-                        'records': records,
-                        'is_assembly': is_assembly,
-                        'counts': counts,
-                    }
-                    
-                    if config.get('type') == 'washing':
-                        response_data['operation'] = config.get('operation', 'load')
-                    
-                    data = json.dumps(response_data, cls=DjangoJSONEncoder)
-                    
-                    yield f"data: {data}\n\n"
-                
-                yield f": heartbeat\n\n"
-                time.sleep(2)
-                
-            except GeneratorExit:
-                break
-            except Exception as e:
-                print(f"SSE Error: {e}")
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
-                time.sleep(5)
-    
-    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
-    response['Cache-Control'] = 'no-cache'
-    response['X-Accel-Buffering'] = 'no'
-    return response
+    return sse_response(request, f'machine:{machine_name}')
 
 
 # ============================================================================
@@ -1570,6 +1459,18 @@ def get_date_range(start_date_str, end_date_str):
         return start_date, end_date
 
 
+def event_time_q(model, start_date=None, end_date=None):
+    """Date-range filter on the model's indexed datetime column (event_time, or timestamp_internal for OP40)"""
+    field_name = 'event_time' if hasattr(model, 'event_time') else 'timestamp_internal'
+    
+    query = Q()
+    if start_date:
+        query &= Q(**{f'{field_name}__gte': start_date})
+    if end_date:
+        query &= Q(**{f'{field_name}__lte': end_date})
+    return query
+
+
 def get_machine_config_by_id(machine_id):
     """Get machine config by machine_id"""
     if machine_id == 'all':
@@ -1732,8 +1633,24 @@ def calculate_oee_for_shift(shift_data, op_code):
     }
 
 
-def collect_analytics_data(start_date, end_date, machine_filter='all', status_filter='all'):
-    """Collect analytics data with OEE, shift-wise production, and cycle time calculations - FIXED for washing machines"""
+def collect_analytics_data(start_date, end_date, machine_filter='all', status_filter='all', mode='python'):
+    """Collect analytics data with OEE, shift-wise production, and cycle time calculations - FIXED for washing machines
+
+    mode='python' walks every row and is the reference implementation;
+    mode='sql' returns the same dict from GROUP BY queries per station
+    (rollups.collect_sql_analytics) and mode='chunked' the same again with
+    the production days aggregated in a process pool, for long ranges
+    (chunked_analytics.collect_chunked_analytics). The API and exports read
+    the hourly rollups (rollups.collect_rollup_analytics), which must match
+    as well.
+    """
+    if mode == 'sql':
+        from .rollups import collect_sql_analytics
+        return collect_sql_analytics(start_date, end_date, machine_filter, status_filter)
+    if mode == 'chunked':
+        from .chunked_analytics import collect_chunked_analytics
+        return collect_chunked_analytics(start_date, end_date, machine_filter, status_filter)
+    
     
     data = {
         'total_parts': 0,
@@ -1842,16 +1759,13 @@ def collect_analytics_data(start_date, end_date, machine_filter='all', status_fi
             
             if operation == 'load' and config.get('prep_model'):
                 # PREWASHING/FINALWASHING LOADING (Preprocessing)
-                prep_records = config['prep_model'].objects.all()
+                prep_records = config['prep_model'].objects.filter(
+                    event_time_q(config['prep_model'], start_date, end_date)
+                )
                 
                 for prep in prep_records:
                     timestamp = prep.timestamp
                     
-                    # Check if in date range
-                    if not is_in_date_range(timestamp, start_date, end_date):
-                        continue
-  
-                    
                     # Determine shift
                     timestamp_dt = parse_timestamp_to_datetime(timestamp)
                     shift = determine_shift(timestamp_dt)
@@ -1912,15 +1826,13 @@ def collect_analytics_data(start_date, end_date, machine_filter='all', status_fi
             
             elif operation == 'unload' and config.get('post_model'):
                 # PREWASHING/FINALWASHING UNLOADING (Postprocessing)
-                post_records = config['post_model'].objects.all()
+                post_records = config['post_model'].objects.filter(
+                    event_time_q(config['post_model'], start_date, end_date)
+                )
                 
                 for post in post_records:
                     timestamp = post.timestamp
                     
-                    # Check if in date range
-                    if not is_in_date_range(timestamp, start_date, end_date):
-                        continue
-                    
                     # Determine shift
                     timestamp_dt = parse_timestamp_to_datetime(timestamp)
                     shift = determine_shift(timestamp_dt)
@@ -1992,21 +1904,21 @@ def collect_analytics_data(start_date, end_date, machine_filter='all', status_fi
         
         # Get preprocessing records
         try:
-            prep_records = config['prep_model'].objects.all()
+            prep_records = config['prep_model'].objects.filter(
+                event_time_q(config['prep_model'], start_date, end_date)
+            )
+            if not is_assembly:
+                prep_records = prep_records.select_related('post')
         except Exception as e:
             continue
         
         for prep in prep_records:
             # Get timestamp
             if is_assembly:
-                timestamp = prep.timestamp_internal
+                timestamp = timezone.localtime(prep.timestamp_internal)
             else:
                 timestamp = prep.timestamp
             
-            # Check if in date range
-            if not is_in_date_range(timestamp, start_date, end_date):
-                continue
-            
             # Determine shift
             timestamp_dt = parse_timestamp_to_datetime(timestamp)
             shift = determine_shift(timestamp_dt)
@@ -2023,28 +1935,15 @@ def collect_analytics_data(start_date, end_date, machine_filter='all', status_fi
                 status = prep.status if prep.qr_data_external and prep.qr_data_housing else 'Pending'
                 post_timestamp = prep.timestamp_external or prep.timestamp_internal
                 
-            elif 'Painting' in machine_name:
-                qr_value = prep.qr_data_housing
-                post = config['post_model'].objects.filter(qr_data_housing=qr_value).first()
-                status = post.status if post else 'Pending'
-                post_timestamp = post.timestamp if post else None
-                
-            elif 'Lubrication' in machine_name:
-                qr_value = prep.qr_data_piston
-                post = config['post_model'].objects.filter(qr_data_piston=qr_value).first()
-                status = post.status if post else 'Pending'
-                post_timestamp = post.timestamp if post else None
-                
-            elif 'Oring_leak' in machine_name:
-                qr_value = prep.qr_data_piston
-                qr_housing = prep.qr_data_housing
-                post = config['post_model'].objects.filter(qr_data_housing_new=qr_housing).first()
-                status = post.status if post else 'Pending'
-                post_timestamp = post.timestamp if post else None
-                
             else:
-                qr_value = prep.qr_data
-                post = config['post_model'].objects.filter(qr_data=qr_value).first() if config['post_model'] else None
+                # Paired post row stored by the pairing triggers / signals
+                if 'Painting' in machine_name:
+                    qr_value = prep.qr_data_housing
+                elif 'Lubrication' in machine_name or 'Oring_leak' in machine_name:
+                    qr_value = prep.qr_data_piston
+                else:
+                    qr_value = prep.qr_data
+                post = prep.post
                 status = post.status if post else 'Pending'
                 post_timestamp = post.timestamp if post else None
             
@@ -2232,7 +2131,8 @@ def collect_analytics_data(start_date, end_date, machine_filter='all', status_fi
         for date in sorted(cycle_time_by_date.keys()):
             records = cycle_time_by_date[date]
             avg_actual = statistics.mean([r['cycle_time'] for r in records])
-            avg_standard = statistics.mean([r['standard_ct'] for r in records if r['standard_ct'] > 0])
+            standard_cts = [r['standard_ct'] for r in records if r['standard_ct'] > 0]
+            avg_standard = statistics.mean(standard_cts) if standard_cts else 0
             
             data['cycle_time_data']['labels'].append(date)
             data['cycle_time_data']['actual'].append(round(avg_actual, 2))
@@ -2254,7 +2154,8 @@ def analytics_api(request):
     
     start_date, end_date = get_date_range(start_date_str, end_date_str)
     
-    data = collect_analytics_data(start_date, end_date, machine_filter, status_filter)
+    from .analytics_cache import get_cached_analytics
+    data = get_cached_analytics(start_date, end_date, machine_filter, status_filter)
     
     # Convert datetime objects to strings
     for record in data['detailed_data']:
@@ -2266,9 +2167,15 @@ def analytics_api(request):
     return JsonResponse(data)
 
 
+def analytics_cache_stats_api(request):
+    """Hit/miss counters of the analytics result cache"""
+    from .analytics_cache import get_cache_stats
+    return JsonResponse(get_cache_stats())
+
+
 @csrf_exempt
 def analytics_export(request):
-    """Export analytics data to CSV"""
+    """Export analytics data to CSV: summary tables, then every record in range (streamed)"""
     start_date_str = request.GET.get('start_date')
     end_date_str = request.GET.get('end_date')
     machine_filter = request.GET.get('machine', 'all')
@@ -2276,41 +2183,45 @@ def analytics_export(request):
     
     start_date, end_date = get_date_range(start_date_str, end_date_str)
     
-    data = collect_analytics_data(start_date, end_date, machine_filter, status_filter)
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="analytics_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+    from .analytics_cache import get_cached_analytics
+    data = get_cached_analytics(start_date, end_date, machine_filter, status_filter)
     
-    writer = csv.writer(response)
+    rows = analytics_export_rows(data, start_date, end_date, machine_filter, status_filter)
+    return csv_response(request, rows, f'analytics_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+
+
+def analytics_export_rows(data, start_date, end_date, machine_filter='all', status_filter='all'):
+    """CSV rows of the analytics export; the detailed records are read from the station tables as they are written"""
+    from .rollups import select_configs, stream_detailed_records
     
     # Write summary statistics
-    writer.writerow(['Production Analytics Report'])
-    writer.writerow(['Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
-    writer.writerow(['Date Range:', f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"])
-    writer.writerow([])
-    
-    writer.writerow(['Summary Statistics'])
-    writer.writerow(['Metric', 'Value'])
-    writer.writerow(['Total Parts', data['total_parts']])
-    writer.writerow(['OK Parts', data['ok_parts']])
-    writer.writerow(['NG Parts', data['ng_parts']])
-    writer.writerow(['Pending Parts', data['pending_parts']])
+    yield ['Production Analytics Report']
+    yield ['Generated:', datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+    yield ['Date Range:', f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"]
+    yield []
+    
+    yield ['Summary Statistics']
+    yield ['Metric', 'Value']
+    yield ['Total Parts', data['total_parts']]
+    yield ['OK Parts', data['ok_parts']]
+    yield ['NG Parts', data['ng_parts']]
+    yield ['Pending Parts', data['pending_parts']]
     
     if data['ok_parts'] + data['ng_parts'] > 0:
         yield_rate = (data['ok_parts'] / (data['ok_parts'] + data['ng_parts'])) * 100
-        writer.writerow(['Yield Rate', f"{yield_rate:.2f}%"])
+        yield ['Yield Rate', f"{yield_rate:.2f}%"]
     
-    writer.writerow(['Active Machines', data['active_machines']])
-    writer.writerow([])
+    yield ['Active Machines', data['active_machines']]
+    yield []
     
     # Write machine breakdown
-    writer.writerow(['Machine Breakdown'])
-    writer.writerow(['Machine', 'Display Name', 'OK', 'NG', 'Pending', 'Total', 'Yield Rate %'])
+    yield ['Machine Breakdown']
+    yield ['Machine', 'Display Name', 'OK', 'NG', 'Pending', 'Total', 'Yield Rate %']
     for machine in data['machine_stats']:
         total = machine['ok'] + machine['ng'] + machine['pending']
         completed = machine['ok'] + machine['ng']
         yield_rate = (machine['ok'] / completed * 100) if completed > 0 else 0
-        writer.writerow([
+        yield [
             machine['machine'],
             machine.get('display_name', machine['machine']),
             machine['ok'],
@@ -2318,41 +2229,40 @@ def analytics_export(request):
             machine['pending'],
             total,
             f"{yield_rate:.2f}"
-        ])
-    writer.writerow([])
+        ]
+    yield []
     
     # Write model breakdown (NEW)
     if data['model_breakdown']:
-        writer.writerow(['Model Breakdown'])
-        writer.writerow(['Model Name', 'OK', 'NG', 'Pending', 'Total', 'Yield Rate %'])
+        yield ['Model Breakdown']
+        yield ['Model Name', 'OK', 'NG', 'Pending', 'Total', 'Yield Rate %']
         for model_name, stats in data['model_breakdown'].items():
             completed = stats['ok'] + stats['ng']
             yield_rate = (stats['ok'] / completed * 100) if completed > 0 else 0
-            writer.writerow([
+            yield [
                 model_name,
                 stats['ok'],
                 stats['ng'],
                 stats['pending'],
                 stats['total'],
                 f"{yield_rate:.2f}"
-            ])
-        writer.writerow([])
+            ]
+        yield []
                                         
-    # Write detailed data
-    writer.writerow(['Detailed Records'])
-    writer.writerow(['Machine', 'Display Name', 'Model Name', 'QR Code', 'Timestamp', 'Status'])
-    for record in data['detailed_data']:
+    # Write detailed data (every record in range, oldest first)
+    yield ['Detailed Records']
+    yield ['Machine', 'Display Name', 'Model Name', 'QR Code', 'Timestamp', 'Status']
+    configs, _ = select_configs(machine_filter)
+    for record in stream_detailed_records(configs, start_date, end_date, status_filter, chunk_size=EXPORT_CHUNK_SIZE):
         timestamp_str = record['timestamp'] if isinstance(record['timestamp'], str) else record['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-        writer.writerow([
+        yield [
             record['machine'],
             record.get('display_name', record['machine']),
             record.get('model_name', 'N/A'),
             record['qr_code'],
             timestamp_str,
             record['status'],
-        ])
-    
-    return response
+        ]
 
 
 
@@ -2365,83 +2275,44 @@ def analytics_export(request):
 # Add this to your views.py - requires: pip install openpyxl
 # ============================================================================
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-from openpyxl.chart import BarChart, PieChart, LineChart, Reference
-from django.http import HttpResponse
 from datetime import datetime
+from .excel_export import ReportSheet, excel_response, new_workbook, status_style
 
 @csrf_exempt
 def analytics_export_excel(request):
     """Export analytics data to professionally formatted Excel file"""
-    start_date_str = request.GET.get('start_date')
-    end_date_str = request.GET.get('end_date')
-    machine_filter = request.GET.get('machine', 'all')
-    status_filter = request.GET.get('status', 'all')
-    
-    start_date, end_date = get_date_range(start_date_str, end_date_str)
-    data = collect_analytics_data(start_date, end_date, machine_filter, status_filter)
-    
-    # Create workbook
-    wb = Workbook()
-    
-    # Define styles
-    header_fill = PatternFill(start_color="FF7755", end_color="FF7755", fill_type="solid")
-    header_font = Font(name='Calibri', size=12, bold=True, color="FFFFFF")
-    
-    subheader_fill = PatternFill(start_color="FFA07A", end_color="FFA07A", fill_type="solid")
-    subheader_font = Font(name='Calibri', size=11, bold=True, color="FFFFFF")
-    
-    title_font = Font(name='Calibri', size=16, bold=True, color="FF7755")
-    section_font = Font(name='Calibri', size=13, bold=True, color="FF7755")
-    normal_font = Font(name='Calibri', size=10)
-    bold_font = Font(name='Calibri', size=10, bold=True)
-    
-    # Color fills for different sections
-    oee_fill = PatternFill(start_color="E8F5E9", end_color="E8F5E9", fill_type="solid")
-    shift_a_fill = PatternFill(start_color="FFF9C4", end_color="FFF9C4", fill_type="solid")
-    shift_b_fill = PatternFill(start_color="BBDEFB", end_color="BBDEFB", fill_type="solid")
-    shift_c_fill = PatternFill(start_color="E1BEE7", end_color="E1BEE7", fill_type="solid")
-    
-    ok_fill = PatternFill(start_color="C8E6C9", end_color="C8E6C9", fill_type="solid")
-    ng_fill = PatternFill(start_color="FFCDD2", end_color="FFCDD2", fill_type="solid")
-    
-    # Border style
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
+    wb = build_analytics_workbook(
+        request.GET.get('start_date'),
+        request.GET.get('end_date'),
+        request.GET.get('machine', 'all'),
+        request.GET.get('status', 'all'),
     )
+    return excel_response(request, wb, f'analytics_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+
+
+def build_analytics_workbook(start_date_str=None, end_date_str=None, machine_filter='all', status_filter='all',
+                             collect=None):
+    """The analytics Excel report for the export parameters (also built by the report worker)"""
+    start_date, end_date = get_date_range(start_date_str, end_date_str)
+    from .analytics_cache import get_cached_analytics
+    data = get_cached_analytics(start_date, end_date, machine_filter, status_filter, collect=collect)
+    
+    # Write-only workbook: rows go to disk as they are appended, styles are named
+    wb = new_workbook()
+    oee_data = data.get('oee_data', {})
     
     # ========================================================================
     # SHEET 1: EXECUTIVE SUMMARY
     # ========================================================================
-    ws_summary = wb.active
-    ws_summary.title = "Executive Summary"
-    
-    # Title
-    ws_summary['A1'] = "Manufacturing Analytics Report"
-    ws_summary['A1'].font = title_font
-    ws_summary.merge_cells('A1:F1')
+    ws_summary = ReportSheet(wb, "Executive Summary", widths=[30, 20, 40])
     
-    ws_summary['A2'] = f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-    ws_summary['A2'].font = normal_font
-    ws_summary.merge_cells('A2:F2')
-    
-    ws_summary['A3'] = f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    ws_summary['A3'].font = Font(name='Calibri', size=9, italic=True)
-    ws_summary.merge_cells('A3:F3')
+    ws_summary.heading("Manufacturing Analytics Report", span=6)
+    ws_summary.heading(f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}", 'note', span=6)
+    ws_summary.heading(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 'note', span=6)
+    ws_summary.skip()
     
     # OEE Section
-    row = 5
-    ws_summary[f'A{row}'] = "OEE (Overall Equipment Effectiveness)"
-    ws_summary[f'A{row}'].font = section_font
-    ws_summary.merge_cells(f'A{row}:F{row}')
-    
-    row += 1
-    oee_data = data.get('oee_data', {})
+    ws_summary.heading("OEE (Overall Equipment Effectiveness)", 'section', span=6)
     oee_metrics = [
         ['Overall OEE', f"{oee_data.get('oee', 0):.2f}%", 'Target: ≥85% (World Class)'],
         ['Availability', f"{oee_data.get('availability', 0):.2f}%", 'Operating Time / Loading Time'],
@@ -2449,37 +2320,13 @@ def analytics_export_excel(request):
         ['Quality', f"{oee_data.get('quality', 0):.2f}%", 'Good Units / Total Units'],
         ['Estimated Downtime', f"{oee_data.get('downtime_minutes', 0):.2f} min", 'Based on production gap'],
     ]
-    
-    ws_summary[f'A{row}'] = "Metric"
-    ws_summary[f'B{row}'] = "Value"
-    ws_summary[f'C{row}'] = "Description"
-    for col in ['A', 'B', 'C']:
-        ws_summary[f'{col}{row}'].fill = header_fill
-        ws_summary[f'{col}{row}'].font = header_font
-        ws_summary[f'{col}{row}'].border = thin_border
-        ws_summary[f'{col}{row}'].alignment = Alignment(horizontal='center', vertical='center')
-    
+    ws_summary.append(["Metric", "Value", "Description"], 'header')
     for metric in oee_metrics:
-        row += 1
-        ws_summary[f'A{row}'] = metric[0]
-        ws_summary[f'B{row}'] = metric[1]
-        ws_summary[f'C{row}'] = metric[2]
-        
-        for col in ['A', 'B', 'C']:
-            ws_summary[f'{col}{row}'].border = thin_border
-            ws_summary[f'{col}{row}'].fill = oee_fill
-        
-        ws_summary[f'A{row}'].font = bold_font
-        ws_summary[f'B{row}'].font = Font(name='Calibri', size=11, bold=True)
-        ws_summary[f'B{row}'].alignment = Alignment(horizontal='center')
+        ws_summary.append(metric, ['label', 'highlight', 'cell'])
+    ws_summary.skip()
     
     # Key Metrics
-    row += 2
-    ws_summary[f'A{row}'] = "Key Production Metrics"
-    ws_summary[f'A{row}'].font = section_font
-    ws_summary.merge_cells(f'A{row}:F{row}')
-    
-    row += 1
+    ws_summary.heading("Key Production Metrics", 'section', span=6)
     metrics = [
         ['Total Parts Processed', data['total_parts']],
         ['OK Parts', data['ok_parts']],
@@ -2490,73 +2337,39 @@ def analytics_export_excel(request):
         ['Average Cycle Time', f"{data['avg_cycle_time']:.2f} min"],
         ['Active Machines', data['active_machines']],
     ]
-    
-    ws_summary[f'A{row}'] = "Metric"
-    ws_summary[f'B{row}'] = "Value"
-    for col in ['A', 'B']:
-        ws_summary[f'{col}{row}'].fill = header_fill
-        ws_summary[f'{col}{row}'].font = header_font
-        ws_summary[f'{col}{row}'].border = thin_border
-        ws_summary[f'{col}{row}'].alignment = Alignment(horizontal='center', vertical='center')
-    
+    ws_summary.append(["Metric", "Value"], 'header')
     for metric in metrics:
-        row += 1
-        ws_summary[f'A{row}'] = metric[0]
-        ws_summary[f'B{row}'] = metric[1]
-        
-        ws_summary[f'A{row}'].border = thin_border
-        ws_summary[f'B{row}'].border = thin_border
-        
         if 'OK' in metric[0]:
-            ws_summary[f'B{row}'].fill = ok_fill
+            value_style = 'ok'
         elif 'NG' in metric[0] or 'Rejection' in metric[0]:
-            ws_summary[f'B{row}'].fill = ng_fill
-        
-        ws_summary[f'A{row}'].font = bold_font
-        ws_summary[f'B{row}'].alignment = Alignment(horizontal='center')
-    
-    # Column widths
-    ws_summary.column_dimensions['A'].width = 30
-    ws_summary.column_dimensions['B'].width = 20
-    ws_summary.column_dimensions['C'].width = 40
+            value_style = 'ng'
+        else:
+            value_style = 'number'
+        ws_summary.append(metric, ['label', value_style])
     
     # ========================================================================
     # SHEET 2: SHIFT ANALYSIS
     # ========================================================================
-    ws_shift = wb.create_sheet("Shift Analysis")
-    
-    ws_shift['A1'] = "Shift-Wise Production Analysis"
-    ws_shift['A1'].font = title_font
-    ws_shift.merge_cells('A1:H1')
-    
-    ws_shift['A2'] = "Shift Definitions: A (06:00-14:00) | B (14:00-22:00) | C (22:00-06:00)"
-    ws_shift['A2'].font = Font(name='Calibri', size=10, italic=True)
-    ws_shift.merge_cells('A2:H2')
-    
-    # Shift data
-    row = 4
-    headers = ['Shift', 'Time Range', 'Total', 'OK', 'NG', 'Pending', 'OEE %', 'Status']
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws_shift.cell(row=row, column=col_idx)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = thin_border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+    ws_shift = ReportSheet(wb, "Shift Analysis", widths=[15, 25, 12, 12, 12, 12, 15, 20])
+    
+    ws_shift.heading("Shift-Wise Production Analysis", span=8)
+    ws_shift.heading("Shift Definitions: A (06:00-14:00) | B (14:00-22:00) | C (22:00-06:00)", 'note', span=8)
+    ws_shift.skip()
+    
+    header_row = ws_shift.append(['Shift', 'Time Range', 'Total', 'OK', 'NG', 'Pending', 'OEE %', 'Status'], 'header')
     
     shift_data = data.get('shift_data', {})
     shifts_info = [
-        ('A', '06:00 AM - 14:00 PM', shift_data.get('A', {}), shift_a_fill, 
+        ('A', '06:00 AM - 14:00 PM', shift_data.get('A', {}), 'shift_a',
          oee_data.get('shift_A_oee', {}).get('oee', 0)),
-        ('B', '14:00 PM - 22:00 PM', shift_data.get('B', {}), shift_b_fill,
+        ('B', '14:00 PM - 22:00 PM', shift_data.get('B', {}), 'shift_b',
          oee_data.get('shift_B_oee', {}).get('oee', 0)),
-        ('C', '22:00 PM - 06:00 AM', shift_data.get('C', {}), shift_c_fill,
+        ('C', '22:00 PM - 06:00 AM', shift_data.get('C', {}), 'shift_c',
          oee_data.get('shift_C_oee', {}).get('oee', 0)),
     ]
     
-    for shift_name, time_range, shift_stats, fill, shift_oee in shifts_info:
-        row += 1
-        values = [
+    for shift_name, time_range, shift_stats, style, shift_oee in shifts_info:
+        last_row = ws_shift.append([
             shift_name,
             time_range,
             shift_stats.get('total', 0),
@@ -2565,29 +2378,11 @@ def analytics_export_excel(request):
             shift_stats.get('pending', 0),
             f"{shift_oee:.2f}%",
             'Excellent' if shift_oee >= 85 else 'Good' if shift_oee >= 70 else 'Needs Improvement'
-        ]
-        
-        for col_idx, value in enumerate(values, start=1):
-            cell = ws_shift.cell(row=row, column=col_idx)
-            cell.value = value
-            cell.border = thin_border
-            cell.fill = fill
-            
-            if col_idx == 1:
-                cell.font = Font(name='Calibri', size=12, bold=True)
-                cell.alignment = Alignment(horizontal='center')
-            elif col_idx > 2:
-                cell.alignment = Alignment(horizontal='center')
-    
-    # Shift comparison formulas
-    row += 2
-    ws_shift[f'A{row}'] = "Shift Performance Comparison"
-    ws_shift[f'A{row}'].font = section_font
-    ws_shift.merge_cells(f'A{row}:E{row}')
-    
-    row += 1
-    ws_shift[f'A{row}'] = "Best Performing Shift (OEE)"
-    ws_shift[f'A{row}'].font = bold_font
+        ], style)
+    
+    # Shift comparison
+    ws_shift.skip()
+    ws_shift.heading("Shift Performance Comparison", 'section', span=5)
     
     # Find best shift
     best_shift = 'A'
@@ -2598,45 +2393,26 @@ def analytics_export_excel(request):
     if oee_data.get('shift_C_oee', {}).get('oee', 0) > best_oee:
         best_shift = 'C'
     
-    ws_shift[f'B{row}'] = f"Shift {best_shift}"
-    ws_shift[f'B{row}'].font = Font(name='Calibri', size=11, bold=True, color="00AA00")
-    
-    # Column widths
-    ws_shift.column_dimensions['A'].width = 15
-    ws_shift.column_dimensions['B'].width = 25
-    ws_shift.column_dimensions['C'].width = 12
-    ws_shift.column_dimensions['D'].width = 12
-    ws_shift.column_dimensions['E'].width = 12
-    ws_shift.column_dimensions['F'].width = 12
-    ws_shift.column_dimensions['G'].width = 15
-    ws_shift.column_dimensions['H'].width = 20
+    ws_shift.append(["Best Performing Shift (OEE)", f"Shift {best_shift}"], ['label', 'ok'])
+    ws_shift.bar_chart('OK / NG / Pending by Shift', header_row, last_row, 4, 6, 'J4', stacked=True)
     
     # ========================================================================
     # SHEET 3: MACHINE BREAKDOWN
     # ========================================================================
-    ws_machine = wb.create_sheet("Machine Breakdown")
-    
-    ws_machine['A1'] = "Machine-Level Performance Analysis"
-    ws_machine['A1'].font = title_font
-    ws_machine.merge_cells('A1:H1')
-    
-    row = 3
-    headers = ['Machine', 'OP Code', 'Total', 'OK', 'NG', 'Pending', 'Yield %', 'Status']
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws_machine.cell(row=row, column=col_idx)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = thin_border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+    ws_machine = ReportSheet(wb, "Machine Breakdown", widths=[18] * 8)
+    
+    ws_machine.heading("Machine-Level Performance Analysis", span=8)
+    ws_machine.skip()
+    
+    header_row = last_row = ws_machine.append(['Machine', 'OP Code', 'Total', 'OK', 'NG', 'Pending', 'Yield %', 'Status'], 'header')
+    machine_styles = ['label', 'cell', 'number', 'ok', 'ng', 'number', 'number', 'number']
     
     for machine in data['machine_stats']:
-        row += 1
         total = machine['ok'] + machine['ng'] + machine['pending']
         completed = machine['ok'] + machine['ng']
         yield_rate = (machine['ok'] / completed * 100) if completed > 0 else 0
         
-        values = [
+        last_row = ws_machine.append([
             machine.get('display_name', machine['machine']),
             machine.get('op_code', 'N/A'),
             total,
@@ -2645,163 +2421,60 @@ def analytics_export_excel(request):
             machine['pending'],
             f"{yield_rate:.2f}%",
             'Excellent' if yield_rate >= 99 else 'Good' if yield_rate >= 95 else 'Needs Attention'
-        ]
-        
-        for col_idx, value in enumerate(values, start=1):
-            cell = ws_machine.cell(row=row, column=col_idx)
-            cell.value = value
-            cell.border = thin_border
-            
-            if col_idx == 1:
-                cell.font = bold_font
-            elif col_idx == 4:
-                cell.fill = ok_fill
-            elif col_idx == 5:
-                cell.fill = ng_fill
-            
-            if col_idx > 2:
-                cell.alignment = Alignment(horizontal='center')
+        ], machine_styles)
     
-    # Column widths
-    for col_idx in range(1, 9):
-        ws_machine.column_dimensions[get_column_letter(col_idx)].width = 18
+    ws_machine.bar_chart('OK / NG by Machine', header_row, last_row, 4, 5, 'J3', stacked=True)
     
     # ========================================================================
     # SHEET 4: MODEL BREAKDOWN
     # ========================================================================
-    ws_model = wb.create_sheet("Model Breakdown")
-    
-    ws_model['A1'] = "Model-Level Performance Analysis"
-    ws_model['A1'].font = title_font
-    ws_model.merge_cells('A1:G1')
-    
-    row = 3
-    headers = ['Model Name', 'Total', 'OK', 'NG', 'Pending', 'Yield %', 'Status']
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws_model.cell(row=row, column=col_idx)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = thin_border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+    ws_model = ReportSheet(wb, "Model Breakdown", widths=[25] + [15] * 6)
     
-    if data['model_breakdown']:
-        for model_name, stats in data['model_breakdown'].items():
-            row += 1
-            completed = stats['ok'] + stats['ng']
-            yield_rate = (stats['ok'] / completed * 100) if completed > 0 else 0
-            
-            values = [
-                model_name,
-                stats['total'],
-                stats['ok'],
-                stats['ng'],
-                stats['pending'],
-                f"{yield_rate:.2f}%",
-                'Excellent' if yield_rate >= 99 else 'Good' if yield_rate >= 95 else 'Needs Attention'
-            ]
-            
-            for col_idx, value in enumerate(values, start=1):
-                cell = ws_model.cell(row=row, column=col_idx)
-                cell.value = value
-                cell.border = thin_border
-                
-                if col_idx == 1:
-                    cell.font = bold_font
-                elif col_idx == 3:
-                    cell.fill = ok_fill
-                elif col_idx == 4:
-                    cell.fill = ng_fill
-                
-                if col_idx > 1:
-                    cell.alignment = Alignment(horizontal='center')
+    ws_model.heading("Model-Level Performance Analysis", span=7)
+    ws_model.skip()
     
-    # Column widths
-    ws_model.column_dimensions['A'].width = 25
-    for col_idx in range(2, 8):
-        ws_model.column_dimensions[get_column_letter(col_idx)].width = 15
+    header_row = last_row = ws_model.append(['Model Name', 'Total', 'OK', 'NG', 'Pending', 'Yield %', 'Status'], 'header')
+    model_styles = ['label', 'number', 'ok', 'ng', 'number', 'number', 'number']
+    
+    for model_name, stats in (data['model_breakdown'] or {}).items():
+        completed = stats['ok'] + stats['ng']
+        yield_rate = (stats['ok'] / completed * 100) if completed > 0 else 0
+        
+        last_row = ws_model.append([
+            model_name,
+            stats['total'],
+            stats['ok'],
+            stats['ng'],
+            stats['pending'],
+            f"{yield_rate:.2f}%",
+            'Excellent' if yield_rate >= 99 else 'Good' if yield_rate >= 95 else 'Needs Attention'
+        ], model_styles)
+    
+    ws_model.bar_chart('OK / NG by Model', header_row, last_row, 3, 4, 'I3', stacked=True)
     
     # ========================================================================
     # SHEET 5: DETAILED RECORDS
     # ========================================================================
-    ws_details = wb.create_sheet("Detailed Records")
-    
-    ws_details['A1'] = "Transaction-Level Details"
-    ws_details['A1'].font = title_font
-    ws_details.merge_cells('A1:I1')
-    
-    row = 3
-    headers = ['Machine', 'Model', 'QR Code', 'Timestamp', 'Shift', 'Cycle Time (min)', 'Standard CT (min)', 'Status', 'Variance']
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws_details.cell(row=row, column=col_idx)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.border = thin_border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+    ws_details = ReportSheet(wb, "Detailed Records", widths=[20, 15, 20, 20, 10, 15, 15, 12, 12], freeze_panes='A4')
     
-    for record in data['detailed_data']:
-        row += 1
-        timestamp_str = record['timestamp'] if isinstance(record['timestamp'], str) else record['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-        cycle_time = record.get('cycle_time', 0) if record.get('cycle_time') else 0
-        
-        # Get standard cycle time (you may need to add this to your data)
-        standard_ct = 0  # Would need to be calculated based on op_code
-        variance = cycle_time - standard_ct if cycle_time and standard_ct else 0
-        
-        values = [
-            record.get('display_name', record['machine']),
-            record.get('model_name', 'N/A'),
-            record['qr_code'],
-            timestamp_str,
-            record.get('shift', '-'),
-            f"{cycle_time:.2f}" if cycle_time else '-',
-            f"{standard_ct:.2f}" if standard_ct else '-',
-            record['status'],
-            f"{variance:.2f}" if variance else '-'
-        ]
-        
-        for col_idx, value in enumerate(values, start=1):
-            cell = ws_details.cell(row=row, column=col_idx)
-            cell.value = value
-            cell.border = thin_border
-            cell.font = Font(name='Calibri', size=9)
-            
-            if col_idx == 8:  # Status
-                if value == 'OK':
-                    cell.fill = ok_fill
-                elif value == 'NG':
-                    cell.fill = ng_fill
-            
-            if col_idx > 4:
-                cell.alignment = Alignment(horizontal='center')
-    
-    # Column widths
-    ws_details.column_dimensions['A'].width = 20
-    ws_details.column_dimensions['B'].width = 15
-    ws_details.column_dimensions['C'].width = 20
-    ws_details.column_dimensions['D'].width = 20
-    ws_details.column_dimensions['E'].width = 10
-    ws_details.column_dimensions['F'].width = 15
-    ws_details.column_dimensions['G'].width = 15
-    ws_details.column_dimensions['H'].width = 12
-    ws_details.column_dimensions['I'].width = 12
+    ws_details.heading("Transaction-Level Details", span=9)
+    ws_details.skip()
+    ws_details.append(['Machine', 'Model', 'QR Code', 'Timestamp', 'Shift', 'Cycle Time (min)', 'Standard CT (min)', 'Status', 'Variance'], 'header')
+    
+    # Every record in range, oldest first, read from the station tables as the sheet is written
+    for record in analytics_excel_detail_rows(start_date, end_date, machine_filter, status_filter):
+        ws_details.append(record, ['cell', 'cell', 'cell', 'cell', 'number', 'number', 'number', status_style(record[7]), 'number'])
     
     # ========================================================================
     # SHEET 6: OEE CALCULATION REFERENCE
     # ========================================================================
-    ws_ref = wb.create_sheet("OEE Reference")
-    
-    ws_ref['A1'] = "OEE Calculation Reference & Standard Cycle Times"
-    ws_ref['A1'].font = title_font
-    ws_ref.merge_cells('A1:E1')
+    ws_ref = ReportSheet(wb, "OEE Reference", widths=[30, 20, 20, 20, 30])
     
-    row = 3
-    ws_ref[f'A{row}'] = "OEE Formula Breakdown"
-    ws_ref[f'A{row}'].font = section_font
-    ws_ref.merge_cells(f'A{row}:E{row}')
+    ws_ref.heading("OEE Calculation Reference & Standard Cycle Times", span=5)
+    ws_ref.skip()
+    ws_ref.heading("OEE Formula Breakdown", 'section', span=5)
+    ws_ref.skip()
     
-    row += 2
     formulas = [
         ['OEE', '=', 'Availability × Performance × Quality'],
         ['Availability', '=', 'Operating Time / Loading Time (430 min)'],
@@ -2813,32 +2486,13 @@ def analytics_export_excel(request):
         ['Parts Deficit', '=', 'Expected Parts - Actual Parts'],
         ['Expected Parts', '=', 'Loading Time / Standard Cycle Time'],
     ]
-    
     for formula in formulas:
-        row += 1
-        ws_ref[f'A{row}'] = formula[0]
-        ws_ref[f'B{row}'] = formula[1]
-        ws_ref[f'C{row}'] = formula[2]
-        
-        ws_ref[f'A{row}'].font = bold_font
-        ws_ref[f'C{row}'].font = Font(name='Calibri', size=10, italic=True)
+        ws_ref.append(formula, ['label', None, 'note'])
     
     # Standard Cycle Times
-    row += 2
-    ws_ref[f'A{row}'] = "Standard Cycle Times by Operation"
-    ws_ref[f'A{row}'].font = section_font
-    ws_ref.merge_cells(f'A{row}:D{row}')
-    
-    row += 1
-    ws_ref[f'A{row}'] = "Operation"
-    ws_ref[f'B{row}'] = "OP Code"
-    ws_ref[f'C{row}'] = "Cycle Time (sec)"
-    ws_ref[f'D{row}'] = "Cycle Time (min)"
-    for col in ['A', 'B', 'C', 'D']:
-        ws_ref[f'{col}{row}'].fill = subheader_fill
-        ws_ref[f'{col}{row}'].font = subheader_font
-        ws_ref[f'{col}{row}'].border = thin_border
-        ws_ref[f'{col}{row}'].alignment = Alignment(horizontal='center')
+    ws_ref.skip()
+    ws_ref.heading("Standard Cycle Times by Operation", 'section', span=4)
+    ws_ref.append(["Operation", "OP Code", "Cycle Time (sec)", "Cycle Time (min)"], 'subheader')
     
     cycle_times = [
         ['Piston Pre Assy', 'OP-40A/B/C/D', 50, 0.83],
@@ -2851,34 +2505,33 @@ def analytics_export_excel(request):
         ['Turning Housing', 'OP-130A/B/C/D', 255, 4.25],
         ['Turning Piston', 'OP-110A/B', 130, 2.17],
     ]
-    
     for ct_info in cycle_times:
-        row += 1
-        ws_ref[f'A{row}'] = ct_info[0]
-        ws_ref[f'B{row}'] = ct_info[1]
-        ws_ref[f'C{row}'] = ct_info[2]
-        ws_ref[f'D{row}'] = ct_info[3]
-        
-        for col in ['A', 'B', 'C', 'D']:
-            ws_ref[f'{col}{row}'].border = thin_border
-        
-        ws_ref[f'C{row}'].alignment = Alignment(horizontal='center')
-        ws_ref[f'D{row}'].alignment = Alignment(horizontal='center')
-    
-    # Column widths
-    ws_ref.column_dimensions['A'].width = 30
-    ws_ref.column_dimensions['B'].width = 20
-    ws_ref.column_dimensions['C'].width = 20
-    ws_ref.column_dimensions['D'].width = 20
-    ws_ref.column_dimensions['E'].width = 30
+        ws_ref.append(ct_info, ['cell', 'cell', 'number', 'number'])
     
-    # ========================================================================
-    # Save and return
-    # ========================================================================
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="analytics_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx"'
+    return wb
+
+
+def analytics_excel_detail_rows(start_date, end_date, machine_filter='all', status_filter='all'):
+    """Detailed Records sheet rows for every record in range, oldest first"""
+    from .rollups import select_configs, stream_detailed_records
     
-    wb.save(response)
-    return response
\ No newline at end of file
+    configs, _ = select_configs(machine_filter)
+    for record in stream_detailed_records(configs, start_date, end_date, status_filter, EXPORT_CHUNK_SIZE):
+        timestamp_str = record['timestamp'] if isinstance(record['timestamp'], str) else record['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+        cycle_time = record.get('cycle_time', 0) if record.get('cycle_time') else 0
+        
+        # Get standard cycle time (you may need to add this to your data)
+        standard_ct = 0  # Would need to be calculated based on op_code
+        variance = cycle_time - standard_ct if cycle_time and standard_ct else 0
+        
+        yield [
+            record.get('display_name', record['machine']),
+            record.get('model_name', 'N/A'),
+            record['qr_code'],
+            timestamp_str,
+            record.get('shift', '-'),
+            f"{cycle_time:.2f}" if cycle_time else '-',
+            f"{standard_ct:.2f}" if standard_ct else '-',
+            record['status'],
+            f"{variance:.2f}" if variance else '-'
+        ]